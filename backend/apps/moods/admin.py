@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Tag, MoodEntry, DailyAggregate
+from .models import (
+    Tag, MoodEntry, DailyAggregate, UserMoodSummary, MoodHeatmap, MoodChangePoint, WeeklyDigest,
+    ReflectionJob, ReflectionBatch, ReflectionCallLog
+)
 
 
 @admin.register(Tag)
@@ -30,3 +33,64 @@ class DailyAggregateAdmin(admin.ModelAdmin):
     search_fields = ('user__email',)
     date_hierarchy = 'date'
     readonly_fields = ('updated_at',)
+
+
+@admin.register(UserMoodSummary)
+class UserMoodSummaryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'total_entries', 'days_logged', 'longest_streak', 'last_date')
+    search_fields = ('user__email',)
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(MoodHeatmap)
+class MoodHeatmapAdmin(admin.ModelAdmin):
+    list_display = ('user', 'month', 'updated_at')
+    search_fields = ('user__email',)
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(MoodChangePoint)
+class MoodChangePointAdmin(admin.ModelAdmin):
+    list_display = ('user', 'date', 'kind', 'detected_on', 'baseline')
+    list_filter = ('kind',)
+    search_fields = ('user__email',)
+    date_hierarchy = 'date'
+
+
+@admin.register(WeeklyDigest)
+class WeeklyDigestAdmin(admin.ModelAdmin):
+    list_display = ('user', 'week_start', 'average_mood', 'entry_count', 'days_logged')
+    search_fields = ('user__email',)
+    date_hierarchy = 'week_start'
+    readonly_fields = ('created_at',)
+
+
+@admin.register(ReflectionJob)
+class ReflectionJobAdmin(admin.ModelAdmin):
+    list_display = ('user', 'date', 'status', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('user__email',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
+
+
+@admin.register(ReflectionBatch)
+class ReflectionBatchAdmin(admin.ModelAdmin):
+    list_display = ('date', 'batch_id', 'status', 'request_count', 'succeeded', 'failed', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'finished_at')
+
+
+@admin.register(ReflectionCallLog)
+class ReflectionCallLogAdmin(admin.ModelAdmin):
+    list_display = (
+        'created_at', 'model', 'prompt_version', 'streamed', 'outcome',
+        'wall_ms', 'first_token_ms', 'input_tokens', 'output_tokens'
+    )
+    list_filter = ('outcome', 'streamed', 'model', 'prompt_version')
+    date_hierarchy = 'created_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,601 @@
+"""
+Date-indexed feature matrices for analysis.
+
+``feature_matrix`` reads a user's ``DailyAggregate`` and ``DailyLog`` rows
+for a date range in one statement and lays them out as dense NumPy
+columns, one slot per calendar day, with a boolean mask marking the days
+a value is missing. The correlation, rolling and tag statistics built on
+top of it are below.
+"""
+import warnings
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Avg, Count, F, FloatField, Max, Sum, ValueRange, Window
+from django.db.models.functions import Cast
+
+from .cache import get_tag_map
+from .functions import DayNumber
+from .models import MoodEntry, DailyAggregate, DailyLog
+
+AGGREGATE_FEATURES = ('average_mood', 'min_mood', 'max_mood', 'entry_count')
+LOG_FEATURES = ('sleep_hours', 'sleep_quality', 'energy', 'anxiety', 'stress')
+CHOICE_FEATURES = ('exercise', 'social', 'daylight', 'alcohol', 'nicotine', 'other_substances')
+FEATURES = AGGREGATE_FEATURES + LOG_FEATURES + CHOICE_FEATURES
+
+# Longest range served in one matrix (about ten years)
+MAX_DAYS = 3660
+
+# Choice fields are encoded as their position in the choice list, which
+# runs from none to most for every level
+CATEGORIES = {
+    name: [value for value, _ in DailyLog._meta.get_field(name).choices]
+    for name in CHOICE_FEATURES
+}
+
+_CODES = {name: {value: code for code, value in enumerate(values)} for name, values in CATEGORIES.items()}
+
+_AGGREGATE, _LOG = 0, 1
+
+# Correlations relate each daily-log factor to the daily mood average.
+# At lag k the factor on day t - k is paired with mood on day t.
+TARGET = 'average_mood'
+FACTORS = LOG_FEATURES + CHOICE_FEATURES
+LAGS = (0, 1)
+MIN_SAMPLES = 10
+MIN_GROUP_SAMPLES = 3
+CORRELATIONS_TIMEOUT = 60 * 60 * 24
+
+# Rolling windows for graph trend lines, in calendar days
+MIN_ROLLING_WINDOW = 2
+MAX_ROLLING_WINDOW = 90
+# Days of history read before the range, in windows, so the first days
+# have full windows and the exponential trend has settled
+ROLLING_LEAD_WINDOWS = 3
+
+TAG_IMPACT_TIMEOUT = 60 * 60 * 24
+# Two-sided 95 % quantiles: normal, and Student's t for 1-10 degrees of freedom
+_Z_975 = 1.959963984540054
+_T_975_SMALL = np.array([12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228])
+
+
+def feature_matrix(user, start, end):
+    """
+    Build the feature matrix for ``user`` between ``start`` and ``end``.
+
+    Returns a dict with ``dates`` (datetime64[D], one per day, inclusive),
+    ``values`` (feature -> float64 array, NaN where missing), ``masks``
+    (feature -> bool array, True where missing) and ``logged`` (True where
+    a daily log exists). Days without entries have no aggregate, so their
+    mood columns are masked rather than zero.
+    """
+    dates = np.arange(start, end + timedelta(days=1), dtype='datetime64[D]')
+    values = np.full((len(FEATURES), len(dates)), np.nan)
+    logged = np.zeros(len(dates), dtype=bool)
+
+    rows = _fetch(user.pk, start, end)
+    if rows:
+        sources = np.array([row[0] for row in rows])
+        offsets = (np.array([row[1] for row in rows], dtype='datetime64[D]') - dates[0]).astype(np.int64)
+        matrix = np.array([_encode(row[2:]) for row in rows], dtype=np.float64)
+
+        # Each feature comes from exactly one table, so the two halves of
+        # the union are scattered into disjoint rows of the matrix
+        for source, names in ((_AGGREGATE, AGGREGATE_FEATURES), (_LOG, LOG_FEATURES + CHOICE_FEATURES)):
+            columns = [FEATURES.index(name) for name in names]
+            picked = sources == source
+            values[np.ix_(columns, offsets[picked])] = matrix[np.ix_(picked, columns)].T
+        logged[offsets[sources == _LOG]] = True
+
+    masks = np.isnan(values)
+    return {
+        'dates': dates,
+        'values': dict(zip(FEATURES, values)),
+        'masks': dict(zip(FEATURES, masks)),
+        'logged': logged,
+    }
+
+
+def to_json(matrix):
+    """Column-oriented JSON form of a feature matrix; masked values are null."""
+    return {
+        'start': str(matrix['dates'][0]) if len(matrix['dates']) else None,
+        'end': str(matrix['dates'][-1]) if len(matrix['dates']) else None,
+        'dates': [str(day) for day in matrix['dates']],
+        'columns': {
+            name: [None if missing else float(value) for value, missing in zip(column, matrix['masks'][name])]
+            for name, column in matrix['values'].items()
+        },
+        'masks': {name: mask.tolist() for name, mask in matrix['masks'].items()},
+        'categories': CATEGORIES,
+    }
+
+
+def correlate(matrix):
+    """
+    Correlate every factor with the mood average at each lag.
+
+    All factors are handled together as rows of one 2-D array; each pair
+    of series only uses the days where both are present. Pairs with fewer
+    than ``MIN_SAMPLES`` days get no statistics.
+
+    ``mean_difference`` is the mean mood on days the factor is above its
+    median minus the mean mood on the remaining days, so for substance
+    fields it compares days with and without use.
+    """
+    target = matrix['values'][TARGET]
+    factors = np.vstack([matrix['values'][name] for name in FACTORS])
+
+    results = []
+    for lag in LAGS:
+        x = factors[:, :len(target) - lag]
+        y = np.broadcast_to(target[lag:], x.shape)
+        valid = ~np.isnan(x) & ~np.isnan(y)
+        counts = valid.sum(axis=1)
+
+        pearson = _pearson(x, y, valid)
+        spearman = _pearson(_ranks(x, valid), _ranks(y, valid), valid)
+        difference = _mean_difference(x, y, valid)
+        enough = counts >= MIN_SAMPLES
+
+        for index, name in enumerate(FACTORS):
+            results.append({
+                'factor': name,
+                'lag': lag,
+                'n': int(counts[index]),
+                'pearson': _stat(pearson[index], enough[index]),
+                'spearman': _stat(spearman[index], enough[index]),
+                'mean_difference': _stat(difference[index], enough[index]),
+            })
+
+    return {
+        'target': TARGET,
+        'days': len(target),
+        'min_samples': MIN_SAMPLES,
+        'results': results,
+    }
+
+
+def get_correlations(user):
+    """
+    Correlation results for ``user``, cached against the data version.
+
+    The data version is the row count and latest ``updated_at`` of the
+    user's aggregates and logs. When it changes and every changed row is
+    on or after some date, only the days from that date on are re-read
+    and spliced into the cached series; anything else, such as a deleted
+    row further back, rebuilds the series from scratch.
+    """
+    key = _correlations_key(user.pk)
+    cached = cache.get(key)
+    version = _data_version(user.pk, cached['version'] if cached else None)
+
+    if cached and _same_version(cached['version'], version):
+        return cached['result']
+
+    matrix = None
+    if cached:
+        matrix = _splice(user, cached['matrix'], version)
+    if matrix is None:
+        matrix = _full_matrix(user, version)
+
+    result = correlate(matrix)
+    cache.set(key, {'version': version, 'matrix': matrix, 'result': result}, CORRELATIONS_TIMEOUT)
+    return result
+
+
+def rolling_statistics(user, start, end, window):
+    """
+    Trend and volatility of the daily mood average between two dates.
+
+    For each day with an aggregate returns ``moving_average`` and
+    ``moving_std`` (population) over the ``window`` calendar days ending
+    that day, and ``trend``, an exponentially weighted average with span
+    ``window`` that decays per calendar day across gaps. Moving values are
+    computed with window functions in the database where the backend
+    supports ``RANGE`` frames, otherwise with NumPy.
+    """
+    lead_start = start - timedelta(days=window * ROLLING_LEAD_WINDOWS)
+    aggregates = DailyAggregate.objects.filter(
+        user=user,
+        date__gte=lead_start,
+        date__lte=end
+    ).order_by('date')
+
+    features = connection.features
+    if features.supports_over_clause and features.supports_frame_range_fixed_distance:
+        mood = Cast('average_mood', FloatField())
+        over = {
+            'order_by': DayNumber('date'),
+            'frame': ValueRange(start=-(window - 1), end=0),
+        }
+        rows = list(aggregates.annotate(
+            mood=mood,
+            moving_average=Window(Avg(mood), **over),
+            moving_square=Window(Avg(mood * mood), **over),
+        ).values_list('date', 'mood', 'moving_average', 'moving_square'))
+        dates = [row[0] for row in rows]
+        moods = np.array([row[1] for row in rows], dtype=np.float64)
+        means = np.array([row[2] for row in rows], dtype=np.float64)
+        squares = np.array([row[3] for row in rows], dtype=np.float64)
+        days = _day_numbers(dates)
+    else:
+        rows = list(aggregates.values_list('date', 'average_mood'))
+        dates = [row[0] for row in rows]
+        moods = np.array([row[1] for row in rows], dtype=np.float64)
+        days = _day_numbers(dates)
+        means, squares = _rolling_moments(days, moods, window)
+
+    # Clamp rounding noise before the square root
+    stds = np.sqrt(np.maximum(squares - means * means, 0.0))
+    trend = _ewma(days, moods, 2 / (window + 1))
+
+    return [
+        {
+            'date': day.isoformat(),
+            'moving_average': round(float(means[index]), 2),
+            'moving_std': round(float(stds[index]), 2),
+            'trend': round(float(trend[index]), 2),
+        }
+        for index, day in enumerate(dates)
+        if day >= start
+    ]
+
+
+def _day_numbers(dates):
+    return np.array(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def _rolling_moments(days, values, window):
+    """Moving mean and mean square over calendar-day windows via prefix sums."""
+    if not len(days):
+        return np.array([]), np.array([])
+    offsets = days - days[0]
+    length = offsets[-1] + 1
+    sums = np.zeros(length + 1)
+    squares = np.zeros(length + 1)
+    counts = np.zeros(length + 1)
+    sums[offsets + 1] = values
+    squares[offsets + 1] = values * values
+    counts[offsets + 1] = 1
+    sums, squares, counts = sums.cumsum(), squares.cumsum(), counts.cumsum()
+
+    upper = offsets + 1
+    lower = np.maximum(upper - window, 0)
+    n = counts[upper] - counts[lower]
+    return (sums[upper] - sums[lower]) / n, (squares[upper] - squares[lower]) / n
+
+
+def _ewma(days, values, alpha):
+    trend = np.empty_like(values)
+    for index, value in enumerate(values):
+        if index == 0:
+            trend[index] = value
+            continue
+        # A gap of g days decays the previous level as g daily steps would
+        weight = 1 - (1 - alpha) ** (days[index] - days[index - 1])
+        trend[index] = trend[index - 1] + weight * (value - trend[index - 1])
+    return trend
+
+
+def tag_impact(user):
+    """
+    Mood with and without each tag, over the user's entries.
+
+    Per tag returns the number of tagged entries, the average mood of
+    entries with and without the tag, their difference and a 95 % Welch
+    confidence interval for it (null with fewer than two entries on
+    either side). Tags without entries are left out.
+
+    Per-tag count, sum and sum of squares come from one GROUP BY over
+    the tag through table joined to entries and are cached per user
+    against the entry count, mood sum and latest ``updated_at``, which
+    are read on every call in a single aggregate query.
+    """
+    mood = F('mood_level')
+    totals = MoodEntry.objects.filter(user=user).aggregate(
+        count=Count('id'),
+        total=Sum(mood),
+        squares=Sum(mood * mood),
+        updated=Max('updated_at'),
+    )
+    version = (totals['count'], totals['total'], totals['updated'])
+
+    key = _tag_impact_key(user.pk)
+    cached = cache.get(key)
+    if cached and cached['version'] == version:
+        groups = cached['groups']
+    else:
+        groups = _tag_groups(user)
+        cache.set(key, {'version': version, 'groups': groups}, TAG_IMPACT_TIMEOUT)
+
+    tag_map = get_tag_map(user.pk)
+    groups = [group for group in groups if group[0] in tag_map]
+    if not groups:
+        return []
+
+    ids = [group[0] for group in groups]
+    n_with, sum_with, squares_with = (np.array(column, dtype=np.float64) for column in list(zip(*groups))[1:])
+    n_without = totals['count'] - n_with
+    sum_without = (totals['total'] or 0) - sum_with
+    squares_without = (totals['squares'] or 0) - squares_with
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_with = sum_with / n_with
+        mean_without = sum_without / n_without
+        # Sample variances from sums; clamp rounding noise at zero
+        var_with = np.maximum(squares_with - n_with * mean_with ** 2, 0) / (n_with - 1)
+        var_without = np.maximum(squares_without - n_without * mean_without ** 2, 0) / (n_without - 1)
+        se2_with, se2_without = var_with / n_with, var_without / n_without
+        se = np.sqrt(se2_with + se2_without)
+        # Welch-Satterthwaite degrees of freedom
+        df = (se2_with + se2_without) ** 2 / (
+            se2_with ** 2 / (n_with - 1) + se2_without ** 2 / (n_without - 1)
+        )
+    difference = mean_with - mean_without
+    margin = _t_975(df) * se
+    has_interval = (n_with >= 2) & (n_without >= 2)
+
+    results = []
+    for index, tag_id in enumerate(ids):
+        interval = has_interval[index] and np.isfinite(margin[index])
+        results.append({
+            'tag': tag_map[tag_id],
+            'entry_count': int(n_with[index]),
+            'average_with': _rounded(mean_with[index]),
+            'average_without': _rounded(mean_without[index]),
+            'difference': _rounded(difference[index]),
+            'ci_low': _rounded(difference[index] - margin[index]) if interval else None,
+            'ci_high': _rounded(difference[index] + margin[index]) if interval else None,
+        })
+    results.sort(key=lambda result: (-result['entry_count'], result['tag']['name']))
+    return results
+
+
+def _tag_groups(user):
+    """``(tag_id, count, sum, sum of squares)`` per tag, in one grouped query."""
+    through = MoodEntry.tags.through
+    mood = F('moodentry__mood_level')
+    rows = through.objects.filter(moodentry__user=user).values('tag_id').annotate(
+        count=Count('moodentry_id'),
+        total=Sum(mood),
+        squares=Sum(mood * mood),
+    ).order_by().values_list('tag_id', 'count', 'total', 'squares')
+    return [tuple(row) for row in rows]
+
+
+def _t_975(df):
+    """
+    97.5 % quantile of Student's t for (possibly fractional) ``df``.
+
+    Small ``df`` are rounded down into a table of exact values, which
+    errs on the wide side; larger ones use the Cornish-Fisher expansion,
+    within 0.001 of the exact value there. NaN passes through.
+    """
+    df = np.asarray(df, dtype=np.float64)
+    z = _Z_975
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        expansion = (
+            z
+            + (z ** 3 + z) / (4 * df)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3)
+        )
+        small = np.clip(np.nan_to_num(np.floor(df), nan=1), 1, len(_T_975_SMALL)).astype(int) - 1
+    return np.where(df < len(_T_975_SMALL) + 1, _T_975_SMALL[small], expansion)
+
+
+def _rounded(value):
+    if np.isnan(value):
+        return None
+    return round(float(value), 2)
+
+
+def _tag_impact_key(user_id):
+    return f'moods:tag-impact:{user_id}'
+
+
+def _correlations_key(user_id):
+    return f'moods:correlations:{user_id}'
+
+
+def _data_version(user_id, previous=None):
+    """
+    Per-table ``count``, ``max_updated``, ``first``/``last`` date and
+    ``changed_from``, the earliest date updated after ``previous``.
+    """
+    quote = connection.ops.quote_name
+    updated, day = quote('updated_at'), quote('date')
+
+    def select(source, model):
+        return (
+            f'SELECT {source}, COUNT(*), MAX({updated}), MIN({day}), MAX({day}), '
+            f'MIN(CASE WHEN {updated} > %s THEN {day} END) '
+            f'FROM {quote(model._meta.db_table)} WHERE {quote("user_id")} = %s'
+        )
+
+    sql = select(_AGGREGATE, DailyAggregate) + ' UNION ALL ' + select(_LOG, DailyLog)
+    params = []
+    for source in (_AGGREGATE, _LOG):
+        params += [previous[source]['max_updated'] if previous else None, user_id]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    return {
+        source: {
+            'count': count,
+            'max_updated': max_updated,
+            'first': _as_date(first),
+            'last': _as_date(last),
+            'changed_from': _as_date(changed_from),
+        }
+        for source, count, max_updated, first, last, changed_from in rows
+    }
+
+
+def _same_version(old, new):
+    return all(
+        old[source]['count'] == new[source]['count']
+        and old[source]['max_updated'] == new[source]['max_updated']
+        for source in (_AGGREGATE, _LOG)
+    )
+
+
+def _date_range(version):
+    firsts = [version[source]['first'] for source in version if version[source]['first']]
+    lasts = [version[source]['last'] for source in version if version[source]['last']]
+    if not firsts:
+        return None, None
+    return min(firsts), max(lasts)
+
+
+def _full_matrix(user, version):
+    start, end = _date_range(version)
+    if start is None:
+        return _empty_matrix()
+    return feature_matrix(user, start, end)
+
+
+def _splice(user, cached, version):
+    """Re-read only the changed tail of a cached series, or return None."""
+    start, end = _date_range(version)
+    changed = [version[source]['changed_from'] for source in version if version[source]['changed_from']]
+    if start is None or not changed or not len(cached['dates']):
+        return None
+    changed_from = min(changed)
+    if start != cached['dates'][0].item() or changed_from < start:
+        return None
+
+    offset = (changed_from - start).days
+    tail = feature_matrix(user, changed_from, end)
+    length = offset + len(tail['dates'])
+
+    def join(head, rest, fill):
+        head = head[:offset]
+        gap = np.full(offset - len(head), fill, dtype=head.dtype)
+        return np.concatenate([head, gap, rest])[:length]
+
+    matrix = {
+        'dates': np.arange(start, end + timedelta(days=1), dtype='datetime64[D]'),
+        'values': {name: join(cached['values'][name], tail['values'][name], np.nan) for name in FEATURES},
+        'masks': {name: join(cached['masks'][name], tail['masks'][name], True) for name in FEATURES},
+        'logged': join(cached['logged'], tail['logged'], False),
+    }
+
+    # A deletion before the changed tail leaves the row counts short
+    aggregates = int((~matrix['masks'][TARGET]).sum())
+    logs = int(matrix['logged'].sum())
+    if aggregates != version[_AGGREGATE]['count'] or logs != version[_LOG]['count']:
+        return None
+    return matrix
+
+
+def _empty_matrix():
+    return {
+        'dates': np.array([], dtype='datetime64[D]'),
+        'values': {name: np.array([], dtype=np.float64) for name in FEATURES},
+        'masks': {name: np.array([], dtype=bool) for name in FEATURES},
+        'logged': np.array([], dtype=bool),
+    }
+
+
+def _pearson(x, y, valid):
+    """Row-wise Pearson correlation over the days marked ``valid``."""
+    counts = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = np.where(valid, x, 0.0).sum(axis=1) / counts
+        y_mean = np.where(valid, y, 0.0).sum(axis=1) / counts
+        dx = np.where(valid, x - x_mean[:, None], 0.0)
+        dy = np.where(valid, y - y_mean[:, None], 0.0)
+        return (dx * dy).sum(axis=1) / np.sqrt((dx * dx).sum(axis=1) * (dy * dy).sum(axis=1))
+
+
+def _ranks(values, valid):
+    """Row-wise average ranks (ties share their mean rank) among valid days."""
+    ranks = np.full(values.shape, np.nan)
+    for row in range(values.shape[0]):
+        present = values[row, valid[row]]
+        if not present.size:
+            continue
+        _, inverse, counts = np.unique(present, return_inverse=True, return_counts=True)
+        ends = np.cumsum(counts)
+        ranks[row, valid[row]] = (ends - (counts - 1) / 2)[inverse]
+    return ranks
+
+
+def _mean_difference(x, y, valid):
+    with warnings.catch_warnings():
+        # Rows without any valid day have no median
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median = np.nanmedian(np.where(valid, x, np.nan), axis=1)
+
+    high = valid & (x > median[:, None])
+    low = valid & (x <= median[:, None])
+    high_count, low_count = high.sum(axis=1), low.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        difference = (
+            np.where(high, y, 0.0).sum(axis=1) / high_count
+            - np.where(low, y, 0.0).sum(axis=1) / low_count
+        )
+    too_small = (high_count < MIN_GROUP_SAMPLES) | (low_count < MIN_GROUP_SAMPLES)
+    difference[too_small] = np.nan
+    return difference
+
+
+def _stat(value, enough):
+    if not enough or np.isnan(value):
+        return None
+    return round(float(value), 4)
+
+
+def _as_date(value):
+    if value is None:
+        return None
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+def _fetch(user_id, start, end):
+    """
+    Aggregate and log rows for the range in one UNION ALL statement.
+
+    Each row is ``(source, date, *FEATURES)`` with NULL in the columns the
+    other table provides, which stands in for a full outer join on date.
+    """
+    quote = connection.ops.quote_name
+
+    def select(source, model, own):
+        table = quote(model._meta.db_table)
+        columns = ', '.join(
+            quote(model._meta.get_field(name).column) if name in own else 'NULL'
+            for name in FEATURES
+        )
+        return (
+            f'SELECT {source}, {quote("date")}, {columns} FROM {table} '
+            f'WHERE {quote("user_id")} = %s AND {quote("date")} >= %s AND {quote("date")} <= %s'
+        )
+
+    sql = (
+        select(_AGGREGATE, DailyAggregate, AGGREGATE_FEATURES)
+        + ' UNION ALL '
+        + select(_LOG, DailyLog, LOG_FEATURES + CHOICE_FEATURES)
+    )
+    params = [user_id, start, end] * 2
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _encode(row):
+    encoded = []
+    for name, value in zip(FEATURES, row):
+        if value is None:
+            encoded.append(None)
+        elif name in _CODES:
+            # Blank strings and stale values count as missing
+            encoded.append(_CODES[name].get(value))
+        else:
+            encoded.append(float(value))
+    return encoded
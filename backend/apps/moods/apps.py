@@ -5,3 +5,6 @@ class MoodsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.moods'
     verbose_name = 'Humör'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,14 @@
+"""
+Request authentication.
+
+Sub-requests of a batch carry the caller that ``BatchView`` already
+authenticated, so their views don't look the token up again.
+"""
+from rest_framework.authentication import BaseAuthentication
+
+
+class BatchCallerAuthentication(BaseAuthentication):
+    """The ``(user, auth)`` a batch hands to its sub-requests as ``batch_caller``."""
+
+    def authenticate(self, request):
+        return getattr(request, 'batch_caller', None)
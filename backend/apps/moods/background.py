@@ -0,0 +1,115 @@
+"""
+Helpers for running work outside the request/response cycle.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# pool name -> setting with its number of worker threads
+POOLS = {
+    'default': 'BACKGROUND_WORKERS',
+    'reflections': 'REFLECTION_WORKERS',
+}
+
+_executors = {}
+_executor_lock = threading.Lock()
+
+
+def run_after_response(response, func, *args, **kwargs):
+    """
+    Call ``func(*args, **kwargs)`` once ``response`` has been sent.
+
+    The server closes the response after the body has been written, so
+    the client never waits for the deferred work. Failures are logged
+    instead of being swallowed by Django's response closing.
+    """
+    def callback():
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception('Deferred task %s failed', _name(func))
+
+    _deferred(response).append(callback)
+
+
+def transfer_after_response(source, target):
+    """Move work deferred on ``source`` so it runs when ``target`` closes."""
+    _deferred(target).extend(_deferred(source))
+    discard_after_response(source)
+
+
+def discard_after_response(response):
+    """Drop the work deferred on ``response``, e.g. after a rollback."""
+    _deferred(response).clear()
+
+
+def _deferred(response):
+    """The callbacks run when ``response`` closes, hooking its close() once."""
+    if 'deferred_tasks' not in response.__dict__:
+        response.deferred_tasks = []
+        close = response.close
+
+        def close_after_tasks():
+            # Before close(), which ends the request and its DB connection
+            for callback in response.deferred_tasks:
+                callback()
+            close()
+
+        response.close = close_after_tasks
+    return response.deferred_tasks
+
+
+def submit(func, *args, **kwargs):
+    """
+    Run ``func(*args, **kwargs)`` on the process-wide background pool.
+
+    The pool is bounded by ``BACKGROUND_WORKERS``. Inside a transaction
+    the task is handed over once it commits, so it never runs against
+    rows that are not visible yet or were rolled back. With
+    ``BACKGROUND_TASKS_INLINE`` enabled (e.g. in tests) the call runs
+    synchronously in the calling thread instead, at the same point.
+    """
+    submit_to('default', func, *args, **kwargs)
+
+
+def submit_to(pool, func, *args, **kwargs):
+    """
+    Like ``submit`` but on the named pool from ``POOLS``.
+
+    Slow work such as LLM calls gets its own pool so it can't hold up
+    the short deferred tasks on the default one.
+    """
+    if settings.BACKGROUND_TASKS_INLINE:
+        transaction.on_commit(lambda: func(*args, **kwargs))
+        return
+
+    def task():
+        close_old_connections()
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception('Background task %s failed', _name(func))
+        finally:
+            # Worker threads hold their own connections; don't leak them
+            connections.close_all()
+
+    transaction.on_commit(lambda: _get_executor(pool).submit(task))
+
+
+def _get_executor(pool):
+    with _executor_lock:
+        if pool not in _executors:
+            _executors[pool] = ThreadPoolExecutor(
+                max_workers=getattr(settings, POOLS[pool]),
+                thread_name_prefix=f'background-{pool}'
+            )
+        return _executors[pool]
+
+
+def _name(func):
+    return getattr(func, '__qualname__', repr(func))
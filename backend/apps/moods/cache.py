@@ -0,0 +1,33 @@
+"""
+Cached per-user lookups for mood tracking.
+"""
+from django.core.cache import cache
+
+TAG_MAP_TIMEOUT = 300
+
+
+def _tag_map_key(user_id):
+    return f'moods:tag-map:{user_id}'
+
+
+def get_tag_map(user_id, refresh=False):
+    """
+    Return ``{tag_id: serialized tag}`` for a user's tags.
+
+    Used to render entry tags from ``MoodEntry.tag_ids`` without joining
+    the tag tables. Invalidated whenever one of the user's tags changes.
+    """
+    from .models import Tag
+    from .serializers import TagSerializer
+
+    key = _tag_map_key(user_id)
+    tag_map = None if refresh else cache.get(key)
+    if tag_map is None:
+        tags = Tag.objects.filter(user_id=user_id)
+        tag_map = {tag.id: dict(TagSerializer(tag).data) for tag in tags}
+        cache.set(key, tag_map, TAG_MAP_TIMEOUT)
+    return tag_map
+
+
+def invalidate_tag_map(user_id):
+    cache.delete(_tag_map_key(user_id))
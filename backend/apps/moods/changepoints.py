@@ -0,0 +1,199 @@
+"""
+Online change-point detection on the daily mood average.
+
+A two-sided CUSUM runs against a slowly adapting baseline. Each
+finalized day is fed once through ``step``, which only touches the small
+state dict stored in ``MoodChangeDetector.state``:
+
+- The first ``WARMUP_DAYS`` days only estimate the baseline mean and
+  variance.
+- After that each day is standardized against the baseline, and the low
+  and high CUSUM sums grow while days sit more than ``SLACK`` standard
+  deviations below or above it. Crossing ``THRESHOLD`` starts a low or
+  high period, dated from the day the sum started growing.
+- A period ends after ``RECOVERY_DAYS`` days in a row within
+  ``RECOVERY_Z`` standard deviations of the baseline.
+- The baseline only adapts during normal periods, so a long dip does not
+  become the new normal.
+
+A change to a day that has already been fed rewinds the detector to that
+day (``rewind``).
+"""
+import math
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DailyAggregate, MoodChangeDetector, MoodChangePoint
+
+WARMUP_DAYS = 7
+BASELINE_WEIGHT = 0.05
+SLACK = 0.5
+THRESHOLD = 4.0
+MIN_SD = 0.5
+RECOVERY_DAYS = 2
+RECOVERY_Z = 1.0
+
+NORMAL = MoodChangePoint.Kind.NORMAL
+LOW = MoodChangePoint.Kind.LOW
+HIGH = MoodChangePoint.Kind.HIGH
+
+
+def step(state, day, value):
+    """
+    Feed one day's average into ``state`` (updated in place).
+
+    Returns a list of ``(kind, start_date)`` changes detected on this day.
+    """
+    n = state.get('n', 0)
+    mean = state.get('mean', 0.0)
+    if n < WARMUP_DAYS:
+        # Welford's running mean and variance
+        n += 1
+        delta = value - mean
+        mean += delta / n
+        m2 = state.get('m2', 0.0) + delta * (value - mean)
+        state.update(n=n, mean=mean, m2=m2, var=m2 / (n - 1) if n > 1 else 0.0)
+        return []
+
+    state['n'] = n + 1
+    regime = state.get('regime', NORMAL)
+    sd = max(math.sqrt(state['var']), MIN_SD)
+    z = (value - mean) / sd
+    today = day.isoformat()
+    changes = []
+
+    low = max(0.0, state.get('low', 0.0) - z - SLACK)
+    high = max(0.0, state.get('high', 0.0) + z - SLACK)
+    low_since = (state.get('low_since') or today) if low else None
+    high_since = (state.get('high_since') or today) if high else None
+
+    if low > THRESHOLD and regime != LOW:
+        changes.append((LOW, low_since))
+    elif high > THRESHOLD and regime != HIGH:
+        changes.append((HIGH, high_since))
+    elif regime != NORMAL:
+        if abs(z) < RECOVERY_Z:
+            state['recovery_since'] = state.get('recovery_since') or today
+            state['recovery_days'] = state.get('recovery_days', 0) + 1
+            if state['recovery_days'] >= RECOVERY_DAYS:
+                changes.append((NORMAL, state['recovery_since']))
+        else:
+            state['recovery_since'] = None
+            state['recovery_days'] = 0
+
+    if changes:
+        regime, start = changes[-1]
+        state.update(regime=regime, regime_start=start, recovery_since=None, recovery_days=0)
+        low = high = 0.0
+        low_since = high_since = None
+    elif regime == NORMAL:
+        # Exponentially weighted baseline, adapted on normal days only
+        delta = value - mean
+        state['mean'] = mean + BASELINE_WEIGHT * delta
+        state['var'] = (1 - BASELINE_WEIGHT) * (state['var'] + BASELINE_WEIGHT * delta * delta)
+    else:
+        # Inside a period the sums restart so the next change starts fresh
+        low = high = 0.0
+        low_since = high_since = None
+
+    state.update(low=low, high=high, low_since=low_since, high_since=high_since)
+    return [(kind, date.fromisoformat(start)) for kind, start in changes]
+
+
+def _feed(user, state, aggregates):
+    """Feed ``aggregates`` in date order into ``state``; returns unsaved change points."""
+    change_points = []
+    for day, average in aggregates.order_by('date').values_list('date', 'average_mood'):
+        baseline = state.get('mean', 0.0)
+        for kind, start in step(state, day, float(average)):
+            change_points.append(MoodChangePoint(
+                user=user, date=start, kind=kind, detected_on=day,
+                baseline=round(baseline, 2)
+            ))
+    return change_points
+
+
+def _unprocessed(user, detector, through):
+    aggregates = DailyAggregate.objects.filter(user=user, date__lte=through)
+    if detector.processed_through:
+        aggregates = aggregates.filter(date__gt=detector.processed_through)
+    return aggregates
+
+
+def advance(user, through):
+    """
+    Feed the user's days up to and including ``through`` that have not
+    been processed yet, and store any detected change points.
+    """
+    with transaction.atomic():
+        detector, _ = MoodChangeDetector.objects.select_for_update().get_or_create(user=user)
+        if detector.processed_through and detector.processed_through >= through:
+            return detector
+
+        change_points = _feed(user, detector.state, _unprocessed(user, detector, through))
+
+        detector.processed_through = through
+        detector.save()
+        MoodChangePoint.objects.bulk_create(change_points)
+    return detector
+
+
+def preview(user, through):
+    """
+    The detector and change points as ``advance(user, through)`` would
+    leave them, without saving anything.
+
+    Returns the (possibly unsaved) detector and the change points detected
+    on days that have not been processed yet.
+    """
+    detector = MoodChangeDetector.objects.filter(user=user).first() or MoodChangeDetector(user=user)
+    if detector.processed_through and detector.processed_through >= through:
+        return detector, []
+
+    change_points = _feed(user, detector.state, _unprocessed(user, detector, through))
+    detector.processed_through = through
+    return detector, change_points
+
+
+def rewind(user, day):
+    """
+    Redo detection from ``day`` on after a change to a day that has
+    already been processed.
+
+    The state as of the day before is not kept, so the stored history is
+    fed again from the start. Change points detected before ``day`` cannot
+    depend on it and are kept; the later ones are replaced.
+    """
+    with transaction.atomic():
+        detector = MoodChangeDetector.objects.select_for_update().filter(
+            user=user, processed_through__gte=day
+        ).first()
+        if detector is None:
+            return None
+
+        detector.state = {}
+        change_points = _feed(user, detector.state, DailyAggregate.objects.filter(
+            user=user, date__lte=detector.processed_through
+        ))
+
+        detector.save()
+        MoodChangePoint.objects.filter(user=user, detected_on__gte=day).delete()
+        MoodChangePoint.objects.bulk_create(
+            point for point in change_points if point.detected_on >= day
+        )
+    return detector
+
+
+def replay(user, through):
+    """Discard the user's detector state and change points and start over."""
+    with transaction.atomic():
+        MoodChangePoint.objects.filter(user=user).delete()
+        MoodChangeDetector.objects.filter(user=user).delete()
+        return advance(user, through)
+
+
+def last_final_day():
+    """Yesterday: the latest day that can no longer get new entries as today."""
+    return timezone.now().date() - timedelta(days=1)
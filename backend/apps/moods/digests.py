@@ -0,0 +1,136 @@
+"""
+Weekly digest precomputation.
+
+``build_digests`` summarizes one week for a whole shard of users with a
+fixed number of queries: one over ``DailyAggregate``, one over
+``DailyLog`` (this week and the one before, for factor changes) and one
+grouped query over the entry-tag through table.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import connections
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import MoodEntry, DailyAggregate, DailyLog, WeeklyDigest
+
+FACTORS = ('sleep_hours', 'sleep_quality', 'energy', 'anxiety', 'stress')
+TOP_TAGS = 3
+
+
+def week_start(day):
+    """Monday of the week containing ``day``."""
+    return day - timedelta(days=day.weekday())
+
+
+def previous_week_start(today=None):
+    """Monday of the last complete week."""
+    today = today or timezone.now().date()
+    return week_start(today) - timedelta(days=7)
+
+
+def pending_user_ids(start):
+    """Active users with entries in the week and no digest for it yet."""
+    done = WeeklyDigest.objects.filter(week_start=start).values('user_id')
+    return list(
+        DailyAggregate.objects.filter(
+            date__gte=start,
+            date__lt=start + timedelta(days=7),
+            user__is_active=True
+        ).exclude(
+            user_id__in=done
+        ).order_by('user_id').values_list('user_id', flat=True).distinct()
+    )
+
+
+def build_digests(user_ids, start):
+    """Unsaved ``WeeklyDigest`` objects for the week starting ``start``."""
+    end = start + timedelta(days=7)
+
+    days = defaultdict(list)
+    aggregates = DailyAggregate.objects.filter(
+        user_id__in=user_ids, date__gte=start, date__lt=end
+    ).order_by('user_id', 'date').values_list('user_id', 'date', 'average_mood', 'entry_count')
+    for user_id, day, average, count in aggregates:
+        days[user_id].append((day, average, count))
+
+    # Factor sums and counts per user for this week and the one before
+    factor_totals = defaultdict(lambda: defaultdict(lambda: [0.0, 0]))
+    logs = DailyLog.objects.filter(
+        user_id__in=user_ids, date__gte=start - timedelta(days=7), date__lt=end
+    ).values_list('user_id', 'date', *FACTORS)
+    for user_id, day, *values in logs:
+        period = 'current' if day >= start else 'previous'
+        for name, value in zip(FACTORS, values):
+            if value is not None:
+                totals = factor_totals[user_id][(period, name)]
+                totals[0] += float(value)
+                totals[1] += 1
+
+    # Entries in the week, by local day boundaries like DailyAggregate
+    tz = timezone.get_current_timezone()
+    tags = defaultdict(list)
+    tag_counts = MoodEntry.tags.through.objects.filter(
+        moodentry__user_id__in=user_ids,
+        moodentry__timestamp__gte=datetime.combine(start, time.min, tzinfo=tz),
+        moodentry__timestamp__lt=datetime.combine(end, time.min, tzinfo=tz),
+    ).values('moodentry__user_id', 'tag_id', 'tag__name').annotate(
+        count=Count('id')
+    ).order_by('moodentry__user_id', '-count', 'tag__name')
+    for row in tag_counts:
+        user_tags = tags[row['moodentry__user_id']]
+        if len(user_tags) < TOP_TAGS:
+            user_tags.append({'id': row['tag_id'], 'name': row['tag__name'], 'count': row['count']})
+
+    digests = []
+    for user_id, user_days in days.items():
+        entry_count = sum(count for _, _, count in user_days)
+        total = sum(average * count for _, average, count in user_days)
+        best = max(user_days, key=lambda item: (item[1], item[0]))
+        worst = min(user_days, key=lambda item: (item[1], item[0]))
+        digests.append(WeeklyDigest(
+            user_id=user_id,
+            week_start=start,
+            average_mood=round(total / entry_count, 2),
+            entry_count=entry_count,
+            days_logged=len(user_days),
+            best_day=best[0],
+            best_mood=best[1],
+            worst_day=worst[0],
+            worst_mood=worst[1],
+            top_tags=tags.get(user_id, []),
+            factors=_factor_highlights(factor_totals.get(user_id, {})),
+        ))
+    return digests
+
+
+def run_shard(user_ids, start):
+    """Build and store digests for one shard; returns the number written."""
+    digests = build_digests(user_ids, start)
+    # Conflicts mean a previous, interrupted run already wrote the row
+    WeeklyDigest.objects.bulk_create(digests, ignore_conflicts=True)
+    return len(digests)
+
+
+def init_worker():
+    """Process pool initializer: set up Django, never reuse a parent connection."""
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def _factor_highlights(totals):
+    highlights = {}
+    for name in FACTORS:
+        current_sum, current_count = totals.get(('current', name), (0.0, 0))
+        if not current_count:
+            continue
+        average = current_sum / current_count
+        previous_sum, previous_count = totals.get(('previous', name), (0.0, 0))
+        change = average - previous_sum / previous_count if previous_count else None
+        highlights[name] = {
+            'average': round(average, 2),
+            'change': round(change, 2) if change is not None else None,
+        }
+    return highlights
@@ -0,0 +1,164 @@
+"""
+Streaming export of a user's full history.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` and
+encoded one at a time, so memory use does not grow with the length of
+the history and the first bytes go out before the whole table is read.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+
+from .cache import get_tag_map
+from .models import Tag, MoodEntry, DailyAggregate, DailyLog, DailyReflection
+
+EXPORT_CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+
+# name -> (model, exported fields, ordering)
+DATASETS = {
+    'mood_entries': (
+        MoodEntry,
+        ('id', 'timestamp', 'mood_level', 'note', 'tag_ids'),
+        'timestamp',
+    ),
+    'daily_logs': (
+        DailyLog,
+        (
+            'date', 'logged_at',
+            'sleep_hours', 'sleep_quality',
+            'energy', 'appetite',
+            'anxiety', 'stress', 'concentration',
+            'exercise', 'social', 'daylight',
+            'alcohol', 'nicotine', 'other_substances',
+            'notes',
+        ),
+        'date',
+    ),
+    'daily_aggregates': (
+        DailyAggregate,
+        ('date', 'average_mood', 'min_mood', 'max_mood', 'entry_count'),
+        'date',
+    ),
+    'daily_reflections': (
+        DailyReflection,
+        ('date', 'entry', 'created_at'),
+        'date',
+    ),
+    'tags': (
+        Tag,
+        ('id', 'name', 'color', 'created_at'),
+        'name',
+    ),
+}
+
+
+def columns(dataset):
+    """Column names of an exported dataset."""
+    _, fields, _ = DATASETS[dataset]
+    return ['tags' if field == 'tag_ids' else field for field in fields]
+
+
+def iter_rows(user, dataset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield a user's rows of ``dataset`` as tuples in ``columns()`` order."""
+    model, fields, ordering = DATASETS[dataset]
+    rows = model.objects.filter(user=user).order_by(ordering).values_list(*fields)
+
+    if 'tag_ids' not in fields:
+        yield from rows.iterator(chunk_size=chunk_size)
+        return
+
+    # Tag names come from the cached tag map instead of a join
+    tag_map = get_tag_map(user.pk)
+    position = fields.index('tag_ids')
+    for row in rows.iterator(chunk_size=chunk_size):
+        names = [tag_map[tag_id]['name'] for tag_id in row[position] if tag_id in tag_map]
+        yield row[:position] + (names,) + row[position + 1:]
+
+
+def stream_ndjson(user, datasets):
+    """Yield NDJSON for ``datasets``, one ``{"type": ..., ...}`` object per row."""
+    def lines():
+        for dataset in datasets:
+            names = columns(dataset)
+            for row in iter_rows(user, dataset):
+                record = {'type': dataset, **dict(zip(names, map(_json_value, row)))}
+                yield json.dumps(record, ensure_ascii=False) + '\n'
+
+    return _buffered(lines())
+
+
+def stream_csv(user, dataset):
+    """Yield CSV for one dataset, starting with a header row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def lines():
+        writer.writerow(columns(dataset))
+        yield _drain(buffer)
+        for row in iter_rows(user, dataset):
+            writer.writerow([_csv_value(value) for value in row])
+            yield _drain(buffer)
+
+    return _buffered(lines())
+
+
+async def iterate_async(chunks):
+    """
+    Yield from the synchronous iterator ``chunks`` one chunk at a time.
+
+    Under ASGI Django reads a synchronous streaming body into a list
+    before sending it. Pulling each chunk in the request's sync thread
+    keeps the export streaming there.
+    """
+    pull = sync_to_async(next)
+    done = object()
+    try:
+        while (chunk := await pull(chunks, done)) is not done:
+            yield chunk
+    finally:
+        if hasattr(chunks, 'close'):
+            await sync_to_async(chunks.close)()
+
+
+def _buffered(pieces):
+    """Join small string pieces into larger chunks to cut down on writes."""
+    parts = []
+    size = 0
+    first = True
+    for piece in pieces:
+        parts.append(piece)
+        size += len(piece)
+        # Flush the first piece right away so the client sees progress
+        if first or size >= BUFFER_SIZE:
+            yield ''.join(parts)
+            parts.clear()
+            size = 0
+            first = False
+    if parts:
+        yield ''.join(parts)
+
+
+def _drain(buffer):
+    value = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return value
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return ';'.join(value)
+    return _json_value(value)
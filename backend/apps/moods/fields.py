@@ -0,0 +1,66 @@
+"""
+Custom model fields for mood tracking.
+"""
+import json
+
+from django.db import models
+from django.db.models.lookups import FieldGetDbPrepValueMixin, Lookup
+
+
+class TagIdArrayField(models.Field):
+    """
+    Sorted list of tag ids, denormalized from a many-to-many relation.
+
+    Stored as ``integer[]`` on PostgreSQL and as a JSON array in a text
+    column on other databases (SQLite). Supports ``__contains`` with a
+    list of ids, matching rows that hold all of them.
+    """
+
+    description = 'Lista med tagg-id:n'
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return 'integer[]'
+        return 'text'
+
+    def from_db_value(self, value, expression, connection):
+        return self.to_python(value)
+
+    def to_python(self, value):
+        if value is None:
+            return []
+        if isinstance(value, str):
+            value = json.loads(value)
+        return [int(item) for item in value]
+
+    def get_prep_value(self, value):
+        return sorted({int(item) for item in value or []})
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if connection.vendor == 'postgresql':
+            return value
+        return json.dumps(value)
+
+
+@TagIdArrayField.register_lookup
+class TagIdsContains(FieldGetDbPrepValueMixin, Lookup):
+    """Match rows whose id list contains every id in the given list."""
+
+    lookup_name = 'contains'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        sql = (
+            f'NOT EXISTS (SELECT 1 FROM json_each({rhs}) AS wanted '
+            f'WHERE wanted.value NOT IN (SELECT held.value FROM json_each({lhs}) AS held))'
+        )
+        return sql, (*rhs_params, *lhs_params)
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        # Array containment is served by the GIN index on the column
+        return f'{lhs} @> {rhs}::integer[]', (*lhs_params, *rhs_params)
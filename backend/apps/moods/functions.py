@@ -0,0 +1,36 @@
+"""
+Custom database functions for mood tracking.
+"""
+from django.db import models
+
+
+class DayNumber(models.Func):
+    """
+    Whole days since 1970-01-01 for a date expression.
+
+    Gives window functions a numeric ordering so ``RANGE`` frames can be
+    measured in calendar days.
+    """
+
+    output_field = models.IntegerField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template="(%(expressions)s - DATE '1970-01-01')",
+            **extra_context
+        )
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template="CAST(julianday(%(expressions)s) - 2440587.5 AS INTEGER)",
+            **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template="(TO_DAYS(%(expressions)s) - 719528)",
+            **extra_context
+        )
@@ -0,0 +1,30 @@
+"""
+Replay daily mood history through the change-point detector.
+
+Use for backfill or after changing detector settings:
+python manage.py detect_mood_changes [--user someone@example.com]
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from apps.moods import changepoints
+
+
+class Command(BaseCommand):
+    help = 'Rebuild change-point detector state and change points from history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only replay history for this email address.')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk')
+        if options['user']:
+            users = users.filter(email=options['user'])
+
+        through = changepoints.last_final_day()
+        replayed = 0
+        for user in users.iterator():
+            detector = changepoints.replay(user, through)
+            replayed += 1
+            self.stdout.write(f"{user.email}: {detector.state.get('regime', 'normal')}")
+        self.stdout.write(f'Replayed {replayed} users through {through}')
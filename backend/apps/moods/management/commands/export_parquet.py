@@ -0,0 +1,50 @@
+"""
+Export every user's data as Parquet files for analysis.
+
+Usage: python manage.py export_parquet /path/to/dir [--datasets a,b]
+"""
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.moods import parquet
+from apps.moods.export import DATASETS, EXPORT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Write database-wide Parquet files, one per dataset, with a user_id column.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help='Directory to write <dataset>.parquet files to.')
+        parser.add_argument(
+            '--datasets',
+            default=','.join(DATASETS),
+            help=f'Comma-separated datasets (default: {",".join(DATASETS)}).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help='Rows per cursor fetch and Parquet row group.'
+        )
+
+    def handle(self, *args, **options):
+        if not parquet.is_available():
+            raise CommandError('pyarrow is not installed.')
+
+        datasets = [name for name in options['datasets'].split(',') if name]
+        unknown = [name for name in datasets if name not in DATASETS]
+        if unknown:
+            raise CommandError(f'Unknown datasets: {", ".join(unknown)}')
+
+        output_dir = Path(options['output_dir'])
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        for dataset in datasets:
+            path = output_dir / f'{dataset}.parquet'
+            start = time.perf_counter()
+            rows = parquet.write_parquet(str(path), dataset, batch_size=options['batch_size'])
+            self.stdout.write(
+                f'{dataset}: {rows} rows -> {path} ({time.perf_counter() - start:.1f}s)'
+            )
@@ -0,0 +1,79 @@
+"""
+Pre-generate the day's reflections for opted-in users in one batch.
+
+Suitable for cron, e.g. every evening: python manage.py pregenerate_reflections
+
+Batches still processing from an earlier run are collected first, and a
+day with a batch in flight is not submitted again. Results are waited
+for up to ``--wait`` seconds; a batch that takes longer is picked up by
+the next run.
+
+Reflection jobs left active by a dead process are recovered first (see
+``reflections.recover_stale_jobs``).
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apps.moods import pregeneration, reflections
+from apps.moods.models import ReflectionBatch
+
+
+class Command(BaseCommand):
+    help = 'Submit the day\'s reflections for opted-in users as a batch and store the results.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to generate (default: today).')
+        parser.add_argument(
+            '--wait',
+            type=int,
+            default=3600,
+            help='Seconds to wait for batch results; 0 only checks once (default: 3600).'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=30,
+            help='Seconds between batch status checks (default: 30).'
+        )
+
+    def handle(self, *args, **options):
+        if options['date']:
+            day = parse_date(options['date'])
+            if day is None:
+                raise CommandError('--date must be a date, YYYY-MM-DD.')
+        else:
+            day = timezone.localdate()
+
+        error = reflections.configuration_error()
+        if error:
+            raise CommandError(error)
+
+        requeued, failed = reflections.recover_stale_jobs()
+        if requeued or failed:
+            self.stdout.write(f'Stale reflection jobs: {requeued} requeued, {failed} failed.')
+
+        pending = list(ReflectionBatch.objects.filter(status=ReflectionBatch.Status.PROCESSING))
+        if not any(batch.date == day for batch in pending):
+            batch = pregeneration.submit(day)
+            if batch is None:
+                self.stdout.write(f'{day}: no opted-in users to generate for.')
+            else:
+                self.stdout.write(f'{day}: submitted {batch.request_count} reflections as {batch.batch_id}.')
+                pending.append(batch)
+
+        deadline = time.monotonic() + options['wait']
+        while pending:
+            for batch in [batch for batch in pending if pregeneration.collect(batch)]:
+                pending.remove(batch)
+                self.stdout.write(
+                    f'{batch.date}: stored {batch.succeeded} reflections, {batch.failed} failed ({batch.batch_id}).'
+                )
+            if not pending or time.monotonic() >= deadline:
+                break
+            time.sleep(options['poll_interval'])
+
+        for batch in pending:
+            self.stdout.write(f'{batch.date}: {batch.batch_id} still processing; collect it with the next run.')
@@ -0,0 +1,28 @@
+"""
+Recompute MoodHeatmap rows from mood entries.
+
+Use for backfill or after bulk changes that bypass MoodEntry.save:
+python manage.py rebuild_mood_heatmaps [--user someone@example.com]
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from apps.moods.models import MoodHeatmap
+
+
+class Command(BaseCommand):
+    help = 'Rebuild hour-of-week mood heatmaps for all or one user.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild heatmaps for this email address.')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk')
+        if options['user']:
+            users = users.filter(email=options['user'])
+
+        rebuilt = rows = 0
+        for user in users.iterator():
+            rows += MoodHeatmap.rebuild(user)
+            rebuilt += 1
+        self.stdout.write(f'Rebuilt heatmaps for {rebuilt} users ({rows} rows)')
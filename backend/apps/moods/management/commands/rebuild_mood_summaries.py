@@ -0,0 +1,28 @@
+"""
+Recompute UserMoodSummary rows from entries and daily aggregates.
+
+Use for backfill or after bulk changes that bypass MoodEntry.save:
+python manage.py rebuild_mood_summaries [--user someone@example.com]
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from apps.moods.models import UserMoodSummary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild lifetime mood summaries and streaks for all or one user.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild the summary for this email address.')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk')
+        if options['user']:
+            users = users.filter(email=options['user'])
+
+        rebuilt = 0
+        for user in users.iterator():
+            UserMoodSummary.rebuild(user)
+            rebuilt += 1
+        self.stdout.write(f'Rebuilt {rebuilt} summaries')
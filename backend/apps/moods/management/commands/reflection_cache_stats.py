@@ -0,0 +1,28 @@
+"""
+Report how often reflections are served from the response cache.
+
+Usage: python manage.py reflection_cache_stats [--reset]
+
+The counters live in the configured cache, so they cover all processes
+only when a shared cache (REDIS_URL) is set up.
+"""
+from django.core.management.base import BaseCommand
+
+from apps.moods import reflections
+
+
+class Command(BaseCommand):
+    help = 'Show reflection response cache hits, misses and upstream time saved.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after reporting.')
+
+    def handle(self, *args, **options):
+        stats = reflections.cache_stats()
+        hit_rate = f"{stats['hit_rate']:.1%}" if stats['hit_rate'] is not None else '-'
+        self.stdout.write(
+            f"hits={stats['hits']} misses={stats['misses']} hit rate={hit_rate} "
+            f"saved={stats['saved_ms'] / 1000:.1f}s"
+        )
+        if options['reset']:
+            reflections.reset_cache_stats()
@@ -0,0 +1,47 @@
+"""
+Report latency, token usage and failures of reflection LLM calls.
+
+Usage: python manage.py reflection_call_report [--days 14] [--by day|model|prompt_version]
+
+Grouping by model or prompt version compares them over the same
+period, e.g. before and after a prompt change.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.moods import telemetry
+
+
+class Command(BaseCommand):
+    help = 'Show p50/p95/p99 latency, tokens and failures of reflection LLM calls.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=14, help='How many days back (default: 14).')
+        parser.add_argument('--by', choices=telemetry.GROUPS, default='day', help='Grouping (default: day).')
+
+    def handle(self, *args, **options):
+        group = options['by']
+        since = timezone.now() - timedelta(days=options['days'])
+        rows = sorted(telemetry.report(since, group), key=lambda row: str(row[group]))
+        if not rows:
+            self.stdout.write('No reflection calls in the period.')
+            return
+
+        self.stdout.write(
+            f"{group:<17} {'calls':>6} {'errors':>6} {'rejected':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ttft p50':>8} "
+            f"{'in tokens':>10} {'out tokens':>10}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{str(row[group] or '-'):<17} {row['calls']:>6} {row['errors']:>6} {row['rejected']:>8} "
+                f"{_ms(row['p50_ms'])} {_ms(row['p95_ms'])} {_ms(row['p99_ms'])} "
+                f"{_ms(row['first_token_p50_ms'])} "
+                f"{row['input_tokens']:>10} {row['output_tokens']:>10}"
+            )
+
+
+def _ms(value):
+    return f"{value if value is not None else '-':>8}"
@@ -0,0 +1,48 @@
+# Generated by Django 6.1.2 on 2026-10-19 08:07
+
+import apps.moods.fields
+from django.db import migrations
+
+
+def backfill_tag_ids(apps, schema_editor):
+    MoodEntry = apps.get_model('moods', 'MoodEntry')
+    Through = MoodEntry.tags.through
+
+    tag_ids = {}
+    for entry_id, tag_id in Through.objects.values_list('moodentry_id', 'tag_id').iterator():
+        tag_ids.setdefault(entry_id, []).append(tag_id)
+
+    entries = []
+    for entry_id, ids in tag_ids.items():
+        entries.append(MoodEntry(pk=entry_id, tag_ids=ids))
+    MoodEntry.objects.bulk_update(entries, ['tag_ids'], batch_size=500)
+
+
+def create_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX moods_moodentry_tag_ids_gin ON moods_moodentry USING gin (tag_ids)'
+        )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS moods_moodentry_tag_ids_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moods', '0009_add_daily_reflection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moodentry',
+            name='tag_ids',
+            field=apps.moods.fields.TagIdArrayField(blank=True, default=list, editable=False, verbose_name='tagg-id:n'),
+        ),
+        migrations.RunPython(backfill_tag_ids, migrations.RunPython.noop),
+        # GIN indexes only exist on PostgreSQL
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.1.2 on 2026-10-19 08:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moods', '0010_moodentry_tag_ids'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserMoodSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_entries', models.PositiveIntegerField(default=0, verbose_name='antal noteringar')),
+                ('mood_sum', models.PositiveBigIntegerField(default=0, verbose_name='summa humörnivåer')),
+                ('days_logged', models.PositiveIntegerField(default=0, verbose_name='antal dagar')),
+                ('first_date', models.DateField(blank=True, null=True, verbose_name='första dag')),
+                ('last_date', models.DateField(blank=True, null=True, verbose_name='senaste dag')),
+                ('streak_start', models.DateField(blank=True, null=True, verbose_name='svitens början')),
+                ('longest_streak', models.PositiveIntegerField(default=0, verbose_name='längsta svit')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='uppdaterad')),
+            ],
+            options={
+                'verbose_name': 'humörsammanfattning',
+                'verbose_name_plural': 'humörsammanfattningar',
+            },
+        ),
+        migrations.AddField(
+            model_name='usermoodsummary',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='mood_summary', to=settings.AUTH_USER_MODEL, verbose_name='användare'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.1.2 on 2026-10-19 08:34
+
+import apps.moods.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moods', '0011_user_mood_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoodHeatmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(blank=True, help_text='Tomt för hela historiken', null=True, verbose_name='månad')),
+                ('sums', models.JSONField(default=apps.moods.models._empty_cells, verbose_name='summor')),
+                ('counts', models.JSONField(default=apps.moods.models._empty_cells, verbose_name='antal')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='uppdaterad')),
+            ],
+            options={
+                'verbose_name': 'humörvärmekarta',
+                'verbose_name_plural': 'humörvärmekartor',
+            },
+        ),
+        migrations.AddField(
+            model_name='moodheatmap',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mood_heatmaps', to=settings.AUTH_USER_MODEL, verbose_name='användare'),
+        ),
+        migrations.AddConstraint(
+            model_name='moodheatmap',
+            constraint=models.UniqueConstraint(condition=models.Q(('month__isnull', True)), fields=('user',), name='unique_lifetime_mood_heatmap'),
+        ),
+        migrations.AddConstraint(
+            model_name='moodheatmap',
+            constraint=models.UniqueConstraint(fields=('user', 'month'), name='unique_monthly_mood_heatmap'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.1.2 on 2026-10-19 08:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moods', '0012_mood_heatmap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoodChangeDetector',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.JSONField(default=dict, verbose_name='tillstånd')),
+                ('processed_through', models.DateField(blank=True, null=True, verbose_name='bearbetad till')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='uppdaterad')),
+            ],
+            options={
+                'verbose_name': 'förändringsdetektor',
+                'verbose_name_plural': 'förändringsdetektorer',
+            },
+        ),
+        migrations.CreateModel(
+            name='MoodChangePoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='datum')),
+                ('kind', models.CharField(choices=[('low', 'Låg period'), ('high', 'Hög period'), ('normal', 'Normal')], max_length=10, verbose_name='typ')),
+                ('detected_on', models.DateField(verbose_name='upptäckt')),
+                ('baseline', models.DecimalField(decimal_places=2, max_digits=4, verbose_name='baslinje')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='skapad')),
+            ],
+            options={
+                'verbose_name': 'förändringspunkt',
+                'verbose_name_plural': 'förändringspunkter',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='moodchangedetector',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='mood_change_detector', to=settings.AUTH_USER_MODEL, verbose_name='användare'),
+        ),
+        migrations.AddField(
+            model_name='moodchangepoint',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mood_change_points', to=settings.AUTH_USER_MODEL, verbose_name='användare'),
+        ),
+        migrations.AddIndex(
+            model_name='moodchangepoint',
+            index=models.Index(fields=['user', '-date'], name='moods_moodc_user_id_815419_idx'),
+        ),
+    ]
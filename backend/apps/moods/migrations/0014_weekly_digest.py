@@ -0,0 +1,47 @@
+# Generated by Django 6.1.2 on 2026-10-19 08:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moods', '0013_mood_change_points'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeeklyDigest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField(verbose_name='veckans början')),
+                ('average_mood', models.DecimalField(decimal_places=2, max_digits=4, verbose_name='genomsnittligt humör')),
+                ('entry_count', models.PositiveIntegerField(verbose_name='antal noteringar')),
+                ('days_logged', models.PositiveSmallIntegerField(verbose_name='antal dagar')),
+                ('best_day', models.DateField(verbose_name='bästa dag')),
+                ('best_mood', models.DecimalField(decimal_places=2, max_digits=4, verbose_name='bästa dagens humör')),
+                ('worst_day', models.DateField(verbose_name='sämsta dag')),
+                ('worst_mood', models.DecimalField(decimal_places=2, max_digits=4, verbose_name='sämsta dagens humör')),
+                ('top_tags', models.JSONField(default=list, verbose_name='vanligaste taggar')),
+                ('factors', models.JSONField(default=dict, verbose_name='faktorer')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='skapad')),
+            ],
+            options={
+                'verbose_name': 'veckosammanfattning',
+                'verbose_name_plural': 'veckosammanfattningar',
+                'ordering': ['-week_start'],
+            },
+        ),
+        migrations.AddField(
+            model_name='weeklydigest',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_digests', to=settings.AUTH_USER_MODEL, verbose_name='användare'),
+        ),
+        migrations.AddConstraint(
+            model_name='weeklydigest',
+            constraint=models.UniqueConstraint(fields=('user', 'week_start'), name='unique_weekly_digest'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.1.2 on 2026-10-19 08:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moods', '0014_weekly_digest'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReflectionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='datum')),
+                ('status', models.CharField(choices=[('queued', 'I kö'), ('running', 'Pågår'), ('done', 'Klar'), ('failed', 'Misslyckades')], default='queued', max_length=10, verbose_name='status')),
+                ('prompt', models.TextField(verbose_name='underlag')),
+                ('error', models.TextField(blank=True, verbose_name='fel')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='skapad')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='startad')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='klar')),
+            ],
+            options={
+                'verbose_name': 'reflektionsjobb',
+                'verbose_name_plural': 'reflektionsjobb',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='reflectionjob',
+            name='reflection',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='moods.dailyreflection', verbose_name='dagreflektion'),
+        ),
+        migrations.AddField(
+            model_name='reflectionjob',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reflection_jobs', to=settings.AUTH_USER_MODEL, verbose_name='användare'),
+        ),
+        migrations.AddIndex(
+            model_name='reflectionjob',
+            index=models.Index(fields=['user', '-created_at'], name='moods_refle_user_id_35e0a1_idx'),
+        ),
+    ]
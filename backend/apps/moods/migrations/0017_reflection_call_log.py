@@ -0,0 +1,35 @@
+# Generated by Django 6.1.2 on 2026-10-19 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moods', '0016_reflection_job_single_flight'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReflectionCallLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='skapad')),
+                ('model', models.CharField(blank=True, max_length=100, verbose_name='modell')),
+                ('prompt_version', models.CharField(max_length=16, verbose_name='promptversion')),
+                ('streamed', models.BooleanField(default=False, verbose_name='strömmad')),
+                ('outcome', models.CharField(choices=[('ok', 'Lyckades'), ('error', 'Fel'), ('rejected', 'Avvisad'), ('cancelled', 'Avbruten')], max_length=10, verbose_name='utfall')),
+                ('error', models.CharField(blank=True, max_length=100, verbose_name='feltyp')),
+                ('wall_ms', models.PositiveIntegerField(verbose_name='total tid (ms)')),
+                ('first_token_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='tid till första token (ms)')),
+                ('input_tokens', models.PositiveIntegerField(blank=True, null=True, verbose_name='indatatokens')),
+                ('output_tokens', models.PositiveIntegerField(blank=True, null=True, verbose_name='utdatatokens')),
+                ('cache_read_tokens', models.PositiveIntegerField(blank=True, null=True, verbose_name='cachade indatatokens')),
+            ],
+            options={
+                'verbose_name': 'reflektionsanrop',
+                'verbose_name_plural': 'reflektionsanrop',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
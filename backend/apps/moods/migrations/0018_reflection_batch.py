@@ -0,0 +1,41 @@
+# Generated by Django 6.1.2 on 2026-10-19 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moods', '0017_reflection_call_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReflectionBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='datum')),
+                ('batch_id', models.CharField(max_length=100, unique=True, verbose_name='batch-id')),
+                ('status', models.CharField(choices=[('processing', 'Pågår'), ('done', 'Klar')], default='processing', max_length=10, verbose_name='status')),
+                ('request_count', models.PositiveIntegerField(verbose_name='antal förfrågningar')),
+                ('succeeded', models.PositiveIntegerField(default=0, verbose_name='lyckade')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='misslyckade')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='skapad')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='klar')),
+            ],
+            options={
+                'verbose_name': 'reflektionsbatch',
+                'verbose_name_plural': 'reflektionsbatcher',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='dailyreflection',
+            name='pregenerated',
+            field=models.BooleanField(default=False, verbose_name='förskapad'),
+        ),
+        migrations.AddIndex(
+            model_name='reflectionbatch',
+            index=models.Index(fields=['status', 'date'], name='moods_refle_status_0c750b_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-19 10:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moods', '0018_reflection_batch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usermoodsummary',
+            name='run_lengths',
+            field=models.JSONField(blank=True, null=True, verbose_name='svitlängder'),
+        ),
+    ]
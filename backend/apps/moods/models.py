@@ -4,14 +4,25 @@ Models for mood tracking.
 Core models:
 - MoodEntry: Individual mood measurements (atomic unit)
 - DailyAggregate: Pre-calculated daily summaries for efficient graphing
+- UserMoodSummary: Lifetime totals and streaks, maintained incrementally
+- MoodHeatmap: Hour-of-week mood counters, lifetime and per month
+- MoodChangeDetector / MoodChangePoint: Online detection of low and high periods
+- WeeklyDigest: Precomputed weekly summaries
+- DailyReflection / ReflectionJob: Generated reflections and their queued generation
+- ReflectionBatch: Nightly batch pre-generation of reflections for opted-in users
+- ReflectionCallLog: Latency, token usage and outcome of each upstream LLM call
 - Tag: Reusable tags for categorizing entries
 """
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
-from django.db.models import Avg, Count, Min, Max
+from datetime import datetime, time, timedelta
+
+from django.db import connection, models, transaction
+from django.db.models import Avg, Count, Min, Max, Sum
 from django.utils import timezone
 
+from .fields import TagIdArrayField
+
 
 class Tag(models.Model):
     """
@@ -72,6 +83,8 @@ class MoodEntry(models.Model):
     # Optional context
     note = models.TextField('anteckning', blank=True, max_length=500)
     tags = models.ManyToManyField(Tag, blank=True, related_name='entries', verbose_name='taggar')
+    # Denormalized copy of tags, kept in sync by signals.sync_entry_tag_ids
+    tag_ids = TagIdArrayField('tagg-id:n', default=list, blank=True, editable=False)
 
     # Timestamps
     timestamp = models.DateTimeField('tidpunkt', default=timezone.now)
@@ -90,17 +103,48 @@ class MoodEntry(models.Model):
     def __str__(self):
         return f"{self.user.email} - {self.mood_level} ({self.timestamp.strftime('%Y-%m-%d %H:%M')})"
 
-    def save(self, *args, **kwargs):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the heatmap counted, to move it on the next save
+        if 'timestamp' in instance.__dict__ and 'mood_level' in instance.__dict__:
+            instance._counted = (instance.timestamp, instance.mood_level)
+        return instance
+
+    def save(self, *args, update_aggregate=True, **kwargs):
+        previous = self._counted_state()
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # tag_ids belongs to the tag signals; an instance loaded before
+            # a tag change would otherwise write the old list back
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'tag_ids'
+            ]
         super().save(*args, **kwargs)
-        # Trigger daily aggregate update
-        DailyAggregate.update_for_date(self.user, self.timestamp.date())
+        # Trigger daily aggregate and heatmap updates (callers may defer them)
+        if update_aggregate:
+            DailyAggregate.update_for_date(self.user, self.timestamp.date())
+            MoodHeatmap.record(self.user, previous, (self.timestamp, self.mood_level))
+        self._counted = (self.timestamp, self.mood_level)
 
     def delete(self, *args, **kwargs):
         date = self.timestamp.date()
         user = self.user
+        previous = self._counted_state()
         super().delete(*args, **kwargs)
-        # Trigger daily aggregate update after deletion
+        # Trigger daily aggregate and heatmap updates after deletion
         DailyAggregate.update_for_date(user, date)
+        MoodHeatmap.record(user, previous, None)
+
+    def _counted_state(self):
+        """``(timestamp, mood_level)`` as last saved, or None for a new entry."""
+        if self._state.adding:
+            return None
+        if not hasattr(self, '_counted'):
+            self._counted = MoodEntry.objects.filter(pk=self.pk).values_list(
+                'timestamp', 'mood_level'
+            ).first()
+        return self._counted
 
     @property
     def mood_label(self):
@@ -174,9 +218,20 @@ class DailyAggregate(models.Model):
             avg=Avg('mood_level'),
             min=Min('mood_level'),
             max=Max('mood_level'),
+            sum=Sum('mood_level'),
             count=Count('id')
         )
 
+        previous = cls.objects.filter(user=user, date=date).values_list(
+            'average_mood', 'entry_count'
+        ).first()
+        if previous:
+            # The average is stored to two decimals, which recovers the
+            # integer sum exactly for fewer than 100 entries a day
+            old = (previous[1], int(round(previous[0] * previous[1])))
+        else:
+            old = (0, 0)
+
         if stats['count'] > 0:
             cls.objects.update_or_create(
                 user=user,
@@ -192,6 +247,554 @@ class DailyAggregate(models.Model):
             # No entries for this date, remove aggregate
             cls.objects.filter(user=user, date=date).delete()
 
+        new = (stats['count'], stats['sum'] or 0)
+        if new == old:
+            return
+        UserMoodSummary.apply_day_change(user, date, old, new)
+
+        from .changepoints import advance, rewind
+        # A backdated change to a day the detector has already seen
+        if MoodChangeDetector.objects.filter(user=user, processed_through__gte=date).exists():
+            rewind(user, date)
+
+        # The first entry of a day means the days before it are final
+        if not old[0] and new[0]:
+            advance(user, date - timedelta(days=1))
+
+
+class UserMoodSummary(models.Model):
+    """
+    Lifetime statistics for a user, one row per user.
+
+    Kept current by ``DailyAggregate.update_for_date``: totals change by
+    the day's delta, and streaks (runs of consecutive days with entries)
+    are adjusted around the changed day only. ``run_lengths`` counts runs
+    by length, so splitting the longest run never rescans the history.
+    ``rebuild`` recomputes everything from scratch.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='mood_summary',
+        verbose_name='användare'
+    )
+
+    total_entries = models.PositiveIntegerField('antal noteringar', default=0)
+    mood_sum = models.PositiveBigIntegerField('summa humörnivåer', default=0)
+    days_logged = models.PositiveIntegerField('antal dagar', default=0)
+    first_date = models.DateField('första dag', null=True, blank=True)
+    last_date = models.DateField('senaste dag', null=True, blank=True)
+
+    # Start of the run of consecutive days ending at last_date
+    streak_start = models.DateField('svitens början', null=True, blank=True)
+    longest_streak = models.PositiveIntegerField('längsta svit', default=0)
+    # {"<length>": number of runs that long}; null until first rebuilt
+    run_lengths = models.JSONField('svitlängder', null=True, blank=True)
+
+    updated_at = models.DateTimeField('uppdaterad', auto_now=True)
+
+    # Days read per query when walking a run of consecutive days
+    RUN_SCAN_DAYS = 366
+
+    class Meta:
+        verbose_name = 'humörsammanfattning'
+        verbose_name_plural = 'humörsammanfattningar'
+
+    def __str__(self):
+        return f"{self.user.email} ({self.total_entries} noteringar)"
+
+    @property
+    def average_mood(self):
+        if not self.total_entries:
+            return None
+        return round(self.mood_sum / self.total_entries, 2)
+
+    @property
+    def latest_streak(self):
+        if self.last_date is None:
+            return 0
+        return (self.last_date - self.streak_start).days + 1
+
+    def current_streak(self, today=None):
+        """The latest streak, if it reaches today or yesterday."""
+        today = today or timezone.now().date()
+        if self.last_date is None or self.last_date < today - timedelta(days=1):
+            return 0
+        return self.latest_streak
+
+    @classmethod
+    def apply_day_change(cls, user, date, old, new):
+        """
+        Apply a change of one day's ``(entry_count, mood_sum)`` from ``old``
+        to ``new``. Must run after the day's aggregate has been written.
+        """
+        with transaction.atomic():
+            summary = cls.objects.select_for_update().filter(user=user).first()
+            if summary is None or summary.run_lengths is None:
+                # No row yet (e.g. a user from before summaries existed) or
+                # one without run bookkeeping: build it once from the
+                # aggregates, which already include this change
+                cls._from_aggregates(user).save()
+                return
+            summary.total_entries += new[0] - old[0]
+            summary.mood_sum += new[1] - old[1]
+            if not old[0] and new[0]:
+                summary._add_day(date)
+            elif old[0] and not new[0]:
+                summary._remove_day(date)
+            summary.save()
+
+    @classmethod
+    def rebuild(cls, user):
+        """Recompute the summary from the user's entries and aggregates."""
+        totals = MoodEntry.objects.filter(user=user).aggregate(
+            count=Count('id'),
+            sum=Sum('mood_level')
+        )
+        summary = cls._from_aggregates(user)
+        summary.total_entries = totals['count']
+        summary.mood_sum = totals['sum'] or 0
+        summary.save()
+        return summary
+
+    @classmethod
+    def _from_aggregates(cls, user):
+        """
+        The summary as the daily aggregates describe it, unsaved.
+
+        Totals come from the aggregates too, so entries whose deferred
+        refresh is still pending are counted once that refresh applies.
+        """
+        summary = cls.objects.filter(user=user).first() or cls(user=user)
+        summary.total_entries = summary.mood_sum = summary.days_logged = 0
+        summary.first_date = summary.last_date = summary.streak_start = None
+        summary.run_lengths = {}
+
+        days = DailyAggregate.objects.filter(user=user).order_by('date').values_list(
+            'date', 'entry_count', 'average_mood'
+        )
+        for date, count, average in days.iterator():
+            summary.total_entries += count
+            summary.mood_sum += int(round(average * count))
+            summary.days_logged += 1
+            if summary.first_date is None:
+                summary.first_date = date
+            if summary.last_date is None or date != summary.last_date + timedelta(days=1):
+                if summary.last_date is not None:
+                    summary._count_run(summary.streak_start, summary.last_date, 1)
+                summary.streak_start = date
+            summary.last_date = date
+        if summary.last_date is not None:
+            summary._count_run(summary.streak_start, summary.last_date, 1)
+        summary.longest_streak = summary._longest_counted()
+        return summary
+
+    def _add_day(self, date):
+        self.days_logged += 1
+        if self.last_date is None:
+            self.first_date = self.last_date = self.streak_start = date
+            self.run_lengths = {'1': 1}
+            self.longest_streak = 1
+            return
+
+        if date > self.last_date:
+            if date == self.last_date + timedelta(days=1):
+                self._count_run(self.streak_start, self.last_date, -1)
+            else:
+                self.streak_start = date
+            self.last_date = date
+            self._count_run(self.streak_start, date, 1)
+            self.longest_streak = max(self.longest_streak, self.latest_streak)
+            return
+
+        # Backdated: the day may extend or join runs around it
+        self.first_date = min(self.first_date, date)
+        start, end = self._run_around(date)
+        if start < date:
+            self._count_run(start, date - timedelta(days=1), -1)
+        if end > date:
+            self._count_run(date + timedelta(days=1), end, -1)
+        self._count_run(start, end, 1)
+        self.longest_streak = self._longest_counted()
+        if end == self.last_date:
+            self.streak_start = start
+
+    def _remove_day(self, date):
+        self.days_logged -= 1
+        if not self.days_logged:
+            self.first_date = self.last_date = self.streak_start = None
+            self.run_lengths = {}
+            self.longest_streak = 0
+            return
+
+        aggregates = DailyAggregate.objects.filter(user_id=self.user_id)
+        before = aggregates.filter(date=date - timedelta(days=1)).exists()
+        after = aggregates.filter(date=date + timedelta(days=1)).exists()
+        run_start = self._run_around(date - timedelta(days=1))[0] if before else date
+        run_end = self._run_around(date + timedelta(days=1))[1] if after else date
+        # The run through the day splits into the parts on either side
+        self._count_run(run_start, run_end, -1)
+        if before:
+            self._count_run(run_start, date - timedelta(days=1), 1)
+        if after:
+            self._count_run(date + timedelta(days=1), run_end, 1)
+
+        if date == self.first_date:
+            self.first_date = aggregates.aggregate(first=Min('date'))['first']
+        if date == self.last_date:
+            self.last_date = aggregates.aggregate(last=Max('date'))['last']
+            self.streak_start = self._run_around(self.last_date)[0]
+        elif self.streak_start is not None and date >= self.streak_start:
+            self.streak_start = date + timedelta(days=1)
+        self.longest_streak = self._longest_counted()
+
+    def _count_run(self, start, end, delta):
+        """Add ``delta`` runs of the length from ``start`` to ``end`` to ``run_lengths``."""
+        key = str((end - start).days + 1)
+        count = self.run_lengths.get(key, 0) + delta
+        if count:
+            self.run_lengths[key] = count
+        else:
+            self.run_lengths.pop(key, None)
+
+    def _longest_counted(self):
+        return max(map(int, self.run_lengths), default=0)
+
+    def _run_around(self, date):
+        """First and last day of the run of consecutive days containing ``date``."""
+        aggregates = DailyAggregate.objects.filter(user_id=self.user_id)
+
+        start = date
+        while True:
+            window = set(aggregates.filter(
+                date__gte=start - timedelta(days=self.RUN_SCAN_DAYS),
+                date__lt=start
+            ).values_list('date', flat=True))
+            while start - timedelta(days=1) in window:
+                start -= timedelta(days=1)
+            # A full window means the run may continue past it
+            if len(window) < self.RUN_SCAN_DAYS:
+                break
+
+        end = date
+        while True:
+            window = set(aggregates.filter(
+                date__gt=end,
+                date__lte=end + timedelta(days=self.RUN_SCAN_DAYS)
+            ).values_list('date', flat=True))
+            while end + timedelta(days=1) in window:
+                end += timedelta(days=1)
+            if len(window) < self.RUN_SCAN_DAYS:
+                break
+
+        return start, end
+
+
+def _empty_cells():
+    return [0] * MoodHeatmap.CELLS
+
+
+class MoodHeatmap(models.Model):
+    """
+    Hour-of-week mood counters.
+
+    Sum and count of mood levels per local weekday and hour, as 168
+    cells starting with Monday 00:00. Each user has one lifetime row
+    (``month`` is null) and one row per calendar month with entries, so
+    recent windows add up a few monthly rows. Maintained by MoodEntry
+    saves and deletes.
+    """
+    CELLS = 7 * 24
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='mood_heatmaps',
+        verbose_name='användare'
+    )
+    month = models.DateField('månad', null=True, blank=True, help_text='Tomt för hela historiken')
+    sums = models.JSONField('summor', default=_empty_cells)
+    counts = models.JSONField('antal', default=_empty_cells)
+    updated_at = models.DateTimeField('uppdaterad', auto_now=True)
+
+    class Meta:
+        verbose_name = 'humörvärmekarta'
+        verbose_name_plural = 'humörvärmekartor'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(month__isnull=True),
+                name='unique_lifetime_mood_heatmap'
+            ),
+            models.UniqueConstraint(fields=['user', 'month'], name='unique_monthly_mood_heatmap'),
+        ]
+
+    def __str__(self):
+        period = self.month.strftime('%Y-%m') if self.month else 'totalt'
+        return f"{self.user.email} - {period}"
+
+    @staticmethod
+    def locate(timestamp):
+        """Cell index and first day of the month of ``timestamp`` in local time."""
+        local = timezone.localtime(timestamp)
+        return local.weekday() * 24 + local.hour, local.date().replace(day=1)
+
+    @classmethod
+    def record(cls, user, old=None, new=None):
+        """
+        Move one entry's contribution from ``old`` to ``new``.
+
+        Each is a ``(timestamp, mood_level)`` tuple or None, so creating,
+        editing and deleting an entry are all one call.
+        """
+        if old == new:
+            return
+
+        changes = {}
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None:
+                continue
+            cell, month = cls.locate(state[0])
+            for period in (None, month):
+                changes.setdefault(period, []).append((cell, sign * state[1], sign))
+
+        with transaction.atomic():
+            for month, deltas in changes.items():
+                heatmap = cls.objects.select_for_update().filter(user=user, month=month).first()
+                if heatmap is None:
+                    # No row yet (e.g. entries from before heatmaps existed):
+                    # the saved entries already include this change
+                    heatmap = cls._counted_from_entries(user, month)
+                    if month is None or any(heatmap.counts):
+                        heatmap.save()
+                    continue
+                for cell, mood, count in deltas:
+                    heatmap.sums[cell] += mood
+                    heatmap.counts[cell] += count
+                if month is not None and all(count <= 0 for count in heatmap.counts):
+                    heatmap.delete()
+                else:
+                    heatmap.save()
+
+    @classmethod
+    def _counted_from_entries(cls, user, month):
+        """An unsaved row for ``month`` (None for lifetime) counted from the user's entries."""
+        heatmap = cls(user=user, month=month)
+        entries = MoodEntry.objects.filter(user=user)
+        if month is not None:
+            next_month = (month + timedelta(days=32)).replace(day=1)
+            entries = entries.filter(
+                timestamp__gte=timezone.make_aware(datetime.combine(month, time.min)),
+                timestamp__lt=timezone.make_aware(datetime.combine(next_month, time.min))
+            )
+        for timestamp, mood_level in entries.values_list('timestamp', 'mood_level').iterator():
+            cell, _ = cls.locate(timestamp)
+            heatmap.sums[cell] += mood_level
+            heatmap.counts[cell] += 1
+        return heatmap
+
+    @classmethod
+    def rebuild(cls, user):
+        """Recompute all of a user's heatmap rows from their entries."""
+        heatmaps = {}
+        entries = MoodEntry.objects.filter(user=user).values_list('timestamp', 'mood_level')
+        for timestamp, mood_level in entries.iterator():
+            cell, month = cls.locate(timestamp)
+            for period in (None, month):
+                if period not in heatmaps:
+                    heatmaps[period] = cls(user=user, month=period)
+                heatmaps[period].sums[cell] += mood_level
+                heatmaps[period].counts[cell] += 1
+
+        with transaction.atomic():
+            cls.objects.filter(user=user).delete()
+            cls.objects.bulk_create(heatmaps.values())
+        return len(heatmaps)
+
+    @classmethod
+    def totals(cls, user, since=None):
+        """
+        Summed ``(sums, counts)`` over the lifetime row, or over the
+        monthly rows from ``since`` (a first-of-month date) on.
+        """
+        rows = cls.objects.filter(user=user)
+        if since is None:
+            rows = rows.filter(month__isnull=True)
+        else:
+            rows = rows.filter(month__gte=since)
+
+        sums, counts = _empty_cells(), _empty_cells()
+        for row_sums, row_counts in rows.values_list('sums', 'counts'):
+            sums = [a + b for a, b in zip(sums, row_sums)]
+            counts = [a + b for a, b in zip(counts, row_counts)]
+        return sums, counts
+
+
+class MoodChangeDetector(models.Model):
+    """
+    Per-user state of the online change-point detector.
+
+    ``state`` is a small JSON blob (baseline mean and variance, CUSUM
+    sums, current regime) advanced one finalized day at a time by
+    ``changepoints.advance``; ``processed_through`` is the last day fed.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='mood_change_detector',
+        verbose_name='användare'
+    )
+    state = models.JSONField('tillstånd', default=dict)
+    processed_through = models.DateField('bearbetad till', null=True, blank=True)
+    updated_at = models.DateTimeField('uppdaterad', auto_now=True)
+
+    class Meta:
+        verbose_name = 'förändringsdetektor'
+        verbose_name_plural = 'förändringsdetektorer'
+
+    def __str__(self):
+        return f"{self.user.email} - {self.state.get('regime', 'normal')}"
+
+
+class MoodChangePoint(models.Model):
+    """Start of a detected low or high period, or the return to normal."""
+
+    class Kind(models.TextChoices):
+        LOW = 'low', 'Låg period'
+        HIGH = 'high', 'Hög period'
+        NORMAL = 'normal', 'Normal'
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='mood_change_points',
+        verbose_name='användare'
+    )
+    date = models.DateField('datum')
+    kind = models.CharField('typ', max_length=10, choices=Kind.choices)
+    detected_on = models.DateField('upptäckt')
+    baseline = models.DecimalField('baslinje', max_digits=4, decimal_places=2)
+    created_at = models.DateTimeField('skapad', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'förändringspunkt'
+        verbose_name_plural = 'förändringspunkter'
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['user', '-date']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} - {self.date} ({self.kind})"
+
+
+class WeeklyDigest(models.Model):
+    """
+    Precomputed summary of one user's week (Monday to Sunday).
+
+    Built nightly by the build_weekly_digests command, see ``digests``.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='weekly_digests',
+        verbose_name='användare'
+    )
+    week_start = models.DateField('veckans början')
+
+    average_mood = models.DecimalField('genomsnittligt humör', max_digits=4, decimal_places=2)
+    entry_count = models.PositiveIntegerField('antal noteringar')
+    days_logged = models.PositiveSmallIntegerField('antal dagar')
+    best_day = models.DateField('bästa dag')
+    best_mood = models.DecimalField('bästa dagens humör', max_digits=4, decimal_places=2)
+    worst_day = models.DateField('sämsta dag')
+    worst_mood = models.DecimalField('sämsta dagens humör', max_digits=4, decimal_places=2)
+
+    # [{"id": ..., "name": ..., "count": ...}], most used first
+    top_tags = models.JSONField('vanligaste taggar', default=list)
+    # {factor: {"average": ..., "change": ...}}, change vs. the week before
+    factors = models.JSONField('faktorer', default=dict)
+
+    created_at = models.DateTimeField('skapad', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'veckosammanfattning'
+        verbose_name_plural = 'veckosammanfattningar'
+        ordering = ['-week_start']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'week_start'], name='unique_weekly_digest'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} - vecka {self.week_start}"
+
+
+class DailyLogManager(models.Manager):
+    """Manager with a single-statement upsert for daily logs."""
+
+    def upsert(self, user, rows):
+        """
+        Insert or update logs for ``user`` keyed on date.
+
+        Each row is a dict of field values including ``date``. Rows are
+        written with ``INSERT ... ON CONFLICT (user_id, date) DO UPDATE``;
+        on conflict only the fields present in the row are overwritten.
+        Rows sharing the same set of fields go in one statement.
+
+        Returns a list of ``(log, created)`` tuples in input order.
+        """
+        meta = self.model._meta
+        quote = connection.ops.quote_name
+        value_fields = [
+            field for field in meta.concrete_fields
+            if field.name not in ('id', 'user', 'date', 'created_at', 'updated_at')
+        ]
+        columns = ['user_id', 'date'] + [field.column for field in value_fields] + ['created_at', 'updated_at']
+        returning = ', '.join(quote(field.column) for field in meta.concrete_fields)
+
+        groups = {}
+        for index, row in enumerate(rows):
+            key = frozenset(name for name in row if name != 'date')
+            groups.setdefault(key, []).append(index)
+
+        now = timezone.now()
+        results = [None] * len(rows)
+        for provided, indexes in groups.items():
+            updated = [field.column for field in value_fields if field.name in provided] + ['updated_at']
+            batch_size = max(1, connection.ops.bulk_batch_size(columns, indexes))
+
+            for start in range(0, len(indexes), batch_size):
+                batch = indexes[start:start + batch_size]
+                params = []
+                for index in batch:
+                    row = rows[index]
+                    params.append(user.pk)
+                    params.append(meta.get_field('date').get_db_prep_save(row['date'], connection))
+                    for field in value_fields:
+                        value = row[field.name] if field.name in row else field.get_default()
+                        params.append(field.get_db_prep_save(value, connection))
+                    params.extend([
+                        meta.get_field('created_at').get_db_prep_save(now, connection),
+                        meta.get_field('updated_at').get_db_prep_save(now, connection),
+                    ])
+
+                placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+                sql = (
+                    f'INSERT INTO {quote(meta.db_table)} ({", ".join(quote(c) for c in columns)}) '
+                    f'VALUES {", ".join([placeholders] * len(batch))} '
+                    f'ON CONFLICT ({quote("user_id")}, {quote("date")}) DO UPDATE SET '
+                    + ', '.join(f'{quote(c)} = excluded.{quote(c)}' for c in updated)
+                    + f' RETURNING {returning}'
+                )
+                logs = {log.date: log for log in self.raw(sql, params)}
+                for index in batch:
+                    log = logs[rows[index]['date']]
+                    # created_at is never overwritten, so it only matches
+                    # updated_at when the row was inserted just now
+                    results[index] = (log, log.created_at == log.updated_at)
+
+        return results
+
 
 class DailyLog(models.Model):
     """
@@ -349,6 +952,8 @@ class DailyLog(models.Model):
     created_at = models.DateTimeField('skapad', auto_now_add=True)
     updated_at = models.DateTimeField('uppdaterad', auto_now=True)
 
+    objects = DailyLogManager()
+
     class Meta:
         verbose_name = 'daganteckning'
         verbose_name_plural = 'daganteckningar'
@@ -374,6 +979,8 @@ class DailyReflection(models.Model):
     )
     date = models.DateField('datum')
     entry = models.TextField('reflektion')
+    # Written by the nightly batch; the generate endpoints serve it as is
+    pregenerated = models.BooleanField('förskapad', default=False)
     created_at = models.DateTimeField('skapad', auto_now_add=True)
     updated_at = models.DateTimeField('uppdaterad', auto_now=True)
 
@@ -389,3 +996,128 @@ class DailyReflection(models.Model):
 
     def __str__(self):
         return f"{self.user.email} - {self.date}"
+
+
+class ReflectionJob(models.Model):
+    """
+    One requested generation of a DailyReflection.
+
+    The generate endpoint only creates the job; a worker from the
+    reflection pool calls the model and links the stored reflection.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'I kö'
+        RUNNING = 'running', 'Pågår'
+        DONE = 'done', 'Klar'
+        FAILED = 'failed', 'Misslyckades'
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='reflection_jobs',
+        verbose_name='användare'
+    )
+    date = models.DateField('datum')
+    status = models.CharField('status', max_length=10, choices=Status.choices, default=Status.QUEUED)
+    prompt = models.TextField('underlag')
+    reflection = models.ForeignKey(
+        DailyReflection,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        verbose_name='dagreflektion'
+    )
+    error = models.TextField('fel', blank=True)
+    created_at = models.DateTimeField('skapad', auto_now_add=True)
+    started_at = models.DateTimeField('startad', null=True, blank=True)
+    finished_at = models.DateTimeField('klar', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'reflektionsjobb'
+        verbose_name_plural = 'reflektionsjobb'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+        ]
+        constraints = [
+            # At most one generation in flight per user and day, see reflections.claim
+            models.UniqueConstraint(
+                fields=['user', 'date'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='unique_active_reflection_job'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} - {self.date} ({self.status})"
+
+
+class ReflectionBatch(models.Model):
+    """
+    One provider batch of pre-generated reflections for a day.
+
+    Submitted and collected by ``pregeneration``; the batch runs at the
+    provider, so this row is what lets a later run pick up its results.
+    """
+
+    class Status(models.TextChoices):
+        PROCESSING = 'processing', 'Pågår'
+        DONE = 'done', 'Klar'
+
+    date = models.DateField('datum')
+    batch_id = models.CharField('batch-id', max_length=100, unique=True)
+    status = models.CharField('status', max_length=10, choices=Status.choices, default=Status.PROCESSING)
+    request_count = models.PositiveIntegerField('antal förfrågningar')
+    succeeded = models.PositiveIntegerField('lyckade', default=0)
+    failed = models.PositiveIntegerField('misslyckade', default=0)
+    created_at = models.DateTimeField('skapad', auto_now_add=True)
+    finished_at = models.DateTimeField('klar', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'reflektionsbatch'
+        verbose_name_plural = 'reflektionsbatcher'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.batch_id} ({self.status})"
+
+
+class ReflectionCallLog(models.Model):
+    """
+    Telemetry for one upstream call made while generating a reflection.
+
+    Written by ``telemetry.CallRecord``. Holds no user or prompt data,
+    only timings, token counts and the outcome, for the
+    ``reflection_call_report`` command.
+    """
+
+    class Outcome(models.TextChoices):
+        OK = 'ok', 'Lyckades'
+        ERROR = 'error', 'Fel'
+        REJECTED = 'rejected', 'Avvisad'
+        CANCELLED = 'cancelled', 'Avbruten'
+
+    created_at = models.DateTimeField('skapad', auto_now_add=True, db_index=True)
+    model = models.CharField('modell', max_length=100, blank=True)
+    prompt_version = models.CharField('promptversion', max_length=16)
+    streamed = models.BooleanField('strömmad', default=False)
+    outcome = models.CharField('utfall', max_length=10, choices=Outcome.choices)
+    error = models.CharField('feltyp', max_length=100, blank=True)
+    wall_ms = models.PositiveIntegerField('total tid (ms)')
+    first_token_ms = models.PositiveIntegerField('tid till första token (ms)', null=True, blank=True)
+    input_tokens = models.PositiveIntegerField('indatatokens', null=True, blank=True)
+    output_tokens = models.PositiveIntegerField('utdatatokens', null=True, blank=True)
+    cache_read_tokens = models.PositiveIntegerField('cachade indatatokens', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'reflektionsanrop'
+        verbose_name_plural = 'reflektionsanrop'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.created_at:%Y-%m-%d %H:%M} {self.model} ({self.outcome}, {self.wall_ms} ms)"
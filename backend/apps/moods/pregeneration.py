@@ -0,0 +1,78 @@
+"""
+Nightly batch pre-generation of daily reflections.
+
+``submit`` finds every opted-in user who logged something on the day
+and has no reflection for it yet. It builds all their snapshots in
+three queries and sends the prompts as one provider batch, which is
+cheaper than interactive calls and needs no request worker. ``collect``
+checks a batch and, once it has ended, bulk-inserts the reflections.
+The generate endpoints then serve a pre-generated reflection straight
+from the table.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import reflections
+from .models import DailyAggregate, DailyLog, DailyReflection, ReflectionBatch
+from .reflection_backends import get_backend
+
+CUSTOM_ID = 'user-{}'
+
+
+def pending_user_ids(date):
+    """Opted-in active users with data for ``date`` and no reflection yet."""
+    User = get_user_model()
+    return list(
+        User.objects.filter(
+            is_active=True, pregenerate_reflections=True
+        ).filter(
+            Q(pk__in=DailyAggregate.objects.filter(date=date).values('user_id'))
+            | Q(pk__in=DailyLog.objects.filter(date=date).values('user_id'))
+        ).exclude(
+            pk__in=DailyReflection.objects.filter(date=date).values('user_id')
+        ).order_by('pk').values_list('pk', flat=True)
+    )
+
+
+def submit(date):
+    """Submit the day's batch; returns the ``ReflectionBatch``, or None if nobody is pending."""
+    user_ids = pending_user_ids(date)
+    if not user_ids:
+        return None
+    snapshots = reflections.load_snapshots(user_ids, date)
+    requests = {
+        CUSTOM_ID.format(user_id): reflections.message_params(
+            reflections.build_user_message({}, snapshots[user_id])
+        )
+        for user_id in user_ids
+    }
+    batch_id = get_backend().submit_batch(requests)
+    return ReflectionBatch.objects.create(date=date, batch_id=batch_id, request_count=len(requests))
+
+
+def collect(batch):
+    """Store the results of ``batch`` once it has ended; returns whether it has."""
+    results = get_backend().batch_results(batch.batch_id)
+    if results is None:
+        return False
+
+    texts = {int(custom_id.removeprefix('user-')): text for custom_id, text in results.items() if text}
+    # Users may have been deleted or deactivated since the batch was sent
+    active = get_user_model().objects.filter(pk__in=texts, is_active=True).values_list('pk', flat=True)
+    with transaction.atomic():
+        # A reflection generated on demand in the meantime wins
+        DailyReflection.objects.bulk_create(
+            [
+                DailyReflection(user_id=user_id, date=batch.date, entry=texts[user_id], pregenerated=True)
+                for user_id in active
+            ],
+            ignore_conflicts=True
+        )
+        batch.status = ReflectionBatch.Status.DONE
+        batch.succeeded = len(texts)
+        batch.failed = batch.request_count - len(texts)
+        batch.finished_at = timezone.now()
+        batch.save(update_fields=['status', 'succeeded', 'failed', 'finished_at'])
+    return True
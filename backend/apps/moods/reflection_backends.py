@@ -0,0 +1,294 @@
+"""
+Where reflection text comes from.
+
+``REFLECTION_BACKEND`` is the dotted path of a backend class and
+``REFLECTION_BACKEND_OPTIONS`` its keyword arguments. A backend gets the
+Messages API parameters built by ``reflections`` and returns the text,
+reporting model and token usage on the ``telemetry.CallRecord`` it is
+passed:
+
+- ``AnthropicBackend`` calls the API through pooled per-process clients.
+- ``FakeBackend`` answers locally with deterministic text after a
+  configurable delay and fails at a configurable rate, so the whole
+  pipeline (jobs, single-flight locking, caching, persistence) can be
+  load tested and run in CI without a key or network.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import types
+import uuid
+import weakref
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+try:
+    import anthropic
+    import httpx
+except ImportError:  # pragma: no cover - handled at runtime
+    anthropic = httpx = None
+
+from .upstream import UpstreamError
+
+# Connection pool per client; idle connections are kept open this long
+# for the next call
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 60
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+class BaseBackend:
+    """Interface of a reflection backend."""
+
+    def configuration_error(self):
+        """Why this backend can't run on this server, or None."""
+        return None
+
+    def generate(self, params, record):
+        """The complete text for Messages API ``params``."""
+        raise NotImplementedError
+
+    async def stream(self, params, record):
+        """Async generator of text chunks for Messages API ``params``."""
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+    def submit_batch(self, requests):
+        """Submit ``{custom_id: params}`` as one batch; returns its id."""
+        raise NotImplementedError
+
+    def batch_results(self, batch_id):
+        """
+        ``None`` while the batch is processing, then a dict of custom id
+        to generated text (None for requests that failed).
+        """
+        raise NotImplementedError
+
+
+class AnthropicBackend(BaseBackend):
+    """The Anthropic Messages API (``ANTHROPIC_*`` settings)."""
+
+    def configuration_error(self):
+        if anthropic is None:
+            return 'Anthropic SDK saknas på servern.'
+        if not os.environ.get('ANTHROPIC_API_KEY'):
+            return 'ANTHROPIC_API_KEY saknas i servermiljön.'
+        return None
+
+    def generate(self, params, record):
+        response = get_client().messages.create(**params)
+        record.set_usage(response.model, response.usage)
+        text_block = next((block for block in response.content if block.type == 'text'), None)
+        return text_block.text if text_block else ''
+
+    async def stream(self, params, record):
+        async with get_async_client().messages.stream(**params) as response:
+            async for text in response.text_stream:
+                yield text
+            message = await response.get_final_message()
+            record.set_usage(message.model, message.usage)
+
+    def submit_batch(self, requests):
+        batch = get_client().messages.batches.create(requests=[
+            {'custom_id': custom_id, 'params': params} for custom_id, params in requests.items()
+        ])
+        return batch.id
+
+    def batch_results(self, batch_id):
+        batches = get_client().messages.batches
+        if batches.retrieve(batch_id).processing_status != 'ended':
+            return None
+        results = {}
+        for item in batches.results(batch_id):
+            text = None
+            if item.result.type == 'succeeded':
+                block = next((block for block in item.result.message.content if block.type == 'text'), None)
+                text = block.text if block else None
+            results[item.custom_id] = text
+        return results
+
+
+class FakeBackend(BaseBackend):
+    """
+    Deterministic local stand-in for load tests.
+
+    The same day message always gives the same text. ``latency`` is
+    waited before the first chunk and ``chunk_delay`` between the
+    ``chunks`` pieces (``generate`` waits as long as a full stream).
+    A ``failure_rate`` share of calls raise ``UpstreamError`` after the
+    latency, drawn from a generator seeded with ``seed``. Batches end
+    right away, with the same share of failed requests.
+    """
+
+    SENTENCES = (
+        'Dagen gick i sin egen takt.',
+        'Det fanns stunder av lugn mellan sysslorna.',
+        'Inte allt kändes lätt, men det bar ändå.',
+        'Tröttheten satt kvar i kroppen.',
+        'En stund utomhus gav lite luft.',
+        'Kvällen blev stillsam.',
+        'Det var skönt att bocka av det viktigaste.',
+        'Tankarna vandrade en del.',
+    )
+
+    def __init__(self, latency=0.0, chunk_delay=0.0, chunks=8, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.chunks = chunks
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._batches = {}
+
+    def text(self, params):
+        message = params['messages'][-1]['content'][-1]['text']
+        digest = hashlib.sha256(message.encode()).digest()
+        date = re.search(r'^Datum: (\S+)', message, re.MULTILINE)
+        paragraphs = [
+            ' '.join(self.SENTENCES[byte % len(self.SENTENCES)] for byte in digest[start:start + 3])
+            for start in (0, 3, 6)
+        ]
+        return '\n\n'.join([f"{date.group(1) if date else 'Idag'} — en dag i taget", *paragraphs])
+
+    def split(self, text):
+        size = max(1, -(-len(text) // self.chunks))
+        return [text[index:index + size] for index in range(0, len(text), size)]
+
+    def generate(self, params, record):
+        time.sleep(self.latency + self.chunk_delay * max(0, self.chunks - 1))
+        self._maybe_fail()
+        text = self.text(params)
+        record.set_usage(params['model'], self.usage(params, text))
+        return text
+
+    async def stream(self, params, record):
+        await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        text = self.text(params)
+        for index, chunk in enumerate(self.split(text)):
+            if index:
+                await asyncio.sleep(self.chunk_delay)
+            yield chunk
+        record.set_usage(params['model'], self.usage(params, text))
+
+    def submit_batch(self, requests):
+        results = {}
+        for custom_id, params in requests.items():
+            try:
+                self._maybe_fail()
+            except UpstreamError:
+                results[custom_id] = None
+            else:
+                results[custom_id] = self.text(params)
+        batch_id = f'fakebatch_{uuid.uuid4().hex}'
+        with self._lock:
+            self._batches[batch_id] = results
+        return batch_id
+
+    def batch_results(self, batch_id):
+        return self._batches[batch_id]
+
+    def usage(self, params, text):
+        # Rough counts at about four characters per token
+        return types.SimpleNamespace(
+            input_tokens=max(1, len(json.dumps(params)) // 4),
+            output_tokens=max(1, len(text) // 4),
+            cache_read_input_tokens=0,
+        )
+
+    def _maybe_fail(self):
+        with self._lock:
+            failed = self._random.random() < self.failure_rate
+        if failed:
+            raise UpstreamError('Simulated upstream failure')
+
+
+def get_backend():
+    """The configured backend, created once per process."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            backend_class = import_string(settings.REFLECTION_BACKEND)
+            _backend = backend_class(**settings.REFLECTION_BACKEND_OPTIONS)
+        return _backend
+
+
+def get_client():
+    """
+    The process-wide Anthropic client, created on first use.
+
+    Reusing it keeps connections to the API open between calls instead
+    of paying for a new connection pool and TLS handshake every time.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = anthropic.Anthropic(
+                **_client_options(),
+                http_client=anthropic.DefaultHttpxClient(limits=_limits())
+            )
+        return _client
+
+
+def get_async_client():
+    """
+    The AsyncAnthropic client for the running event loop.
+
+    Async connections belong to the loop that opened them, so there is
+    one client per loop (in practice one per ASGI worker).
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = anthropic.AsyncAnthropic(
+            **_client_options(),
+            http_client=anthropic.DefaultAsyncHttpxClient(limits=_limits())
+        )
+    return client
+
+
+def _client_options():
+    return {
+        'api_key': os.environ.get('ANTHROPIC_API_KEY'),
+        'base_url': settings.ANTHROPIC_BASE_URL,
+        'timeout': anthropic.Timeout(
+            settings.ANTHROPIC_READ_TIMEOUT, connect=settings.ANTHROPIC_CONNECT_TIMEOUT
+        ),
+        'max_retries': settings.ANTHROPIC_MAX_RETRIES,
+    }
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY
+    )
+
+
+@receiver(setting_changed)
+def _reset(setting, **kwargs):
+    """Drop cached clients and backend when a test overrides their settings."""
+    global _client, _backend
+    if setting.startswith('ANTHROPIC_'):
+        with _client_lock:
+            _client = None
+        _async_clients.clear()
+    if setting.startswith('REFLECTION_BACKEND'):
+        with _backend_lock:
+            _backend = None
@@ -0,0 +1,493 @@
+"""
+Daily reflection generation.
+
+A generation takes 10-30 seconds upstream, so the generate endpoint only
+stores a ``ReflectionJob`` and returns; ``run_job`` then calls the model
+on the dedicated ``reflections`` background pool and stores the result
+as a ``DailyReflection``. Request workers never wait on the model, and
+every upstream call goes through ``upstream.guard`` (concurrency limit
+and circuit breaker). The text itself comes from the configured backend
+in ``reflection_backends``, and each call is logged by ``telemetry``.
+
+``stream`` is the streaming variant used by the server-sent events
+endpoint, which runs as an async view under ASGI.
+
+Both paths go through a response cache keyed by a hash of the prompts
+and the normalized day snapshot, so generating the same day again (e.g.
+a retry after a client timeout) does not call the model a second time.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import telemetry, upstream
+from .background import submit_to
+from .reflection_backends import get_backend
+from .models import MoodEntry, DailyAggregate, DailyLog, DailyReflection, ReflectionJob
+
+logger = logging.getLogger(__name__)
+
+MODEL = 'claude-sonnet-4-20250514'
+MAX_TOKENS = 1024
+
+ACTIVE = (ReflectionJob.Status.QUEUED, ReflectionJob.Status.RUNNING)
+# Active jobs older than this are considered dead and no longer block a day
+JOB_TIMEOUT = timedelta(minutes=5)
+FOLLOW_INTERVAL = 0.5
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+STATS_KEY = 'moods:reflection-cache:{}'
+STATS_COUNTERS = ('hits', 'misses', 'saved_ms')
+
+ALREADY_EXISTS = 'Du har redan en dagreflektion för detta datum.'
+LOG_FIELDS = ('sleep_hours', 'sleep_quality', 'energy', 'appetite', 'anxiety', 'stress', 'concentration')
+
+SYSTEM_PROMPT = """Du är en dagboksskribent som hjälper användaren att formulera sin dag i text. Du skriver på svenska.
+
+STRIKTA REGLER:
+- Du får ALDRIG hitta på händelser eller detaljer som användaren inte har angett
+- Du får tolka och rama in (vila som återhämtning, tristess som lugn) men aldrig ljuga
+- Inget terapispråk, inga kliniska termer, ingen "healing journey"
+- Ingen toxic positivity eller påtvingad tacksamhet
+- Tonen ska vara jordad, ärlig och varm - som användarens egen röst fast lite snällare
+- Om dagen var tung: bevittna och validera, försök inte fixa eller peppa
+- Avsluta INTE med "imorgon är en ny dag" eller liknande klyschor — det är okej att sluta utan hopp
+
+FORMAT:
+- Titel på egen rad som innehåller veckodag, datum och år plus en kort beskrivning, t.ex. "Onsdag 8 januari 2024 — en dag av vardagssysslor" (ren text, inga asterisker eller markdown)
+- Blank rad efter titeln
+- 3-4 stycken (inte 2)
+- Totalt 180-260 ord — detta är viktigt, skriv inte för kort
+- Ren text utan formatering (inga **, inga #, inga bullet points)
+"""
+
+DEVELOPER_PROMPT = """Baserat på användarens dagssnapshot, skriv en dagboksentry.
+
+Använd den valda stilen:
+- "grounded": Jordad, saklig, utan utsmyckning
+- "warm": Lite varmare ton, fortfarande ärlig
+- "minimal": Kortfattat, nästan telegramstil
+
+Strukturera svaret som:
+[Titel]
+
+[Stycke 1]
+
+[Stycke 2]
+
+[Eventuellt stycke 3-4]
+
+Skriv ENDAST entryn, ingen inledning eller avslutande kommentar."""
+
+# Part of every response cache key, so prompt changes start a fresh cache
+PROMPT_VERSION = hashlib.sha256(f'{MODEL}\n{SYSTEM_PROMPT}\n{DEVELOPER_PROMPT}'.encode()).hexdigest()[:16]
+
+
+def load_snapshot(user, date):
+    """
+    The stored data for one day that goes into a reflection.
+
+    Three small indexed queries: the day's aggregate, the notes of its
+    mood entries and its daily log.
+    """
+    return load_snapshots([user.pk], date)[user.pk]
+
+
+def load_snapshots(user_ids, date):
+    """``load_snapshot`` for many users at once, still in three queries."""
+    aggregates = {
+        user_id: (average, count)
+        for user_id, average, count in DailyAggregate.objects.filter(
+            user_id__in=user_ids, date=date
+        ).values_list('user_id', 'average_mood', 'entry_count')
+    }
+    notes = defaultdict(list)
+    for user_id, note in MoodEntry.objects.filter(
+        user_id__in=user_ids, timestamp__date=date
+    ).exclude(note='').order_by('timestamp').values_list('user_id', 'note'):
+        notes[user_id].append(note)
+    daily_logs = {}
+    for daily_log in DailyLog.objects.filter(user_id__in=user_ids, date=date).values('user_id', *LOG_FIELDS):
+        if daily_log['sleep_hours'] is not None:
+            daily_log['sleep_hours'] = float(daily_log['sleep_hours'])
+        daily_logs[daily_log.pop('user_id')] = daily_log
+
+    snapshots = {}
+    for user_id in user_ids:
+        aggregate = aggregates.get(user_id)
+        snapshots[user_id] = {
+            'date': date.isoformat(),
+            'mood': {
+                'average': float(aggregate[0]) if aggregate else None,
+                'entry_count': aggregate[1] if aggregate else 0,
+                'notes': notes.get(user_id, []),
+            },
+            'daily_log': daily_logs.get(user_id),
+        }
+    return snapshots
+
+
+def build_user_message(payload, snapshot):
+    """
+    The user turn describing the day.
+
+    ``snapshot`` is the stored data from ``load_snapshot``; ``payload``
+    is validated ``ReflectionRequestSerializer`` data and only adds what
+    the client knows alone. A mood score in it overrides the average.
+    """
+    def format_scale(value, max_value):
+        if value is None:
+            return '–'
+        return f'{value}/{max_value}'
+
+    def join_list(values):
+        return ', '.join([str(value) for value in values if value]) or 'inga angivna'
+
+    content = payload.get('content') or {}
+    mood = payload.get('mood') or {}
+    water = payload.get('water') or {}
+    weather = payload.get('weather') or {}
+    basics = payload.get('basics') or {}
+
+    stored_mood = snapshot['mood']
+    daily_log = snapshot['daily_log']
+    score = mood.get('score')
+    if score is None and stored_mood['average'] is not None:
+        score = round(stored_mood['average'], 1)
+    mood_entry_notes = stored_mood['notes']
+
+    weather_summary = ''
+    if weather.get('summary') or weather.get('location') or weather.get('temperature') is not None:
+        parts = []
+        if weather.get('temperature') is not None:
+            parts.append(f"{weather.get('temperature')}°C")
+        if weather.get('summary'):
+            parts.append(str(weather.get('summary')))
+        if weather.get('location'):
+            parts.append(f"i {weather.get('location')}")
+        weather_summary = ' '.join(parts).strip()
+
+    daily_log_lines = []
+    if daily_log:
+        daily_log_lines = [
+            f"- Ångest: {format_scale(daily_log.get('anxiety'), 5)}",
+            f"- Stress: {format_scale(daily_log.get('stress'), 5)}",
+            f"- Koncentration: {format_scale(daily_log.get('concentration'), 5)}",
+            f"- Energi: {format_scale(daily_log.get('energy'), 5)}",
+            f"- Aptit: {format_scale(daily_log.get('appetite'), 5)}",
+            f"- Sömn: {daily_log.get('sleep_hours') or '–'} timmar, kvalitet {format_scale(daily_log.get('sleep_quality'), 5)}",
+        ]
+
+    basics_list = [
+        basics.get('ate') and 'åt ordentligt',
+        basics.get('hydrated') and 'drack tillräckligt',
+        basics.get('outside') and 'var utomhus',
+        basics.get('movement') and 'rörde på sig',
+        basics.get('rested') and 'vilade när det behövdes',
+        basics.get('tookMedication') and 'tog medicin som planerat',
+    ]
+
+    return f"""Här är dagens data:
+
+Datum: {snapshot['date']}
+Väder: {weather_summary or 'okänt eller ej angivet'}
+Händelser: {join_list(payload.get('events') or [])}
+{f"Detaljer: {content.get('details')}" if content.get('details') else ''}
+
+Humör:
+- Snitt/vald nivå: {format_scale(score, 10)} {f"({mood.get('label')})" if mood.get('label') else ''}
+- Antal humörloggar: {stored_mood['entry_count']}
+{f"- Noteringar från humörloggar: {join_list(mood_entry_notes)}" if mood_entry_notes else ''}
+{f"- Fri text om humör: {mood.get('note')}" if mood.get('note') else ''}
+
+{f"Hård stund: {payload.get('hardMoments')}" if payload.get('hardMoments') else ''}
+{f"Hjälpsam stund: {payload.get('helpfulMoments')}" if payload.get('helpfulMoments') else ''}
+
+{f"Daganteckning (skala 1-5):\n" + "\n".join(daily_log_lines) if daily_log_lines else "Daganteckning: inget ifyllt."}
+
+Grunderna: {join_list(basics_list)}
+Vatten: {water.get('count') or 0} av {water.get('total') or 0} glas
+Andningsövning använd: {'ja' if payload.get('breathingUsed') else 'nej'}
+
+Ton: {payload.get('tone') or 'grounded'}"""
+
+
+def configuration_error():
+    """Why generation can't run on this server, or None."""
+    return get_backend().configuration_error()
+
+
+def generate(user_message):
+    """Generate the reflection text for a day ('' if there is none)."""
+    with telemetry.CallRecord(MODEL, PROMPT_VERSION) as record, upstream.guard():
+        return get_backend().generate(message_params(user_message), record)
+
+
+async def stream(user_message):
+    """Async generator of text chunks as the backend produces them."""
+    async with telemetry.CallRecord(MODEL, PROMPT_VERSION, streamed=True) as record, upstream.aguard():
+        async for text in get_backend().stream(message_params(user_message), record):
+            record.first_token()
+            yield text
+
+
+def response_key(user_id, user_message):
+    """
+    Cache key for the reflection of a day snapshot.
+
+    The message is normalized first (surrounding whitespace and blank
+    lines dropped) so formatting-only differences still hit. The tone is
+    part of the message.
+    """
+    lines = [line.strip() for line in user_message.strip().splitlines()]
+    normalized = '\n'.join(line for line in lines if line)
+    digest = hashlib.sha256(
+        f'{PROMPT_VERSION}\n{settings.REFLECTION_BACKEND}\n{normalized}'.encode()
+    ).hexdigest()
+    return f'moods:reflection:{user_id}:{digest}'
+
+
+def generate_cached(user_id, user_message):
+    """``generate`` through the response cache."""
+    key = response_key(user_id, user_message)
+    cached = cache.get(key)
+    if cached is not None:
+        _count(hits=1, saved_ms=cached['ms'])
+        return cached['text']
+
+    _count(misses=1)
+    start = time.perf_counter()
+    text = generate(user_message)
+    _remember(key, text, start)
+    return text
+
+
+async def stream_cached(user_id, user_message):
+    """``stream`` through the response cache; a hit arrives as one chunk."""
+    key = response_key(user_id, user_message)
+    cached = await cache.aget(key)
+    if cached is not None:
+        await sync_to_async(_count)(hits=1, saved_ms=cached['ms'])
+        yield cached['text']
+        return
+
+    await sync_to_async(_count)(misses=1)
+    start = time.perf_counter()
+    chunks = []
+    async for text in stream(user_message):
+        chunks.append(text)
+        yield text
+    await sync_to_async(_remember)(key, ''.join(chunks), start)
+
+
+def cache_stats():
+    """Response cache hits, misses and upstream time saved, as a dict."""
+    values = cache.get_many([STATS_KEY.format(name) for name in STATS_COUNTERS])
+    stats = {name: values.get(STATS_KEY.format(name), 0) for name in STATS_COUNTERS}
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else None
+    return stats
+
+
+def reset_cache_stats():
+    cache.delete_many([STATS_KEY.format(name) for name in STATS_COUNTERS])
+
+
+def _remember(key, text, start):
+    if text:
+        elapsed_ms = round((time.perf_counter() - start) * 1000)
+        cache.set(key, {'text': text, 'ms': elapsed_ms}, RESPONSE_CACHE_TIMEOUT)
+
+
+def _count(**amounts):
+    for name, amount in amounts.items():
+        key = STATS_KEY.format(name)
+        # incr is atomic on Redis; add creates the counter the first time
+        cache.add(key, 0, None)
+        cache.incr(key, amount)
+
+
+def message_params(user_message):
+    """Messages API parameters for the day described by ``user_message``."""
+    # The static prompts come first and end in a cache breakpoint, so the
+    # provider can reuse that prefix across calls; only the day differs
+    return {
+        'model': MODEL,
+        'max_tokens': MAX_TOKENS,
+        'system': [{'type': 'text', 'text': SYSTEM_PROMPT}],
+        'messages': [
+            {
+                'role': 'user',
+                'content': [
+                    {'type': 'text', 'text': DEVELOPER_PROMPT, 'cache_control': {'type': 'ephemeral'}},
+                    {'type': 'text', 'text': user_message},
+                ]
+            }
+        ],
+    }
+
+
+def claim(user, date, user_message, status=ReflectionJob.Status.QUEUED):
+    """
+    Single-flight guard: create the day's active job, or find the one in flight.
+
+    Returns ``(job, created)``. A partial unique constraint allows one
+    queued or running job per user and day, so only one request across
+    all processes gets ``created=True`` and calls the model; the others
+    share its job.
+    """
+    now = timezone.now()
+    # A job whose process died never finishes; don't let it block the day
+    ReflectionJob.objects.filter(
+        user=user, date=date, status__in=ACTIVE, created_at__lt=now - JOB_TIMEOUT
+    ).update(status=ReflectionJob.Status.FAILED, error='Tidsgränsen överskreds.', finished_at=now)
+
+    for _ in range(3):
+        try:
+            with transaction.atomic():
+                job = ReflectionJob.objects.create(
+                    user=user, date=date, prompt=user_message, status=status,
+                    started_at=now if status == ReflectionJob.Status.RUNNING else None
+                )
+            return job, True
+        except IntegrityError:
+            job = ReflectionJob.objects.filter(user=user, date=date, status__in=ACTIVE).first()
+            if job is not None:
+                return job, False
+            # The active job finished in between; claim again
+    raise RuntimeError(f'Could not claim a reflection job for user {user.pk} on {date}')
+
+
+def enqueue(user, date, user_message):
+    """Claim the day's job and hand it to the reflection pool if it is new."""
+    job, created = claim(user, date, user_message)
+    if created:
+        # submit_to starts the worker once the row is committed
+        submit_to('reflections', run_job, job.pk)
+    return job
+
+
+def recover_stale_jobs():
+    """
+    Recover active jobs older than ``JOB_TIMEOUT`` that a dead process left behind.
+
+    Otherwise they are only noticed when ``claim`` finds one blocking its
+    day. Queued jobs that never started are submitted again; running ones
+    are failed so the day can be generated anew. Returns ``(requeued, failed)``.
+    """
+    now = timezone.now()
+    stale = ReflectionJob.objects.filter(created_at__lt=now - JOB_TIMEOUT)
+    failed = stale.filter(status=ReflectionJob.Status.RUNNING).update(
+        status=ReflectionJob.Status.FAILED, error='Tidsgränsen överskreds.', finished_at=now
+    )
+
+    job_ids = list(stale.filter(status=ReflectionJob.Status.QUEUED).values_list('pk', flat=True))
+    # Restart the clock so claim doesn't fail them again before they run
+    ReflectionJob.objects.filter(pk__in=job_ids).update(created_at=now)
+    for job_id in job_ids:
+        submit_to('reflections', run_job, job_id)
+    return len(job_ids), failed
+
+
+def run_job(job_id):
+    """Generate and store the reflection for a queued job."""
+    claimed = ReflectionJob.objects.filter(
+        pk=job_id, status=ReflectionJob.Status.QUEUED
+    ).update(status=ReflectionJob.Status.RUNNING, started_at=timezone.now())
+    if not claimed:
+        return
+    job = ReflectionJob.objects.get(pk=job_id)
+
+    try:
+        text = generate_cached(job.user_id, job.prompt)
+    except Exception as exc:
+        logger.exception('Reflection job %s failed', job_id)
+        return _finish(job, ReflectionJob.Status.FAILED, error=upstream.describe(exc))
+    return _complete(job, text)
+
+
+async def stream_reflection(user, date, user_message):
+    """
+    Generate the day's reflection as ``(event, data)`` pairs for the SSE view.
+
+    ``delta`` events carry text as it arrives, followed by ``done`` or
+    ``error``. Single-flight like ``enqueue``: a request that finds a job
+    in flight waits for it and gets the finished text as one ``delta``.
+    """
+    job, created = await sync_to_async(claim)(user, date, user_message, ReflectionJob.Status.RUNNING)
+    if not created:
+        async for event in _follow(job.pk):
+            yield event
+        return
+
+    chunks = []
+    try:
+        async for text in stream_cached(user.pk, user_message):
+            chunks.append(text)
+            yield 'delta', {'text': text}
+    except Exception as exc:
+        logger.exception('Reflection stream for job %s failed', job.pk)
+        job = await sync_to_async(_finish)(job, ReflectionJob.Status.FAILED, error=upstream.describe(exc))
+        data = _job_event(job)[1]
+        if isinstance(exc, upstream.Unavailable):
+            data['retry_after'] = exc.retry_after
+        yield 'error', data
+        return
+    except BaseException:
+        # The client went away; release the day for the next request
+        await sync_to_async(_finish)(job, ReflectionJob.Status.FAILED, error='Avbruten.')
+        raise
+
+    job = await sync_to_async(_complete)(job, ''.join(chunks))
+    yield _job_event(job)
+
+
+async def _follow(job_id):
+    """Wait for another request's job to finish and relay its outcome."""
+    deadline = time.monotonic() + JOB_TIMEOUT.total_seconds()
+    while time.monotonic() < deadline:
+        job = await ReflectionJob.objects.select_related('reflection').aget(pk=job_id)
+        if job.status not in ACTIVE:
+            if job.status == ReflectionJob.Status.DONE:
+                yield 'delta', {'text': job.reflection.entry}
+            yield _job_event(job)
+            return
+        await asyncio.sleep(FOLLOW_INTERVAL)
+    yield 'error', {'error': 'Failed to generate entry', 'detail': 'Tidsgränsen överskreds.'}
+
+
+def _job_event(job):
+    if job.status == ReflectionJob.Status.DONE:
+        reflection = job.reflection
+        return 'done', {'id': reflection.pk, 'date': reflection.date.isoformat(), 'entry': reflection.entry}
+    return 'error', {'error': 'Failed to generate entry', 'detail': job.error}
+
+
+def _complete(job, text):
+    """Store the generated text as the day's reflection and finish the job."""
+    if not text:
+        return _finish(job, ReflectionJob.Status.FAILED, error='Modellen returnerade ingen text.')
+    try:
+        with transaction.atomic():
+            reflection = DailyReflection.objects.create(user_id=job.user_id, date=job.date, entry=text)
+    except IntegrityError:
+        return _finish(job, ReflectionJob.Status.FAILED, error=ALREADY_EXISTS)
+    return _finish(job, ReflectionJob.Status.DONE, reflection=reflection)
+
+
+def _finish(job, status, reflection=None, error=''):
+    job.status = status
+    job.reflection = reflection
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'reflection', 'error', 'finished_at'])
+    return job
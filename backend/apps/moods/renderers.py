@@ -0,0 +1,34 @@
+"""
+Renderers for export formats.
+
+Exports stream their own body, so these renderers exist to let DRF's
+content negotiation pick the format from ``?format=`` or ``Accept``.
+They only ever render error payloads, which are written as JSON.
+"""
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class _ErrorAsJSONRenderer(BaseRenderer):
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+class NDJSONRenderer(_ErrorAsJSONRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class CSVRenderer(_ErrorAsJSONRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class ParquetRenderer(_ErrorAsJSONRenderer):
+    media_type = 'application/vnd.apache.parquet'
+    format = 'parquet'
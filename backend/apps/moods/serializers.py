@@ -3,7 +3,11 @@ Serializers for mood tracking.
 """
 from django.utils import timezone
 from rest_framework import serializers
-from .models import Tag, MoodEntry, DailyAggregate, DailyLog, DailyReflection
+from .cache import get_tag_map
+from .models import (
+    Tag, MoodEntry, DailyAggregate, UserMoodSummary, MoodChangePoint, WeeklyDigest,
+    DailyLog, DailyReflection, ReflectionJob
+)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -20,9 +24,14 @@ class TagSerializer(serializers.ModelSerializer):
 
 
 class MoodEntrySerializer(serializers.ModelSerializer):
-    """Serializer for MoodEntry model."""
+    """
+    Serializer for MoodEntry model.
     
-    tags = TagSerializer(many=True, read_only=True)
+    Tags are rendered from the denormalized ``tag_ids`` column and a cached
+    per-user tag map, so listing entries needs no tag join.
+    """
+    
+    tags = serializers.SerializerMethodField()
     tag_ids = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.none(),
         many=True,
@@ -46,7 +55,22 @@ class MoodEntrySerializer(serializers.ModelSerializer):
         # Limit tag choices to user's own tags
         if 'request' in self.context:
             user = self.context['request'].user
-            self.fields['tag_ids'].queryset = Tag.objects.filter(user=user)
+            self.fields['tag_ids'].child_relation.queryset = Tag.objects.filter(user=user)
+    
+    def get_tags(self, obj):
+        tag_map = self._get_tag_map(obj.user_id)
+        if any(tag_id not in tag_map for tag_id in obj.tag_ids):
+            # A tag created in another process since the map was cached
+            tag_map = self._get_tag_map(obj.user_id, refresh=True)
+        tags = [tag_map[tag_id] for tag_id in obj.tag_ids if tag_id in tag_map]
+        return sorted(tags, key=lambda tag: tag['name'])
+    
+    def _get_tag_map(self, user_id, refresh=False):
+        # Shared by all entries rendered in one response
+        tag_maps = self.root.__dict__.setdefault('_tag_maps', {})
+        if refresh or user_id not in tag_maps:
+            tag_maps[user_id] = get_tag_map(user_id, refresh=refresh)
+        return tag_maps[user_id]
     
     def create(self, validated_data):
         tags = validated_data.pop('tags', [])
@@ -84,7 +108,7 @@ class MoodEntryCreateSerializer(serializers.ModelSerializer):
         super().__init__(*args, **kwargs)
         if 'request' in self.context:
             user = self.context['request'].user
-            self.fields['tag_ids'].queryset = Tag.objects.filter(user=user)
+            self.fields['tag_ids'].child_relation.queryset = Tag.objects.filter(user=user)
     
     def validate_timestamp(self, value):
         """Ensure timestamp is not in the future."""
@@ -102,6 +126,14 @@ class MoodEntryCreateSerializer(serializers.ModelSerializer):
         return entry
 
 
+class MoodEntryQuickLogSerializer(serializers.ModelSerializer):
+    """Minimal input serializer for one-tap mood logging."""
+    
+    class Meta:
+        model = MoodEntry
+        fields = ('mood_level', 'note')
+
+
 class DailyAggregateSerializer(serializers.ModelSerializer):
     """Serializer for DailyAggregate model."""
     
@@ -110,6 +142,44 @@ class DailyAggregateSerializer(serializers.ModelSerializer):
         fields = ('date', 'average_mood', 'min_mood', 'max_mood', 'entry_count')
 
 
+class UserMoodSummarySerializer(serializers.ModelSerializer):
+    """Serializer for UserMoodSummary model."""
+    
+    average_mood = serializers.FloatField(read_only=True)
+    current_streak = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = UserMoodSummary
+        fields = (
+            'total_entries', 'average_mood', 'days_logged',
+            'first_date', 'last_date',
+            'current_streak', 'longest_streak',
+        )
+    
+    def get_current_streak(self, obj):
+        return obj.current_streak()
+
+
+class MoodChangePointSerializer(serializers.ModelSerializer):
+    """Serializer for MoodChangePoint model."""
+    
+    class Meta:
+        model = MoodChangePoint
+        fields = ('date', 'kind', 'detected_on', 'baseline')
+
+
+class WeeklyDigestSerializer(serializers.ModelSerializer):
+    """Serializer for WeeklyDigest model."""
+    
+    class Meta:
+        model = WeeklyDigest
+        fields = (
+            'week_start', 'average_mood', 'entry_count', 'days_logged',
+            'best_day', 'best_mood', 'worst_day', 'worst_mood',
+            'top_tags', 'factors',
+        )
+
+
 class DailyLogSerializer(serializers.ModelSerializer):
     """Serializer for DailyLog model."""
     
@@ -142,6 +212,10 @@ class DailyLogSerializer(serializers.ModelSerializer):
                 'Du kan inte skapa en daganteckning för ett framtida datum.'
             )
         
+        # Upserts resolve conflicts in the database instead
+        if self.context.get('upsert'):
+            return value
+        
         # Check for existing log
         user = self.context['request'].user
         existing = DailyLog.objects.filter(user=user, date=value)
@@ -178,3 +252,59 @@ class DailyReflectionSerializer(serializers.ModelSerializer):
         if not attrs.get('date') and logged_at:
             attrs['date'] = logged_at.date()
         return attrs
+
+
+class _ReflectionMoodSerializer(serializers.Serializer):
+    score = serializers.FloatField(min_value=1, max_value=10, required=False, allow_null=True)
+    label = serializers.CharField(max_length=50, required=False, allow_blank=True)
+    note = serializers.CharField(max_length=2000, required=False, allow_blank=True)
+
+
+class _ReflectionContentSerializer(serializers.Serializer):
+    details = serializers.CharField(max_length=2000, required=False, allow_blank=True)
+
+
+class _ReflectionWaterSerializer(serializers.Serializer):
+    count = serializers.IntegerField(min_value=0, required=False)
+    total = serializers.IntegerField(min_value=0, required=False)
+
+
+class _ReflectionWeatherSerializer(serializers.Serializer):
+    summary = serializers.CharField(max_length=200, required=False, allow_blank=True, allow_null=True)
+    location = serializers.CharField(max_length=200, required=False, allow_blank=True, allow_null=True)
+    temperature = serializers.FloatField(required=False, allow_null=True)
+
+
+class ReflectionRequestSerializer(serializers.Serializer):
+    """
+    Input for generating a daily reflection.
+
+    Only what the client alone knows; mood entries, the aggregate and the
+    daily log are loaded on the server (``reflections.load_snapshot``).
+    Unknown fields sent by older clients are ignored.
+    """
+
+    date = serializers.DateField(required=False, allow_null=True)
+    tone = serializers.ChoiceField(choices=('grounded', 'warm', 'minimal'), default='grounded')
+    events = serializers.ListField(
+        child=serializers.CharField(max_length=100), max_length=50, required=False
+    )
+    content = _ReflectionContentSerializer(required=False)
+    mood = _ReflectionMoodSerializer(required=False)
+    hardMoments = serializers.CharField(max_length=2000, required=False, allow_blank=True)
+    helpfulMoments = serializers.CharField(max_length=2000, required=False, allow_blank=True)
+    basics = serializers.DictField(child=serializers.BooleanField(), required=False)
+    water = _ReflectionWaterSerializer(required=False)
+    weather = _ReflectionWeatherSerializer(required=False)
+    breathingUsed = serializers.BooleanField(required=False)
+
+
+class ReflectionJobSerializer(serializers.ModelSerializer):
+    """Serializer for ReflectionJob; ``entry`` is set once the job is done."""
+
+    entry = serializers.CharField(source='reflection.entry', read_only=True, default=None)
+
+    class Meta:
+        model = ReflectionJob
+        fields = ('id', 'date', 'status', 'entry', 'error', 'created_at', 'finished_at')
+        read_only_fields = fields
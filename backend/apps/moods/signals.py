@@ -0,0 +1,72 @@
+"""
+Signal handlers for mood tracking.
+
+Keeps ``MoodEntry.tag_ids`` in sync with the ``MoodEntry.tags`` relation
+and drops cached tag maps when tags change.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import invalidate_tag_map
+from .models import MoodEntry, Tag
+
+# Entries per UPDATE ... CASE statement when rewriting tag_ids
+BULK_BATCH_SIZE = 500
+
+
+def refresh_tag_ids(entry_ids):
+    """Rewrite ``tag_ids`` for the given entries from the through table."""
+    entry_ids = list(entry_ids)
+    if not entry_ids:
+        return {}
+
+    tag_ids = {entry_id: [] for entry_id in entry_ids}
+    rows = MoodEntry.tags.through.objects.filter(
+        moodentry_id__in=entry_ids
+    ).values_list('moodentry_id', 'tag_id')
+    for entry_id, tag_id in rows:
+        tag_ids[entry_id].append(tag_id)
+
+    # updated_at moves too, since the entry's tags are part of its data
+    now = timezone.now()
+    MoodEntry.objects.bulk_update(
+        [MoodEntry(pk=entry_id, tag_ids=ids, updated_at=now) for entry_id, ids in tag_ids.items()],
+        ['tag_ids', 'updated_at'],
+        batch_size=BULK_BATCH_SIZE
+    )
+    return tag_ids
+
+
+@receiver(m2m_changed, sender=MoodEntry.tags.through)
+def sync_entry_tag_ids(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # Remember which entries lose this tag before the rows are gone
+        instance._cleared_entry_ids = list(instance.entries.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action != 'post_clear' and not pk_set:
+        return
+
+    if reverse:
+        entry_ids = pk_set if action != 'post_clear' else getattr(instance, '_cleared_entry_ids', [])
+        refresh_tag_ids(entry_ids)
+    else:
+        instance.tag_ids = sorted(refresh_tag_ids([instance.pk])[instance.pk])
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tagged_entries(sender, instance, **kwargs):
+    instance._tagged_entry_ids = list(instance.entries.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def drop_deleted_tag(sender, instance, **kwargs):
+    refresh_tag_ids(getattr(instance, '_tagged_entry_ids', []))
+    invalidate_tag_map(instance.user_id)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, **kwargs):
+    invalidate_tag_map(instance.user_id)
@@ -0,0 +1,146 @@
+"""
+Telemetry for upstream LLM calls.
+
+``CallRecord`` wraps one call. It measures the wall time, takes the
+time to first token and the ``usage`` reported by the backend, and
+stores a ``ReflectionCallLog`` row when the call ends, whatever the
+outcome. ``report`` turns the rows into latency percentiles and token
+totals per day, model or prompt version, for the
+``reflection_call_report`` command.
+"""
+import logging
+import time
+from collections import defaultdict
+
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .models import ReflectionCallLog
+from .upstream import Unavailable
+
+logger = logging.getLogger(__name__)
+
+GROUPS = ('day', 'model', 'prompt_version')
+
+
+class CallRecord:
+    """Measurements of one upstream call; use as a (async) context manager."""
+
+    def __init__(self, model='', prompt_version='', streamed=False):
+        self.model = model
+        self.prompt_version = prompt_version
+        self.streamed = streamed
+        self.first_token_ms = None
+        self.usage = {}
+        self._start = time.perf_counter()
+
+    def first_token(self):
+        if self.first_token_ms is None:
+            self.first_token_ms = self._elapsed_ms()
+
+    def set_usage(self, model, usage):
+        """Take the model and token counts from a Messages API response."""
+        self.model = model or self.model
+        self.usage = {
+            'input_tokens': getattr(usage, 'input_tokens', None),
+            'output_tokens': getattr(usage, 'output_tokens', None),
+            'cache_read_tokens': getattr(usage, 'cache_read_input_tokens', None),
+        }
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            self._log(exc).save()
+        except DatabaseError:
+            logger.exception('Could not store reflection call log')
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        try:
+            await self._log(exc).asave()
+        except DatabaseError:
+            logger.exception('Could not store reflection call log')
+
+    def _log(self, exc):
+        if exc is None:
+            outcome = ReflectionCallLog.Outcome.OK
+        elif isinstance(exc, Unavailable):
+            outcome = ReflectionCallLog.Outcome.REJECTED
+        elif isinstance(exc, Exception):
+            outcome = ReflectionCallLog.Outcome.ERROR
+        else:
+            outcome = ReflectionCallLog.Outcome.CANCELLED
+        return ReflectionCallLog(
+            model=self.model[:100],
+            prompt_version=self.prompt_version,
+            streamed=self.streamed,
+            outcome=outcome,
+            error=type(exc).__name__ if exc is not None else '',
+            wall_ms=self._elapsed_ms(),
+            first_token_ms=self.first_token_ms,
+            **self.usage
+        )
+
+    def _elapsed_ms(self):
+        return round((time.perf_counter() - self._start) * 1000)
+
+
+def report(since, group='day'):
+    """
+    Summary rows for calls since ``since``, one per ``group`` value.
+
+    Latency percentiles cover successful calls only; failed and rejected
+    calls are counted separately so they don't skew them.
+    """
+    rows = ReflectionCallLog.objects.filter(created_at__gte=since).order_by('created_at').values_list(
+        'created_at', 'model', 'prompt_version', 'outcome',
+        'wall_ms', 'first_token_ms', 'input_tokens', 'output_tokens'
+    )
+    groups = defaultdict(lambda: {
+        'calls': 0, 'errors': 0, 'rejected': 0, 'wall': [], 'first_token': [],
+        'input_tokens': 0, 'output_tokens': 0,
+    })
+    for created_at, model, prompt_version, outcome, wall_ms, first_token_ms, input_tokens, output_tokens in rows:
+        if group == 'day':
+            key = timezone.localdate(created_at)
+        else:
+            key = model if group == 'model' else prompt_version
+        stats = groups[key]
+        stats['calls'] += 1
+        stats['input_tokens'] += input_tokens or 0
+        stats['output_tokens'] += output_tokens or 0
+        if outcome == ReflectionCallLog.Outcome.OK:
+            stats['wall'].append(wall_ms)
+            if first_token_ms is not None:
+                stats['first_token'].append(first_token_ms)
+        elif outcome == ReflectionCallLog.Outcome.REJECTED:
+            stats['rejected'] += 1
+        elif outcome == ReflectionCallLog.Outcome.ERROR:
+            stats['errors'] += 1
+
+    summary = []
+    for key, stats in groups.items():
+        wall, first_token = stats.pop('wall'), stats.pop('first_token')
+        summary.append({
+            group: key,
+            **stats,
+            'p50_ms': percentile(wall, 50),
+            'p95_ms': percentile(wall, 95),
+            'p99_ms': percentile(wall, 99),
+            'first_token_p50_ms': percentile(first_token, 50),
+        })
+    return summary
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile, or None without samples."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
@@ -0,0 +1,256 @@
+"""
+A local stand-in for the Anthropic Messages API.
+
+Serves ``POST /v1/messages`` on a random localhost port, either as one
+JSON message or, for ``"stream": true``, as the same server-sent events
+the real API sends. Point the SDK at it with ``base_url=server.url``.
+Used by the reflection tests and benchmarks so they never need a key or
+the network.
+
+``fail()`` injects upstream faults: the next requests get the given
+HTTP error statuses with the API's error bodies, so tests can drive
+retries, the circuit breaker and error handling.
+
+The Message Batches endpoints are served too: a created batch reports
+``in_progress`` for ``batch_polls`` status checks, then ends with every
+request succeeded except the custom ids in ``failing_ids``.
+"""
+import collections
+import json
+import re
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_TEXT = 'Tisdag 4 mars 2025 — en lugn dag\n\nDagen började långsamt.'
+
+ERROR_TYPES = {
+    400: 'invalid_request_error',
+    429: 'rate_limit_error',
+    500: 'api_error',
+    529: 'overloaded_error',
+}
+
+
+class FakeAnthropicServer:
+    """
+    Run the fake API in a background thread.
+
+    ``first_token_delay`` is slept before the first text (or before the
+    whole response when not streaming) and ``chunk_delay`` between the
+    streamed chunks. Every message request body is kept in ``requests``,
+    created batches in ``batches`` and ``connections`` counts the TCP
+    connections accepted.
+    """
+
+    def __init__(self, text=DEFAULT_TEXT, chunks=8, first_token_delay=0.0, chunk_delay=0.0):
+        self.text = text
+        self.chunks = chunks
+        self.first_token_delay = first_token_delay
+        self.chunk_delay = chunk_delay
+        self.requests = []
+        self.connections = 0
+        self.faults = collections.deque()
+        self.batches = {}
+        self.batch_polls = 1
+        self.failing_ids = set()
+        self._lock = threading.Lock()
+        self._server = _Server(('127.0.0.1', 0), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def fail(self, *statuses):
+        """Answer the next ``len(statuses)`` requests with these error statuses."""
+        with self._lock:
+            self.faults.extend(statuses)
+
+    def split(self):
+        """The response text cut into ``chunks`` roughly equal pieces."""
+        size = max(1, -(-len(self.text) // self.chunks))
+        return [self.text[index:index + size] for index in range(0, len(self.text), size)]
+
+    def message(self, body):
+        return {
+            'id': 'msg_fake',
+            'type': 'message',
+            'role': 'assistant',
+            'model': body.get('model', 'fake'),
+            'content': [{'type': 'text', 'text': self.text}],
+            'stop_reason': 'end_turn',
+            'stop_sequence': None,
+            'usage': {'input_tokens': _tokens(json.dumps(body)), 'output_tokens': _tokens(self.text)},
+        }
+
+    def events(self, body):
+        """(event, data) pairs of a streamed response."""
+        message = self.message(body)
+        yield 'message_start', {
+            'type': 'message_start',
+            'message': {**message, 'content': [], 'stop_reason': None,
+                        'usage': {**message['usage'], 'output_tokens': 1}},
+        }
+        yield 'content_block_start', {
+            'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'text', 'text': ''},
+        }
+        for chunk in self.split():
+            yield 'content_block_delta', {
+                'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': chunk},
+            }
+        yield 'content_block_stop', {'type': 'content_block_stop', 'index': 0}
+        yield 'message_delta', {
+            'type': 'message_delta',
+            'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+            'usage': {'output_tokens': message['usage']['output_tokens']},
+        }
+        yield 'message_stop', {'type': 'message_stop'}
+
+    def batch(self, batch_id, poll=True):
+        """The MessageBatch object for ``batch_id``; ``poll`` counts a status check."""
+        with self._lock:
+            batch = self.batches[batch_id]
+            if poll:
+                batch['polls'] += 1
+            ended = batch['polls'] > self.batch_polls
+        requests = batch['requests']
+        failed = sum(1 for request in requests if request['custom_id'] in self.failing_ids)
+        return {
+            'id': batch_id,
+            'type': 'message_batch',
+            'processing_status': 'ended' if ended else 'in_progress',
+            'request_counts': {
+                'processing': 0 if ended else len(requests),
+                'succeeded': len(requests) - failed if ended else 0,
+                'errored': failed if ended else 0,
+                'canceled': 0,
+                'expired': 0,
+            },
+            'created_at': batch['created_at'].isoformat(),
+            'expires_at': (batch['created_at'] + timedelta(days=1)).isoformat(),
+            'ended_at': batch['created_at'].isoformat() if ended else None,
+            'results_url': f'{self.url}/v1/messages/batches/{batch_id}/results' if ended else None,
+            'archived_at': None,
+            'cancel_initiated_at': None,
+        }
+
+    def batch_results(self, batch_id):
+        """One result line per request of an ended batch."""
+        for request in self.batches[batch_id]['requests']:
+            if request['custom_id'] in self.failing_ids:
+                result = {'type': 'errored', 'error': {
+                    'type': 'error', 'error': {'type': 'api_error', 'message': 'api_error'},
+                }}
+            else:
+                result = {'type': 'succeeded', 'message': self.message(request['params'])}
+            yield {'custom_id': request['custom_id'], 'result': result}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes; don't let
+                # Nagle's algorithm hold the body back
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with fake._lock:
+                    fake.connections += 1
+
+            def do_GET(self):
+                match = re.fullmatch(r'/v1/messages/batches/([\w-]+)(/results)?', self.path.split('?')[0])
+                if not match or match.group(1) not in fake.batches:
+                    self._send_json(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': 'Not found'}})
+                elif match.group(2):
+                    lines = ''.join(json.dumps(line) + '\n' for line in fake.batch_results(match.group(1)))
+                    self._send(200, 'application/binary', lines.encode())
+                else:
+                    self._send_json(200, fake.batch(match.group(1)))
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if self.path.split('?')[0] == '/v1/messages/batches':
+                    batch_id = f'msgbatch_{uuid.uuid4().hex}'
+                    with fake._lock:
+                        fake.batches[batch_id] = {
+                            'requests': body['requests'], 'polls': 0, 'created_at': datetime.now(timezone.utc),
+                        }
+                    self._send_json(200, fake.batch(batch_id, poll=False))
+                    return
+
+                with fake._lock:
+                    fake.requests.append(body)
+                    fault = fake.faults.popleft() if fake.faults else None
+
+                if fault:
+                    time.sleep(fake.first_token_delay)
+                    error_type = ERROR_TYPES.get(fault, 'api_error')
+                    self._send_json(fault, {'type': 'error', 'error': {'type': error_type, 'message': error_type}})
+                    return
+
+                if not body.get('stream'):
+                    time.sleep(fake.first_token_delay)
+                    self._send_json(200, fake.message(body))
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                first = True
+                for event, data in fake.events(body):
+                    if event == 'content_block_delta':
+                        time.sleep(fake.first_token_delay if first else fake.chunk_delay)
+                        first = False
+                    self.wfile.write(f'event: {event}\ndata: {json.dumps(data)}\n\n'.encode())
+                    self.wfile.flush()
+                self.close_connection = True
+
+            def _send_json(self, status, data):
+                self._send(status, 'application/json', json.dumps(data).encode())
+
+            def _send(self, status, content_type, payload):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections in concurrency benchmarks
+    request_queue_size = 128
+
+
+def _tokens(text):
+    # Rough count, good enough for usage numbers
+    return max(1, len(text) // 4)
@@ -0,0 +1,291 @@
+"""
+Tests for the daily feature matrix.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.moods import analytics
+from apps.moods.models import Tag, MoodEntry, DailyAggregate, DailyLog
+
+User = get_user_model()
+
+
+class FeatureMatrixTests(TestCase):
+    """Tests for analytics.feature_matrix and GET /api/insights/features/."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('moods:feature-matrix')
+
+        DailyAggregate.objects.create(
+            user=self.user, date=date(2025, 3, 1),
+            average_mood=Decimal('6.50'), min_mood=5, max_mood=8, entry_count=2
+        )
+        DailyAggregate.objects.create(
+            user=self.user, date=date(2025, 3, 3),
+            average_mood=Decimal('3.00'), min_mood=3, max_mood=3, entry_count=1
+        )
+        DailyLog.objects.create(
+            user=self.user, date=date(2025, 3, 1),
+            sleep_hours=Decimal('7.5'), stress=2, exercise='moderate'
+        )
+        DailyLog.objects.create(
+            user=self.user, date=date(2025, 3, 2), energy=4, alcohol='none'
+        )
+
+        other = User.objects.create_user(email='other@example.com', password='testpass123')
+        DailyLog.objects.create(user=other, date=date(2025, 3, 2), energy=1)
+
+    def test_dense_columns_and_masks(self):
+        """Test that days from either table line up on one date index."""
+        matrix = analytics.feature_matrix(self.user, date(2025, 2, 28), date(2025, 3, 3))
+
+        self.assertEqual(
+            matrix['dates'].tolist(),
+            [date(2025, 2, 28), date(2025, 3, 1), date(2025, 3, 2), date(2025, 3, 3)]
+        )
+        np.testing.assert_array_equal(
+            matrix['values']['average_mood'], [np.nan, 6.5, np.nan, 3.0]
+        )
+        np.testing.assert_array_equal(
+            matrix['masks']['average_mood'], [True, False, True, False]
+        )
+        np.testing.assert_array_equal(matrix['values']['sleep_hours'], [np.nan, 7.5, np.nan, np.nan])
+        np.testing.assert_array_equal(matrix['values']['energy'], [np.nan, np.nan, 4, np.nan])
+        # Ordinal codes follow the choice order
+        np.testing.assert_array_equal(matrix['values']['exercise'], [np.nan, 2, np.nan, np.nan])
+        np.testing.assert_array_equal(matrix['values']['alcohol'], [np.nan, np.nan, 0, np.nan])
+
+    def test_one_query(self):
+        """Test that both tables are read in a single statement."""
+        with self.assertNumQueries(1):
+            analytics.feature_matrix(self.user, date(2025, 1, 1), date(2025, 12, 31))
+
+    def test_endpoint(self):
+        """Test the JSON form with nulls, masks and categories."""
+        response = self.client.get(self.url, {'start': '2025-03-01', 'end': '2025-03-02'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['dates'], ['2025-03-01', '2025-03-02'])
+        self.assertEqual(response.data['columns']['entry_count'], [2.0, None])
+        self.assertEqual(response.data['masks']['entry_count'], [False, True])
+        self.assertEqual(response.data['columns']['energy'], [None, 4.0])
+        self.assertEqual(
+            response.data['categories']['exercise'],
+            ['none', 'light', 'moderate', 'intense']
+        )
+
+    def test_invalid_range(self):
+        """Test that bad dates and reversed or oversized ranges are rejected."""
+        for params in (
+            {'start': 'igår'},
+            {'start': '2025-03-02', 'end': '2025-03-01'},
+            {'start': '2000-01-01', 'end': '2025-03-01'},
+        ):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+class CorrelationTests(TestCase):
+    """Tests for analytics.correlate and GET /api/insights/correlations/."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.start = date(2025, 3, 1)
+        for day in range(20):
+            current = self.start + timedelta(days=day)
+            mood = 3 + day % 5
+            DailyAggregate.objects.create(
+                user=self.user, date=current,
+                average_mood=Decimal(mood), min_mood=mood, max_mood=mood, entry_count=1
+            )
+            # Sleep tracks same-day mood, stress tracks the next day's mood
+            DailyLog.objects.create(
+                user=self.user, date=current,
+                sleep_hours=Decimal(4 + mood), stress=1 + (day + 1) % 5,
+                alcohol='none' if mood > 4 else 'moderate'
+            )
+
+    def _result(self, results, factor, lag):
+        return next(r for r in results['results'] if r['factor'] == factor and r['lag'] == lag)
+
+    def test_lags_and_statistics(self):
+        """Test same-day and previous-day relationships."""
+        results = analytics.get_correlations(self.user)
+
+        sleep = self._result(results, 'sleep_hours', 0)
+        self.assertEqual(sleep['n'], 20)
+        self.assertEqual(sleep['pearson'], 1.0)
+        self.assertEqual(sleep['spearman'], 1.0)
+        self.assertGreater(sleep['mean_difference'], 0)
+
+        stress = self._result(results, 'stress', 1)
+        self.assertEqual(stress['n'], 19)
+        self.assertEqual(stress['pearson'], 1.0)
+
+        alcohol = self._result(results, 'alcohol', 0)
+        self.assertLess(alcohol['spearman'], 0)
+        self.assertLess(alcohol['mean_difference'], 0)
+
+    def test_matches_numpy(self):
+        """Test Pearson and Spearman against reference calculations."""
+        matrix = analytics.feature_matrix(self.user, self.start, self.start + timedelta(days=19))
+        results = analytics.correlate(matrix)
+
+        x = matrix['values']['stress']
+        y = matrix['values']['average_mood']
+        stress = self._result(results, 'stress', 0)
+        self.assertAlmostEqual(stress['pearson'], np.corrcoef(x, y)[0, 1], places=4)
+
+        def ranks(values):
+            order = values.argsort().argsort().astype(float)
+            # average ranks over ties
+            return np.array([order[values == value].mean() for value in values])
+        self.assertAlmostEqual(stress['spearman'], np.corrcoef(ranks(x), ranks(y))[0, 1], places=4)
+
+    def test_min_samples(self):
+        """Test that factors with too few paired days get no statistics."""
+        DailyLog.objects.filter(date__gte=self.start + timedelta(days=5)).update(energy=None)
+        DailyLog.objects.filter(date__lt=self.start + timedelta(days=5)).update(energy=3)
+
+        energy = self._result(analytics.get_correlations(self.user), 'energy', 0)
+        self.assertEqual(energy['n'], 5)
+        self.assertIsNone(energy['pearson'])
+        self.assertIsNone(energy['spearman'])
+        self.assertIsNone(energy['mean_difference'])
+
+    def test_cached_until_data_changes(self):
+        """Test that unchanged data only costs the version query."""
+        first = analytics.get_correlations(self.user)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(analytics.get_correlations(self.user), first)
+
+    def test_incremental_update_matches_full(self):
+        """Test that appending a day re-reads only the tail."""
+        analytics.get_correlations(self.user)
+        DailyLog.objects.create(user=self.user, date=self.start + timedelta(days=22), sleep_hours=Decimal('9'))
+        DailyLog.objects.filter(date=self.start + timedelta(days=19)).update(
+            sleep_hours=Decimal('2'), updated_at=timezone.now()
+        )
+
+        with mock.patch.object(analytics, 'feature_matrix', wraps=analytics.feature_matrix) as fetch:
+            with self.assertNumQueries(2):
+                incremental = analytics.get_correlations(self.user)
+        fetch.assert_called_once_with(self.user, self.start + timedelta(days=19), self.start + timedelta(days=22))
+        cache.clear()
+        self.assertEqual(incremental, analytics.get_correlations(self.user))
+        self.assertEqual(incremental['days'], 23)
+
+    def test_deletion_rebuilds(self):
+        """Test that deleting an early row falls back to a full rebuild."""
+        analytics.get_correlations(self.user)
+        DailyLog.objects.filter(date=self.start + timedelta(days=2)).delete()
+        DailyLog.objects.create(user=self.user, date=self.start + timedelta(days=20), sleep_hours=Decimal('9'))
+
+        with mock.patch.object(analytics, 'feature_matrix', wraps=analytics.feature_matrix) as fetch:
+            result = analytics.get_correlations(self.user)
+        self.assertEqual(fetch.call_args_list[-1].args[1], self.start)
+        cache.clear()
+        self.assertEqual(result, analytics.get_correlations(self.user))
+        self.assertEqual(self._result(result, 'sleep_hours', 0)['n'], 19)
+
+    def test_endpoint(self):
+        """Test the correlations endpoint."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get(reverse('moods:correlations'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['target'], 'average_mood')
+        self.assertEqual(len(response.data['results']), len(analytics.FACTORS) * len(analytics.LAGS))
+
+
+class TagImpactTests(TestCase):
+    """Tests for analytics.tag_impact and GET /api/insights/tags/."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.training = Tag.objects.create(user=self.user, name='Träning')
+        self.social = Tag.objects.create(user=self.user, name='Social')
+        Tag.objects.create(user=self.user, name='Oanvänd')
+
+        self.moods = {'with': [8, 7, 9, 6], 'without': [4, 5, 3, 6, 2]}
+        for level in self.moods['with']:
+            entry = MoodEntry.objects.create(user=self.user, mood_level=level)
+            entry.tags.add(self.training)
+        for level in self.moods['without']:
+            MoodEntry.objects.create(user=self.user, mood_level=level)
+        entry = MoodEntry.objects.create(user=self.user, mood_level=5)
+        entry.tags.add(self.social)
+
+        other = User.objects.create_user(email='other@example.com', password='testpass123')
+        other_tag = Tag.objects.create(user=other, name='Träning')
+        MoodEntry.objects.create(user=other, mood_level=1).tags.add(other_tag)
+
+    def test_with_and_without(self):
+        """Test averages, difference and the Welch interval."""
+        results = analytics.tag_impact(self.user)
+
+        self.assertEqual([result['tag']['name'] for result in results], ['Träning', 'Social'])
+        training = results[0]
+        with_tag = self.moods['with']
+        without = self.moods['without'] + [5]
+        self.assertEqual(training['entry_count'], 4)
+        self.assertEqual(training['average_with'], round(np.mean(with_tag), 2))
+        self.assertEqual(training['average_without'], round(np.mean(without), 2))
+        self.assertEqual(training['difference'], round(np.mean(with_tag) - np.mean(without), 2))
+
+        se = np.sqrt(np.var(with_tag, ddof=1) / 4 + np.var(without, ddof=1) / 6)
+        self.assertLess(training['ci_low'], training['difference'])
+        self.assertAlmostEqual(training['ci_high'] - training['difference'], 2.31 * se, delta=0.15)
+
+        # A single tagged entry has no interval
+        self.assertIsNone(results[1]['ci_low'])
+
+    def test_cached_until_entries_change(self):
+        """Test that unchanged entries skip the grouped query."""
+        analytics.tag_impact(self.user)
+
+        with self.assertNumQueries(1):
+            analytics.tag_impact(self.user)
+
+        entry = MoodEntry.objects.create(user=self.user, mood_level=10)
+        entry.tags.add(self.training)
+        with self.assertNumQueries(2):
+            results = analytics.tag_impact(self.user)
+        self.assertEqual(results[0]['entry_count'], 5)
+
+    def test_endpoint(self):
+        """Test the tag impact endpoint."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get(reverse('moods:tag-impact'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['results'][0]['tag']['id'], self.training.pk)
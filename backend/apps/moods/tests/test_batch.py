@@ -0,0 +1,128 @@
+"""
+Tests for the batch API.
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.moods.models import MoodEntry, DailyAggregate, DailyLog
+from apps.users.models import AccountDeletionJob
+
+User = get_user_model()
+
+
+class BatchViewTests(TestCase):
+    """Tests for POST /api/batch/."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.url = reverse('moods:batch')
+
+    def test_results_in_order(self):
+        """Test that sub-requests run in order and report their own status."""
+        response = self.client.post(self.url, {'requests': [
+            {'method': 'POST', 'path': '/api/entries/', 'body': {'mood_level': 4}},
+            {'method': 'POST', 'path': '/api/tags/', 'body': {'name': 'Arbete'}},
+            {'method': 'GET', 'path': '/api/entries/?start_date=2000-01-01'},
+            {'method': 'GET', 'path': '/api/auth/me/'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, [201, 201, 200, 200])
+        self.assertEqual(response.data['results'][2]['body']['count'], 1)
+        self.assertEqual(response.data['results'][3]['body']['email'], 'test@example.com')
+
+    def test_token_checked_once(self):
+        """Test that sub-requests reuse the outer authentication."""
+        requests = [{'method': 'GET', 'path': '/api/auth/me/'}] * 5
+
+        # Token lookup for the batch itself, nothing per sub-request
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url, {'requests': requests}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_deferred_work_runs(self):
+        """Test that work deferred by a sub-request still happens."""
+        self.client.post(self.url, {'requests': [
+            {'method': 'POST', 'path': '/api/entries/quick/', 'body': {'mood_level': 8}},
+        ]}, format='json')
+
+        self.assertEqual(DailyAggregate.objects.get(user=self.user).max_mood, 8)
+
+    def test_atomic_rolls_back(self):
+        """Test that an atomic batch is undone when a sub-request fails."""
+        response = self.client.post(self.url, {'atomic': True, 'requests': [
+            {'method': 'POST', 'path': '/api/entries/', 'body': {'mood_level': 5}},
+            {'method': 'POST', 'path': '/api/daily-logs/', 'body': {'energy': 9}},
+            {'method': 'POST', 'path': '/api/entries/', 'body': {'mood_level': 6}},
+        ]}, format='json')
+
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, [201, 400, 424])
+        self.assertFalse(MoodEntry.objects.exists())
+        self.assertFalse(DailyLog.objects.exists())
+
+    @override_settings(BACKGROUND_TASKS_INLINE=False)
+    def test_atomic_starts_background_work_after_commit(self):
+        """Test that jobs queued in an atomic batch start on commit, and never after a rollback."""
+        delete_account = {'method': 'DELETE', 'path': '/api/auth/me/delete/'}
+        with mock.patch('apps.moods.background._get_executor') as executor:
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = self.client.post(self.url, {'atomic': True, 'requests': [
+                    delete_account,
+                    {'method': 'POST', 'path': '/api/daily-logs/', 'body': {'energy': 9}},
+                ]}, format='json')
+            self.assertEqual([result['status'] for result in response.data['results']], [204, 400])
+            self.assertEqual(callbacks, [])
+            self.assertFalse(AccountDeletionJob.objects.exists())
+
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                response = self.client.post(self.url, {'atomic': True, 'requests': [delete_account]}, format='json')
+                self.assertEqual(response.data['results'][0]['status'], 204)
+                executor.assert_not_called()
+            self.assertEqual(len(callbacks), 1)
+            executor.return_value.submit.assert_called_once()
+
+    def test_streaming_endpoints_refused(self):
+        """Test that async and streaming views fail their own item, not the batch."""
+        response = self.client.post(self.url, {'requests': [
+            {'method': 'POST', 'path': '/api/daily-reflections/generate/stream/', 'body': {}},
+            {'method': 'GET', 'path': '/api/export/?format=csv'},
+            {'method': 'GET', 'path': '/api/auth/me/'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, [400, 400, 200])
+        self.assertIn('error', response.data['results'][1]['body'])
+
+    def test_disallowed_paths(self):
+        """Test that unknown, foreign and nested batch paths are refused."""
+        response = self.client.post(self.url, {'requests': [
+            {'method': 'GET', 'path': '/api/nope/'},
+            {'method': 'GET', 'path': '/admin/'},
+            {'method': 'POST', 'path': '/api/batch/', 'body': {'requests': []}},
+        ]}, format='json')
+
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, [404, 403, 403])
+
+    def test_requires_authentication(self):
+        """Test that the batch endpoint rejects anonymous callers."""
+        response = APIClient().post(self.url, {'requests': [
+            {'method': 'GET', 'path': '/api/entries/'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 401)
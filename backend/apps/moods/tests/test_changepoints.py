@@ -0,0 +1,170 @@
+"""
+Tests for online change-point detection.
+"""
+import io
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.moods import changepoints
+from apps.moods.models import MoodEntry, DailyAggregate, MoodChangeDetector, MoodChangePoint
+
+User = get_user_model()
+
+# Three weeks around 6, a four-day dip to 3, back to normal, then a lift
+STEADY = [5, 6, 7, 6] * 5
+SERIES = STEADY + [3, 2, 3, 3] + [6, 6, 5, 7, 6, 6] + [9, 9, 9, 9]
+
+
+class ChangePointTests(TestCase):
+    """Tests for changepoints and GET /api/insights/change-points/."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.start = date(2025, 1, 1)
+
+    def _day(self, index):
+        return self.start + timedelta(days=index)
+
+    def _aggregates(self, series):
+        DailyAggregate.objects.bulk_create(
+            DailyAggregate(
+                user=self.user, date=self._day(index), average_mood=Decimal(mood),
+                min_mood=mood, max_mood=mood, entry_count=1
+            )
+            for index, mood in enumerate(series)
+        )
+
+    def _step(self, state, day, mood):
+        return [(str(kind), start) for kind, start in changepoints.step(state, day, float(mood))]
+
+    def _change_points(self):
+        return list(
+            MoodChangePoint.objects.filter(user=self.user).order_by('date').values_list('kind', 'date')
+        )
+
+    def test_detects_dip_recovery_and_lift(self):
+        """Test that low, normal and high periods are dated from their start."""
+        state = {}
+        changes = []
+        for index, mood in enumerate(SERIES):
+            changes += self._step(state, self._day(index), mood)
+
+        self.assertEqual(changes, [
+            ('low', self._day(20)),
+            ('normal', self._day(24)),
+            ('high', self._day(30)),
+        ])
+        self.assertEqual(state['regime'], 'high')
+
+    def test_steady_series_has_no_changes(self):
+        """Test that ordinary day-to-day variation is not flagged."""
+        state = {}
+        changes = []
+        for index, mood in enumerate(STEADY * 4):
+            changes += self._step(state, self._day(index), mood)
+
+        self.assertEqual(changes, [])
+
+    def test_state_stays_small(self):
+        """Test that the stored state does not grow with history."""
+        self._aggregates(SERIES)
+
+        detector = changepoints.advance(self.user, self._day(len(SERIES)))
+
+        self.assertLessEqual(len(detector.state), 14)
+        self.assertEqual(detector.processed_through, self._day(len(SERIES)))
+
+    def test_advances_when_a_new_day_starts(self):
+        """Test that the first entry of a day feeds the days before it."""
+        for index, mood in enumerate(SERIES[:24]):
+            moment = datetime.combine(self._day(index), time(12), tzinfo=dt_timezone.utc)
+            MoodEntry.objects.create(user=self.user, mood_level=mood, timestamp=moment)
+
+        detector = MoodChangeDetector.objects.get(user=self.user)
+        self.assertEqual(detector.processed_through, self._day(22))
+        self.assertEqual(self._change_points(), [('low', self._day(20))])
+
+    def test_each_day_is_processed_once(self):
+        """Test that advancing again without new days reads nothing."""
+        self._aggregates(SERIES)
+        changepoints.advance(self.user, self._day(40))
+
+        with self.assertNumQueries(3):
+            changepoints.advance(self.user, self._day(40))
+
+    def test_backdated_change_rewinds(self):
+        """Test that changing an already processed day gives the same change points as a replay."""
+        self._aggregates(SERIES)
+        changepoints.advance(self.user, self._day(len(SERIES)))
+        self.assertEqual(self._change_points(), [
+            ('low', self._day(20)), ('normal', self._day(24)), ('high', self._day(30)),
+        ])
+
+        # Smooth the dip away with entries on those days
+        for index in range(20, 24):
+            moment = datetime.combine(self._day(index), time(12), tzinfo=dt_timezone.utc)
+            MoodEntry.objects.create(user=self.user, mood_level=6, timestamp=moment)
+
+        rewound = self._change_points()
+        self.assertEqual(rewound, [('high', self._day(27))])
+        changepoints.replay(self.user, self._day(len(SERIES)))
+        self.assertEqual(self._change_points(), rewound)
+
+    def test_change_after_processed_days_keeps_points(self):
+        """Test that a change after the processed days leaves stored points alone."""
+        self._aggregates(SERIES[:24])
+        changepoints.advance(self.user, self._day(22))
+        stored = list(MoodChangePoint.objects.filter(user=self.user).values_list('pk', flat=True))
+
+        moment = datetime.combine(self._day(23), time(12), tzinfo=dt_timezone.utc)
+        MoodEntry.objects.create(user=self.user, mood_level=6, timestamp=moment)
+
+        self.assertEqual(
+            list(MoodChangePoint.objects.filter(user=self.user).values_list('pk', flat=True)), stored
+        )
+
+    def test_replay_command_matches_incremental(self):
+        """Test that a batch replay gives the same change points."""
+        self._aggregates(SERIES)
+        for index in range(len(SERIES)):
+            changepoints.advance(self.user, self._day(index))
+        incremental = self._change_points()
+        out = io.StringIO()
+
+        call_command('detect_mood_changes', stdout=out)
+
+        self.assertEqual(self._change_points(), incremental)
+        self.assertIn('test@example.com: high', out.getvalue())
+
+    def test_endpoint(self):
+        """Test the endpoint includes unprocessed days, leaves out today and stores nothing."""
+        today = timezone.now().date()
+        self.start = today - timedelta(days=len(SERIES) - 1)
+        self._aggregates(SERIES)
+        changepoints.advance(self.user, self._day(22))
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get(reverse('moods:change-points'))
+
+        self.assertEqual(response.status_code, 200)
+        # The last day (today) is not final yet, so the lift is still open
+        self.assertEqual(response.data['processed_through'], today - timedelta(days=1))
+        self.assertEqual(response.data['regime'], 'high')
+        self.assertEqual(
+            [point['kind'] for point in response.data['change_points']],
+            ['high', 'normal', 'low']
+        )
+        detector = MoodChangeDetector.objects.get(user=self.user)
+        self.assertEqual(detector.processed_through, self._day(22))
+        self.assertEqual(self._change_points(), [('low', self._day(20))])
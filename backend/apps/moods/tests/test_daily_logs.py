@@ -0,0 +1,138 @@
+"""
+Tests for daily log upserts.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.moods.models import DailyLog
+
+User = get_user_model()
+
+
+class DailyLogUpsertTests(TestCase):
+    """Tests for DailyLog.objects.upsert."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.today = timezone.now().date()
+
+    def test_insert_then_update(self):
+        """Test that a second upsert updates the same row."""
+        [(log, created)] = DailyLog.objects.upsert(
+            self.user, [{'date': self.today, 'energy': 2, 'notes': 'Trött'}]
+        )
+        self.assertTrue(created)
+        self.assertEqual(log.energy, 2)
+
+        [(updated, created)] = DailyLog.objects.upsert(
+            self.user, [{'date': self.today, 'energy': 4}]
+        )
+        self.assertFalse(created)
+        self.assertEqual(updated.pk, log.pk)
+        self.assertEqual(updated.energy, 4)
+        # Fields missing from the row are left untouched
+        self.assertEqual(updated.notes, 'Trött')
+        self.assertEqual(DailyLog.objects.count(), 1)
+
+    def test_single_statement(self):
+        """Test that an upsert is one query regardless of existing rows."""
+        DailyLog.objects.create(user=self.user, date=self.today, energy=3)
+
+        with self.assertNumQueries(1):
+            DailyLog.objects.upsert(self.user, [
+                {'date': self.today, 'energy': 5},
+                {'date': self.today - timedelta(days=1), 'energy': 1},
+            ])
+
+    def test_typed_values_returned(self):
+        """Test that returned logs carry converted field values."""
+        [(log, _)] = DailyLog.objects.upsert(
+            self.user, [{'date': self.today, 'sleep_hours': Decimal('7.5')}]
+        )
+        log.refresh_from_db()
+        self.assertEqual(log.sleep_hours, Decimal('7.5'))
+        self.assertEqual(log.date, self.today)
+
+
+class DailyLogApiTests(TestCase):
+    """Tests for the daily log create, today and bulk endpoints."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = timezone.now().date()
+
+    def test_create_then_update_status_codes(self):
+        """Test 201 on first write and 200 when the day already exists."""
+        url = reverse('moods:daily-log-list')
+        payload = {'date': self.today.isoformat(), 'stress': 3}
+
+        first = self.client.post(url, payload, format='json')
+        second = self.client.post(url, {**payload, 'stress': 1}, format='json')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertEqual(second.data['stress'], 1)
+
+    def test_future_date_rejected(self):
+        """Test that future dates are still rejected."""
+        url = reverse('moods:daily-log-list')
+        tomorrow = self.today + timedelta(days=1)
+
+        response = self.client.post(url, {'date': tomorrow.isoformat()}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_today_upsert(self):
+        """Test that the today endpoint keeps updating the same log."""
+        url = reverse('moods:daily-log-today')
+
+        self.client.post(url, {'energy': 2}, format='json')
+        response = self.client.post(url, {'energy': 5}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['energy'], 5)
+        self.assertEqual(DailyLog.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_upsert(self):
+        """Test backfilling several days in one request."""
+        url = reverse('moods:daily-log-bulk')
+        DailyLog.objects.create(user=self.user, date=self.today, energy=1)
+        payload = [
+            {'date': (self.today - timedelta(days=days)).isoformat(), 'energy': 4}
+            for days in range(3)
+        ]
+
+        response = self.client.post(url, payload, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(
+            list(DailyLog.objects.filter(user=self.user).values_list('energy', flat=True)),
+            [4, 4, 4]
+        )
+
+    def test_bulk_rejects_duplicate_dates(self):
+        """Test that a day cannot appear twice in one bulk request."""
+        url = reverse('moods:daily-log-bulk')
+        payload = [{'date': self.today.isoformat()}, {'date': self.today.isoformat()}]
+
+        response = self.client.post(url, payload, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(DailyLog.objects.exists())
@@ -0,0 +1,116 @@
+"""
+Tests for weekly digest precomputation.
+"""
+import io
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.moods import digests
+from apps.moods.models import Tag, MoodEntry, DailyLog, WeeklyDigest
+
+User = get_user_model()
+STOCKHOLM = ZoneInfo('Europe/Stockholm')
+MONDAY = date(2025, 3, 3)
+
+
+class WeeklyDigestTests(TestCase):
+    """Tests for digests and the build_weekly_digests command."""
+
+    def setUp(self):
+        self.user = self._user('test@example.com', [(0, 4), (0, 6), (2, 8), (4, 3)])
+        self.other = self._user('other@example.com', [(1, 7)])
+        self.inactive = self._user('inactive@example.com', [(1, 2)])
+        self.inactive.is_active = False
+        self.inactive.save()
+        # Entries outside the week do not make a user pending
+        self._user('earlier@example.com', [(-3, 5)])
+
+        training = Tag.objects.create(user=self.user, name='Träning')
+        social = Tag.objects.create(user=self.user, name='Social')
+        for entry in MoodEntry.objects.filter(user=self.user):
+            entry.tags.add(training)
+        MoodEntry.objects.filter(user=self.user, mood_level=8).get().tags.add(social)
+
+        DailyLog.objects.create(user=self.user, date=MONDAY - timedelta(days=3), sleep_hours=Decimal('6.0'))
+        DailyLog.objects.create(user=self.user, date=MONDAY, sleep_hours=Decimal('7.0'), stress=2)
+        DailyLog.objects.create(user=self.user, date=MONDAY + timedelta(days=1), sleep_hours=Decimal('8.0'))
+
+    def _user(self, email, entries):
+        user = User.objects.create_user(email=email, password='testpass123')
+        for day, mood in entries:
+            moment = datetime.combine(MONDAY + timedelta(days=day), time(12), tzinfo=STOCKHOLM)
+            MoodEntry.objects.create(user=user, mood_level=mood, timestamp=moment)
+        return user
+
+    def _build(self):
+        out = io.StringIO()
+        call_command('build_weekly_digests', week=str(MONDAY), workers=1, shard_size=1, stdout=out)
+        return out.getvalue()
+
+    def test_digest_contents(self):
+        """Test averages, best and worst day, tags and factor changes."""
+        self._build()
+
+        digest = WeeklyDigest.objects.get(user=self.user)
+        self.assertEqual(digest.week_start, MONDAY)
+        self.assertEqual(digest.entry_count, 4)
+        self.assertEqual(digest.days_logged, 3)
+        self.assertEqual(digest.average_mood, Decimal('5.25'))
+        self.assertEqual((digest.best_day, digest.best_mood), (MONDAY + timedelta(days=2), Decimal('8.00')))
+        self.assertEqual((digest.worst_day, digest.worst_mood), (MONDAY + timedelta(days=4), Decimal('3.00')))
+        self.assertEqual([tag['name'] for tag in digest.top_tags], ['Träning', 'Social'])
+        self.assertEqual(digest.top_tags[0]['count'], 4)
+        self.assertEqual(digest.factors['sleep_hours'], {'average': 7.5, 'change': 1.5})
+        self.assertEqual(digest.factors['stress'], {'average': 2.0, 'change': None})
+
+    def test_only_active_users_with_entries(self):
+        """Test which users get a digest, and the throughput report."""
+        output = self._build()
+
+        self.assertEqual(
+            set(WeeklyDigest.objects.values_list('user__email', flat=True)),
+            {'test@example.com', 'other@example.com'}
+        )
+        self.assertIn('2 digests for 2 users in 2 shards', output)
+        self.assertIn('users/s', output)
+
+    def test_resumable(self):
+        """Test that a rerun only builds the missing digests."""
+        self._build()
+        WeeklyDigest.objects.filter(user=self.other).delete()
+
+        output = self._build()
+
+        self.assertIn('1 digests for 1 users', output)
+        self.assertEqual(WeeklyDigest.objects.count(), 2)
+
+    def test_queries_do_not_grow_with_users(self):
+        """Test that a shard costs the same number of queries for any size."""
+        with CaptureQueriesContext(connection) as one:
+            digests.build_digests([self.user.pk], MONDAY)
+        with CaptureQueriesContext(connection) as many:
+            digests.build_digests([self.user.pk, self.other.pk, self.inactive.pk], MONDAY)
+
+        self.assertEqual(len(one.captured_queries), 3)
+        self.assertEqual(len(many.captured_queries), 3)
+
+    def test_endpoint(self):
+        """Test that users only see their own digests."""
+        self._build()
+        client = APIClient()
+        client.force_authenticate(self.other)
+
+        response = client.get(reverse('moods:digest-list'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['average_mood'], '7.00')
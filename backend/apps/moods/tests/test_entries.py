@@ -0,0 +1,158 @@
+"""
+Tests for mood entry listing and the denormalized tag ids.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.moods.models import Tag, MoodEntry
+
+User = get_user_model()
+
+
+class MoodEntryTagIdsTests(TestCase):
+    """Tests for keeping MoodEntry.tag_ids in sync with MoodEntry.tags."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.work = Tag.objects.create(user=self.user, name='Arbete')
+        self.sport = Tag.objects.create(user=self.user, name='Träning')
+        self.entry = MoodEntry.objects.create(user=self.user, mood_level=6)
+
+    def _stored_tag_ids(self):
+        return MoodEntry.objects.get(pk=self.entry.pk).tag_ids
+
+    def test_set_add_remove(self):
+        """Test that tag_ids follows set(), add(), remove() and clear()."""
+        self.entry.tags.set([self.sport, self.work])
+        self.assertEqual(self._stored_tag_ids(), sorted([self.work.pk, self.sport.pk]))
+        self.assertEqual(self.entry.tag_ids, sorted([self.work.pk, self.sport.pk]))
+
+        self.entry.tags.remove(self.work)
+        self.assertEqual(self._stored_tag_ids(), [self.sport.pk])
+
+        self.entry.tags.clear()
+        self.assertEqual(self._stored_tag_ids(), [])
+
+    def test_reverse_side(self):
+        """Test that changes made from the tag side are synced too."""
+        self.work.entries.add(self.entry)
+        self.assertEqual(self._stored_tag_ids(), [self.work.pk])
+
+        self.work.entries.clear()
+        self.assertEqual(self._stored_tag_ids(), [])
+
+    def test_tag_deleted(self):
+        """Test that deleting a tag removes it from entries."""
+        self.entry.tags.set([self.work, self.sport])
+
+        self.work.delete()
+
+        self.assertEqual(self._stored_tag_ids(), [self.sport.pk])
+
+    def test_stale_instance_keeps_tag_ids(self):
+        """Test that saving an instance loaded before a tag change keeps the new tags."""
+        stale = MoodEntry.objects.get(pk=self.entry.pk)
+        self.entry.tags.set([self.work])
+
+        stale.mood_level = 8
+        stale.save()
+
+        self.assertEqual(self._stored_tag_ids(), [self.work.pk])
+
+    def test_tag_deleted_in_one_update(self):
+        """Test that a tag on many entries is dropped with one UPDATE."""
+        for _ in range(10):
+            MoodEntry.objects.create(user=self.user, mood_level=5).tags.set([self.work, self.sport])
+
+        # Tagged entries, the two deletes, the remaining tags and one UPDATE
+        with self.assertNumQueries(5):
+            self.work.delete()
+
+        self.assertEqual(
+            {tuple(ids) for ids in MoodEntry.objects.exclude(pk=self.entry.pk).values_list('tag_ids', flat=True)},
+            {(self.sport.pk,)}
+        )
+
+    def test_contains_lookup(self):
+        """Test that tag_ids__contains matches entries holding all ids."""
+        other = MoodEntry.objects.create(user=self.user, mood_level=3)
+        self.entry.tags.set([self.work, self.sport])
+        other.tags.set([self.work])
+
+        both = MoodEntry.objects.filter(tag_ids__contains=[self.work.pk, self.sport.pk])
+        work = MoodEntry.objects.filter(tag_ids__contains=[self.work.pk])
+
+        self.assertEqual(list(both), [self.entry])
+        self.assertEqual(set(work), {self.entry, other})
+
+
+class MoodEntryListTests(TestCase):
+    """Tests for GET /api/entries/."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('moods:entry-list')
+        self.work = Tag.objects.create(user=self.user, name='Arbete', color='#3B82F6')
+        self.sport = Tag.objects.create(user=self.user, name='Träning')
+        for level in range(1, 6):
+            entry = MoodEntry.objects.create(user=self.user, mood_level=level)
+            entry.tags.set([self.sport, self.work] if level % 2 else [self.sport])
+
+    def test_tags_rendered_without_join(self):
+        """Test that entries and their tags are listed with a single entry query."""
+        self.client.get(self.url)  # Warm the tag map cache
+
+        # One COUNT for pagination and one SELECT for the entries
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        first = response.data['results'][0]
+        self.assertEqual([tag['name'] for tag in first['tags']], ['Arbete', 'Träning'])
+        self.assertEqual(first['tags'][0]['color'], '#3B82F6')
+
+    def test_renamed_tag_rendered(self):
+        """Test that tag changes invalidate the cached tag map."""
+        self.client.get(self.url)
+        self.work.name = 'Jobb'
+        self.work.save()
+
+        response = self.client.get(self.url)
+
+        names = {tag['name'] for entry in response.data['results'] for tag in entry['tags']}
+        self.assertIn('Jobb', names)
+        self.assertNotIn('Arbete', names)
+
+    def test_filter_by_tags(self):
+        """Test ?tags= filtering with array containment."""
+        response = self.client.get(self.url, {'tags': f'{self.work.pk},{self.sport.pk}'})
+
+        self.assertEqual(response.data['count'], 3)
+
+    def test_filter_by_invalid_tags(self):
+        """Test that malformed tag filters are rejected."""
+        response = self.client.get(self.url, {'tags': 'abc'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_create_returns_tags(self):
+        """Test that a created entry is returned with its tags."""
+        response = self.client.post(
+            self.url, {'mood_level': 7, 'tag_ids': [self.work.pk]}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([tag['id'] for tag in response.data['tags']], [self.work.pk])
@@ -0,0 +1,123 @@
+"""
+Tests for the streaming history export.
+"""
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.moods.models import Tag, MoodEntry, DailyLog, DailyReflection
+
+User = get_user_model()
+
+
+class ExportViewTests(TestCase):
+    """Tests for GET /api/export/."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('moods:export')
+
+        now = timezone.now()
+        tag = Tag.objects.create(user=self.user, name='Träning')
+        first = MoodEntry.objects.create(
+            user=self.user, mood_level=4, timestamp=now - timedelta(days=1), note='Seg'
+        )
+        first.tags.add(tag)
+        MoodEntry.objects.create(user=self.user, mood_level=8, timestamp=now)
+        DailyLog.objects.create(
+            user=self.user, date=now.date(), sleep_hours=Decimal('7.5'), exercise='light'
+        )
+        DailyReflection.objects.create(user=self.user, date=now.date(), entry='En dag.')
+
+        other = User.objects.create_user(email='other@example.com', password='testpass123')
+        MoodEntry.objects.create(user=other, mood_level=1)
+
+    def _content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_all_datasets(self):
+        """Test that NDJSON holds every dataset for the user only."""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        records = [json.loads(line) for line in self._content(response).splitlines()]
+
+        types = [record['type'] for record in records]
+        self.assertEqual(types.count('mood_entries'), 2)
+        self.assertEqual(types.count('daily_logs'), 1)
+        self.assertEqual(types.count('daily_aggregates'), 2)
+        self.assertEqual(types.count('daily_reflections'), 1)
+
+        entry = records[0]
+        self.assertEqual(entry['mood_level'], 4)
+        self.assertEqual(entry['tags'], ['Träning'])
+        log = next(record for record in records if record['type'] == 'daily_logs')
+        self.assertEqual(log['sleep_hours'], '7.5')
+        self.assertEqual(log['exercise'], 'light')
+
+    def test_ndjson_subset(self):
+        """Test ?datasets= restricts the export."""
+        response = self.client.get(self.url, {'datasets': 'daily_reflections'})
+
+        records = [json.loads(line) for line in self._content(response).splitlines()]
+        self.assertEqual(records, [{
+            'type': 'daily_reflections',
+            'date': timezone.now().date().isoformat(),
+            'entry': 'En dag.',
+            'created_at': records[0]['created_at'],
+        }])
+
+    def test_csv(self):
+        """Test CSV export of one dataset with a header row."""
+        response = self.client.get(self.url, {'format': 'csv'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment; filename="humorkarta-mood_entries.csv"', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(self._content(response))))
+        self.assertEqual(rows[0], ['id', 'timestamp', 'mood_level', 'note', 'tags'])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1][2:], ['4', 'Seg', 'Träning'])
+
+    def test_unknown_dataset(self):
+        """Test that unknown datasets are rejected."""
+        response = self.client.get(self.url, {'format': 'csv', 'dataset': 'users'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_streams_before_reading_everything(self):
+        """Test that the first chunk is produced before later rows are read."""
+        response = self.client.get(self.url, {'format': 'csv'})
+
+        with self.assertNumQueries(0):
+            first = next(iter(response.streaming_content))
+        self.assertTrue(first.startswith(b'id,timestamp'))
+
+    async def test_streams_asynchronously_under_asgi(self):
+        """Test that ASGI gets an async body rather than one Django collects into a list."""
+        token = await Token.objects.acreate(user=self.user)
+
+        response = await self.async_client.get(
+            self.url, {'format': 'csv'}, headers={'Authorization': f'Token {token.key}'}
+        )
+
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(len(list(csv.reader(io.StringIO(content)))), 3)
@@ -0,0 +1,110 @@
+"""
+Tests for graph data rolling statistics.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.moods import analytics
+from apps.moods.models import DailyAggregate
+
+User = get_user_model()
+
+
+class RollingStatisticsTests(TestCase):
+    """Tests for GET /api/graph/?rolling=N."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('moods:graph-data')
+
+        self.moods = {}
+        start = date(2025, 2, 20)
+        for day in range(20):
+            # Leave a gap so windows are measured in calendar days
+            if day in (11, 12):
+                continue
+            current = start + timedelta(days=day)
+            mood = Decimal(2 + (day * 3) % 7)
+            self.moods[current] = float(mood)
+            DailyAggregate.objects.create(
+                user=self.user, date=current,
+                average_mood=mood, min_mood=int(mood), max_mood=int(mood), entry_count=1
+            )
+
+    def _expected(self, day, window):
+        values = [
+            mood for current, mood in self.moods.items()
+            if day - timedelta(days=window - 1) <= current <= day
+        ]
+        mean = sum(values) / len(values)
+        std = (sum((value - mean) ** 2 for value in values) / len(values)) ** 0.5
+        return round(mean, 2), round(std, 2)
+
+    def test_week_with_rolling_window(self):
+        """Test moving average and standard deviation, including lead-in days."""
+        response = self.client.get(self.url, {'view': 'week', 'date': '2025-03-11', 'rolling': '3'})
+
+        self.assertEqual(response.status_code, 200)
+        rolling = response.data['rolling']
+        self.assertEqual(rolling['window'], 3)
+        self.assertEqual(
+            [row['date'] for row in rolling['data']],
+            [row['date'] for row in response.data['data']]
+        )
+        for row in rolling['data']:
+            mean, std = self._expected(date.fromisoformat(row['date']), 3)
+            self.assertAlmostEqual(row['moving_average'], mean, places=2)
+            self.assertAlmostEqual(row['moving_std'], std, places=2)
+
+    def test_python_fallback_matches_database(self):
+        """Test that the NumPy path gives the same series as window functions."""
+        start, end = date(2025, 3, 1), date(2025, 3, 11)
+        in_database = analytics.rolling_statistics(self.user, start, end, 7)
+
+        with mock.patch.object(connection.features, 'supports_over_clause', False):
+            in_python = analytics.rolling_statistics(self.user, start, end, 7)
+
+        self.assertEqual(in_database, in_python)
+
+    def test_trend_follows_level_shift(self):
+        """Test that the trend moves toward a new level but lags behind it."""
+        DailyAggregate.objects.filter(user=self.user, date__gte=date(2025, 3, 5)).update(
+            average_mood=Decimal('9.00')
+        )
+
+        rows = analytics.rolling_statistics(self.user, date(2025, 3, 4), date(2025, 3, 11), 7)
+
+        trends = [row['trend'] for row in rows]
+        self.assertEqual(trends, sorted(trends))
+        self.assertLess(trends[-1], 9)
+        self.assertGreater(trends[-1], trends[0])
+
+    def test_single_query(self):
+        """Test that the rolling series costs one query."""
+        with self.assertNumQueries(1):
+            analytics.rolling_statistics(self.user, date(2025, 3, 1), date(2025, 3, 31), 30)
+
+    def test_invalid_window(self):
+        """Test that unusable windows are rejected."""
+        for value in ('1', '500', 'vecka'):
+            response = self.client.get(self.url, {'view': 'month', 'rolling': value})
+            self.assertEqual(response.status_code, 400, value)
+
+    def test_without_rolling(self):
+        """Test that the response is unchanged without the parameter."""
+        response = self.client.get(self.url, {'view': 'month', 'date': '2025-03-11'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('rolling', response.data)
@@ -0,0 +1,147 @@
+"""
+Tests for the hour-of-week mood heatmap.
+"""
+import io
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.moods.models import MoodEntry, MoodHeatmap
+
+User = get_user_model()
+STOCKHOLM = ZoneInfo('Europe/Stockholm')
+
+
+class MoodHeatmapTests(TestCase):
+    """Tests for MoodHeatmap maintenance and GET /api/insights/heatmap/."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('moods:heatmap')
+        # Monday 08:30 local time
+        self.monday_morning = datetime(2025, 3, 3, 8, 30, tzinfo=STOCKHOLM)
+
+    def _lifetime(self):
+        return MoodHeatmap.objects.get(user=self.user, month__isnull=True)
+
+    def _snapshot(self):
+        return {
+            row.month: (row.sums, row.counts)
+            for row in MoodHeatmap.objects.filter(user=self.user)
+        }
+
+    def _assert_matches_rebuild(self):
+        incremental = self._snapshot()
+        MoodHeatmap.rebuild(self.user)
+        self.assertEqual(incremental, self._snapshot())
+
+    def test_counts_in_local_time(self):
+        """Test that entries land in their local weekday and hour."""
+        MoodEntry.objects.create(user=self.user, mood_level=3, timestamp=self.monday_morning)
+        MoodEntry.objects.create(user=self.user, mood_level=5, timestamp=self.monday_morning)
+        # Sunday 23:30 local is still Sunday even though it is 22:30 UTC
+        MoodEntry.objects.create(
+            user=self.user, mood_level=9, timestamp=datetime(2025, 3, 9, 23, 30, tzinfo=STOCKHOLM)
+        )
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['averages'][0][8], 4.0)
+        self.assertEqual(response.data['counts'][0][8], 2)
+        self.assertEqual(response.data['averages'][6][23], 9.0)
+        self.assertIsNone(response.data['averages'][0][9])
+        self._assert_matches_rebuild()
+
+    def test_edit_moves_contribution(self):
+        """Test that changing mood or time moves the entry's counts."""
+        entry = MoodEntry.objects.create(user=self.user, mood_level=3, timestamp=self.monday_morning)
+
+        entry = MoodEntry.objects.get(pk=entry.pk)
+        entry.mood_level = 7
+        entry.timestamp = self.monday_morning + timedelta(days=31, hours=2)
+        entry.save()
+
+        lifetime = self._lifetime()
+        self.assertEqual(lifetime.counts[8], 0)
+        cell = 3 * 24 + 10  # Thursday 2025-04-03, 10:30
+        self.assertEqual((lifetime.sums[cell], lifetime.counts[cell]), (7, 1))
+        # The emptied March partition is removed
+        self.assertEqual(
+            list(MoodHeatmap.objects.filter(user=self.user, month__isnull=False).values_list('month', flat=True)),
+            [datetime(2025, 4, 1).date()]
+        )
+        self._assert_matches_rebuild()
+
+    def test_delete(self):
+        """Test that deleting an entry subtracts it."""
+        keep = MoodEntry.objects.create(user=self.user, mood_level=6, timestamp=self.monday_morning)
+        MoodEntry.objects.create(user=self.user, mood_level=2, timestamp=self.monday_morning).delete()
+
+        self.assertEqual(self._lifetime().sums[8], keep.mood_level)
+        self.assertEqual(self._lifetime().counts[8], 1)
+        self._assert_matches_rebuild()
+
+    def test_missing_rows_are_counted_from_entries(self):
+        """Test editing and deleting entries from before the heatmap existed."""
+        entries = [
+            MoodEntry.objects.create(user=self.user, mood_level=level, timestamp=self.monday_morning)
+            for level in (5, 5)
+        ]
+        MoodHeatmap.objects.all().delete()
+
+        entries[0].mood_level = 9
+        entries[0].save()
+        self.assertEqual((self._lifetime().sums[8], self._lifetime().counts[8]), (14, 2))
+
+        MoodHeatmap.objects.all().delete()
+        entries[1].delete()
+        self.assertEqual((self._lifetime().sums[8], self._lifetime().counts[8]), (9, 1))
+        self._assert_matches_rebuild()
+
+        MoodHeatmap.objects.all().delete()
+        entries[0].delete()
+        self.assertEqual(self._lifetime().counts, [0] * MoodHeatmap.CELLS)
+        self.assertFalse(MoodHeatmap.objects.filter(month__isnull=False).exists())
+
+    def test_recent_months(self):
+        """Test that ?months= only adds up recent monthly partitions."""
+        now = timezone.now()
+        MoodEntry.objects.create(user=self.user, mood_level=2, timestamp=now - timedelta(days=400))
+        MoodEntry.objects.create(user=self.user, mood_level=8, timestamp=now)
+
+        lifetime = self.client.get(self.url)
+        recent = self.client.get(self.url, {'months': 3})
+
+        self.assertEqual(sum(map(sum, lifetime.data['counts'])), 2)
+        self.assertEqual(sum(map(sum, recent.data['counts'])), 1)
+        self.assertLessEqual(recent.data['since'], timezone.localdate().isoformat())
+
+    def test_invalid_months(self):
+        """Test that unusable windows are rejected."""
+        for value in ('0', '1000', 'år'):
+            response = self.client.get(self.url, {'months': value})
+            self.assertEqual(response.status_code, 400, value)
+
+    def test_rebuild_command(self):
+        """Test the backfill command."""
+        MoodEntry.objects.create(user=self.user, mood_level=4, timestamp=self.monday_morning)
+        MoodHeatmap.objects.all().delete()
+        out = io.StringIO()
+
+        call_command('rebuild_mood_heatmaps', stdout=out)
+
+        self.assertEqual(self._lifetime().counts[8], 1)
+        self.assertIn('Rebuilt heatmaps for 1 users (2 rows)', out.getvalue())
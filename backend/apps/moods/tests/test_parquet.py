@@ -0,0 +1,109 @@
+"""
+Tests for the Parquet export.
+"""
+import io
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.moods import parquet
+from apps.moods.models import Tag, MoodEntry, DailyLog
+
+User = get_user_model()
+
+
+class ParquetExportTests(TestCase):
+    """Tests for GET /api/export/?format=parquet and export_parquet."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('moods:export')
+
+        now = timezone.now()
+        tag = Tag.objects.create(user=self.user, name='Träning')
+        entry = MoodEntry.objects.create(
+            user=self.user, mood_level=4, timestamp=now - timedelta(days=1), note='Seg'
+        )
+        entry.tags.add(tag)
+        MoodEntry.objects.create(user=self.user, mood_level=8, timestamp=now)
+        DailyLog.objects.create(
+            user=self.user, date=now.date(), sleep_hours=Decimal('7.5'), exercise='light'
+        )
+        DailyLog.objects.create(
+            user=self.user, date=now.date() - timedelta(days=1), energy=2, social='some'
+        )
+
+        self.other = User.objects.create_user(email='other@example.com', password='testpass123')
+        MoodEntry.objects.create(user=self.other, mood_level=1)
+
+    def _table(self, response):
+        self.assertTrue(response.streaming)
+        return pq.read_table(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_mood_entries(self):
+        """Test that entries keep their types and tags become names."""
+        response = self.client.get(self.url, {'format': 'parquet'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], parquet.MEDIA_TYPE)
+        self.assertIn('humorkarta-mood_entries.parquet', response['Content-Disposition'])
+        table = self._table(response)
+        self.assertEqual(table.num_rows, 2)
+        self.assertEqual(table.schema.field('timestamp').type, pa.timestamp('us', tz='UTC'))
+        self.assertEqual(table.schema.field('mood_level').type, pa.int16())
+        self.assertEqual(table.column('mood_level').to_pylist(), [4, 8])
+        self.assertEqual(table.column('tags').to_pylist(), [['Träning'], []])
+
+    def test_daily_logs_types(self):
+        """Test decimal and dictionary-encoded choice columns."""
+        response = self.client.get(self.url, {'format': 'parquet', 'dataset': 'daily_logs'})
+
+        table = self._table(response)
+        self.assertEqual(table.schema.field('sleep_hours').type, pa.decimal128(3, 1))
+        self.assertTrue(pa.types.is_dictionary(table.schema.field('exercise').type))
+        self.assertEqual(table.column('sleep_hours').to_pylist(), [None, Decimal('7.5')])
+        self.assertEqual(table.column('exercise').to_pylist(), [None, 'light'])
+        self.assertEqual(table.column('energy').to_pylist(), [2, None])
+        self.assertEqual(table.column('social').to_pylist(), ['some', None])
+
+    def test_unknown_dataset(self):
+        """Test that unknown datasets are rejected."""
+        response = self.client.get(self.url, {'format': 'parquet', 'dataset': 'users'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_management_command(self):
+        """Test the database-wide export writes one file per dataset."""
+        with tempfile.TemporaryDirectory() as directory:
+            out = io.StringIO()
+            call_command(
+                'export_parquet', directory,
+                datasets='mood_entries,daily_logs', batch_size=1, stdout=out
+            )
+
+            entries = pq.read_table(Path(directory) / 'mood_entries.parquet')
+            self.assertEqual(entries.num_rows, 3)
+            self.assertEqual(
+                sorted(entries.column('user_id').to_pylist()),
+                sorted([self.user.pk, self.user.pk, self.other.pk])
+            )
+            self.assertEqual(entries.schema.field('tag_ids').type, pa.list_(pa.int64()))
+            self.assertEqual(pq.ParquetFile(Path(directory) / 'mood_entries.parquet').num_row_groups, 3)
+            self.assertIn('daily_logs: 2 rows', out.getvalue())
@@ -0,0 +1,170 @@
+"""
+Tests for nightly batch pre-generation of daily reflections.
+"""
+import io
+import json
+import os
+from datetime import date, datetime, timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.moods import pregeneration
+from apps.moods.models import MoodEntry, DailyLog, DailyReflection, ReflectionBatch, ReflectionJob
+from apps.moods.tests.fake_anthropic import FakeAnthropicServer
+from apps.moods.tests.test_reflections import PAYLOAD, log_day
+
+User = get_user_model()
+
+DAY = date(2025, 3, 4)
+
+
+@override_settings(ANTHROPIC_MAX_RETRIES=0)
+@mock.patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test-key'})
+class PregenerationTests(TestCase):
+    """Tests for pregeneration and the pregenerate_reflections command, against a fake batch API."""
+
+    def setUp(self):
+        self.server = FakeAnthropicServer().start()
+        self.addCleanup(self.server.stop)
+        base_url = override_settings(ANTHROPIC_BASE_URL=self.server.url)
+        base_url.enable()
+        self.addCleanup(base_url.disable)
+
+        self.opted_in = self._user('a@example.com', opted_in=True)
+        log_day(self.opted_in)
+        self.log_only = self._user('b@example.com', opted_in=True)
+        DailyLog.objects.create(user=self.log_only, date=DAY, energy=4)
+        self._user('c@example.com', opted_in=True)  # nothing logged
+        log_day(self._user('d@example.com', opted_in=False))
+        done = self._user('e@example.com', opted_in=True)
+        MoodEntry.objects.create(user=done, mood_level=5, timestamp=datetime(2025, 3, 4, 9, tzinfo=dt_timezone.utc))
+        DailyReflection.objects.create(user=done, date=DAY, entry='redan')
+
+    def _user(self, email, opted_in):
+        return User.objects.create_user(email=email, password='testpass123', pregenerate_reflections=opted_in)
+
+    def _run(self, *args):
+        out = io.StringIO()
+        call_command('pregenerate_reflections', '--date', '2025-03-04', '--poll-interval', '0', *args, stdout=out)
+        return out.getvalue()
+
+    def test_pending_users_are_opted_in_with_data_and_no_reflection(self):
+        self.assertEqual(pregeneration.pending_user_ids(DAY), [self.opted_in.pk, self.log_only.pk])
+
+    def test_submit_sends_one_batch_in_fixed_queries(self):
+        # Pending users, the three snapshot queries and the batch row
+        with self.assertNumQueries(5):
+            batch = pregeneration.submit(DAY)
+
+        (requests,) = [stored['requests'] for stored in self.server.batches.values()]
+        self.assertEqual(batch.request_count, 2)
+        self.assertEqual(
+            [request['custom_id'] for request in requests],
+            [f'user-{self.opted_in.pk}', f'user-{self.log_only.pk}']
+        )
+        day = requests[0]['params']['messages'][0]['content'][1]['text']
+        self.assertIn('Noteringar från humörloggar: promenad', day)
+        self.assertNotIn('stream', requests[0]['params'])
+
+    def test_command_stores_pregenerated_reflections(self):
+        self.server.failing_ids = {f'user-{self.log_only.pk}'}
+
+        output = self._run()
+
+        self.assertIn('submitted 2 reflections', output)
+        self.assertIn('stored 1 reflections, 1 failed', output)
+        reflection = DailyReflection.objects.get(user=self.opted_in)
+        self.assertEqual(reflection.entry, self.server.text)
+        self.assertTrue(reflection.pregenerated)
+        self.assertFalse(DailyReflection.objects.filter(user=self.log_only).exists())
+        batch = ReflectionBatch.objects.get()
+        self.assertEqual((batch.status, batch.succeeded, batch.failed), ('done', 1, 1))
+
+    def test_unfinished_batch_is_collected_by_the_next_run(self):
+        self.server.batch_polls = 5
+
+        self.assertIn('still processing', self._run('--wait', '0'))
+        self.assertFalse(DailyReflection.objects.filter(pregenerated=True).exists())
+
+        self.server.batch_polls = 0
+        output = self._run('--wait', '0')
+
+        self.assertNotIn('submitted', output)
+        self.assertEqual(len(self.server.batches), 1)
+        self.assertEqual(DailyReflection.objects.filter(pregenerated=True).count(), 2)
+
+    def test_reflection_generated_meanwhile_is_kept(self):
+        self.server.batch_polls = 0
+        batch = pregeneration.submit(DAY)
+        DailyReflection.objects.create(user=self.opted_in, date=DAY, entry='egen')
+
+        self.assertTrue(pregeneration.collect(batch))
+
+        self.assertEqual(DailyReflection.objects.get(user=self.opted_in).entry, 'egen')
+        self.assertTrue(DailyReflection.objects.get(user=self.log_only).pregenerated)
+
+    def test_opt_in_through_profile(self):
+        user = self._user('f@example.com', opted_in=False)
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        response = client.patch(reverse('users:profile'), {'pregenerate_reflections': True}, format='json')
+
+        self.assertTrue(response.data['pregenerate_reflections'])
+        user.refresh_from_db()
+        self.assertTrue(user.pregenerate_reflections)
+
+
+@mock.patch.dict(os.environ, {'ANTHROPIC_API_KEY': ''})
+class PregeneratedServingTests(TestCase):
+    """The generate endpoints serve a pre-generated reflection without calling the model."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.reflection = DailyReflection.objects.create(
+            user=self.user, date=DAY, entry='Förskapad text', pregenerated=True
+        )
+        cache.clear()
+
+    def test_generate_returns_it_as_done(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        # One indexed read; no API key needed
+        with self.assertNumQueries(1):
+            response = client.post(reverse('moods:daily-reflection-generate'), PAYLOAD, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            'status': 'done', 'id': self.reflection.pk, 'date': '2025-03-04', 'entry': 'Förskapad text',
+        })
+        self.assertFalse(ReflectionJob.objects.exists())
+
+    async def test_stream_sends_it_at_once(self):
+        response = await self.async_client.post(
+            reverse('moods:daily-reflection-stream'), PAYLOAD, content_type='application/json',
+            headers={'Authorization': f'Token {self.token.key}'}
+        )
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+        self.assertEqual(response.status_code, 200)
+        events = [block.split('\n') for block in body.strip().split('\n\n')]
+        self.assertEqual([event for event, _ in events], ['event: delta', 'event: done'])
+        self.assertEqual(json.loads(events[1][1].removeprefix('data: '))['entry'], 'Förskapad text')
+
+    def test_own_reflection_still_conflicts(self):
+        DailyReflection.objects.filter(pk=self.reflection.pk).update(pregenerated=False)
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.post(reverse('moods:daily-reflection-generate'), PAYLOAD, format='json')
+
+        self.assertEqual(response.status_code, 409)
@@ -0,0 +1,68 @@
+"""
+Tests for the quick-log mood endpoint.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from apps.moods.models import MoodEntry, DailyAggregate
+from apps.moods.views import MoodEntryQuickLogView
+
+User = get_user_model()
+
+
+class MoodEntryQuickLogTests(TestCase):
+    """Tests for POST /api/entries/quick/."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('moods:entry-quick-log')
+
+    def test_returns_id_and_timestamp(self):
+        """Test that only the id and timestamp are returned."""
+        response = self.client.post(self.url, {'mood_level': 7, 'note': 'Okej'}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(response.data), {'id', 'timestamp'})
+        entry = MoodEntry.objects.get(pk=response.data['id'])
+        self.assertEqual(entry.mood_level, 7)
+        self.assertEqual(entry.note, 'Okej')
+        self.assertEqual(entry.user, self.user)
+
+    def test_prefer_return_minimal(self):
+        """Test that Prefer: return=minimal yields an empty 204."""
+        response = self.client.post(
+            self.url, {'mood_level': 5}, format='json', HTTP_PREFER='return=minimal'
+        )
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(MoodEntry.objects.count(), 1)
+
+    def test_invalid_mood_level(self):
+        """Test that out-of-range mood levels are rejected."""
+        response = self.client.post(self.url, {'mood_level': 11}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(MoodEntry.objects.count(), 0)
+
+    def test_aggregate_updated_after_response(self):
+        """Test that the aggregate refresh waits until the response is closed."""
+        request = APIRequestFactory().post(self.url, {'mood_level': 6}, format='json')
+        force_authenticate(request, user=self.user)
+
+        response = MoodEntryQuickLogView.as_view()(request)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(DailyAggregate.objects.exists())
+
+        response.close()
+
+        aggregate = DailyAggregate.objects.get(user=self.user)
+        self.assertEqual(aggregate.entry_count, 1)
+        self.assertEqual(aggregate.min_mood, 6)
@@ -0,0 +1,133 @@
+"""
+Tests for the pluggable reflection backends.
+"""
+import asyncio
+import json
+import os
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.moods import reflection_backends, reflections, telemetry, upstream
+from apps.moods.models import DailyReflection
+from apps.moods.reflection_backends import AnthropicBackend, FakeBackend
+from apps.moods.tests.test_reflections import PAYLOAD
+
+User = get_user_model()
+
+FAKE = 'apps.moods.reflection_backends.FakeBackend'
+
+
+class FakeBackendTests(SimpleTestCase):
+    """Tests for FakeBackend on its own."""
+
+    def setUp(self):
+        self.params = reflections.message_params('Datum: 2025-03-04\n\nTon: warm')
+
+    def test_text_is_deterministic_per_message(self):
+        backend = FakeBackend()
+        text = backend.text(self.params)
+
+        self.assertEqual(FakeBackend().text(self.params), text)
+        self.assertTrue(text.startswith('2025-03-04 — '))
+        self.assertNotEqual(backend.text(reflections.message_params('Datum: 2025-03-05')), text)
+
+    def test_stream_chunks_add_up_to_generated_text(self):
+        backend = FakeBackend(chunks=5)
+
+        async def collect():
+            return [chunk async for chunk in backend.stream(self.params, telemetry.CallRecord())]
+
+        chunks = asyncio.run(collect())
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(''.join(chunks), backend.generate(self.params, telemetry.CallRecord()))
+
+    def test_failure_rate_is_reproducible_with_a_seed(self):
+        def outcomes():
+            backend = FakeBackend(failure_rate=0.5, seed=7)
+            results = []
+            for _ in range(20):
+                try:
+                    backend.generate(self.params, telemetry.CallRecord())
+                    results.append(True)
+                except upstream.UpstreamError:
+                    results.append(False)
+            return results
+
+        first = outcomes()
+        self.assertEqual(outcomes(), first)
+        self.assertIn(True, first)
+        self.assertIn(False, first)
+
+    def test_backend_follows_settings(self):
+        self.assertIsInstance(reflection_backends.get_backend(), AnthropicBackend)
+        with override_settings(REFLECTION_BACKEND=FAKE, REFLECTION_BACKEND_OPTIONS={'chunks': 3}):
+            backend = reflection_backends.get_backend()
+            self.assertIsInstance(backend, FakeBackend)
+            self.assertEqual(backend.chunks, 3)
+            self.assertIs(reflection_backends.get_backend(), backend)
+
+
+@override_settings(BACKGROUND_TASKS_INLINE=True, REFLECTION_BACKEND=FAKE)
+@mock.patch.dict(os.environ, {'ANTHROPIC_API_KEY': ''})
+class FakeBackendPipelineTests(TestCase):
+    """The whole generation pipeline offline, without an API key."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+        upstream.reset()
+
+    def _generate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('moods:daily-reflection-generate'), PAYLOAD, format='json')
+        if response.status_code == 202:
+            return response, self.client.get(response['Location']).data
+        return response, None
+
+    def test_queued_generation_stores_fake_text(self):
+        with mock.patch.object(FakeBackend, 'generate', autospec=True, side_effect=FakeBackend.generate) as call:
+            _, job = self._generate()
+
+        self.assertEqual(job['status'], 'done')
+        params, record = call.call_args.args[1:]
+        self.assertEqual(job['entry'], FakeBackend().text(params))
+        self.assertEqual(record.usage['output_tokens'], len(job['entry']) // 4)
+        self.assertEqual(DailyReflection.objects.get().entry, job['entry'])
+
+    @override_settings(REFLECTION_BACKEND_OPTIONS={'chunks': 4})
+    async def test_stream_relays_fake_chunks(self):
+        response = await self.async_client.post(
+            reverse('moods:daily-reflection-stream'), PAYLOAD, content_type='application/json',
+            headers={'Authorization': f'Token {self.token.key}'}
+        )
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        events = [block.split('\n') for block in body.strip().split('\n\n')]
+
+        deltas = [json.loads(data.removeprefix('data: '))['text'] for event, data in events[:-1]]
+        self.assertEqual(len(deltas), 4)
+        self.assertEqual(events[-1][0], 'event: done')
+        reflection = await DailyReflection.objects.aget()
+        self.assertEqual(reflection.entry, ''.join(deltas))
+
+    @override_settings(REFLECTION_BACKEND_OPTIONS={'failure_rate': 1}, REFLECTION_BREAKER_THRESHOLD=2)
+    def test_simulated_failures_open_the_circuit(self):
+        with self.assertLogs('apps.moods.reflections', 'ERROR'):
+            _, first = self._generate()
+            self._generate()
+        response, _ = self._generate()
+
+        self.assertEqual(first['error'], upstream.OVERLOADED)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
@@ -0,0 +1,442 @@
+"""
+Tests for queued daily reflection generation.
+"""
+import asyncio
+import io
+import json
+import os
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.moods import reflection_backends, reflections, upstream
+from apps.moods.models import MoodEntry, DailyLog, DailyReflection, ReflectionJob
+from apps.moods.tests.fake_anthropic import FakeAnthropicServer
+
+User = get_user_model()
+
+PAYLOAD = {
+    'date': '2025-03-04',
+    'tone': 'warm',
+    'mood': {'note': 'trött men okej'},
+    'basics': {'ate': True, 'outside': True},
+    'water': {'count': 5, 'total': 8},
+}
+
+
+def log_day(user):
+    """Stored data for 2025-03-04: two mood entries and a daily log."""
+    for hour, mood, note in ((8, 4, ''), (18, 7, 'promenad')):
+        MoodEntry.objects.create(
+            user=user, mood_level=mood, note=note,
+            timestamp=datetime(2025, 3, 4, hour, tzinfo=dt_timezone.utc)
+        )
+    DailyLog.objects.create(user=user, date=date(2025, 3, 4), anxiety=2, stress=3, sleep_hours=7.5)
+
+
+@override_settings(BACKGROUND_TASKS_INLINE=True)
+@mock.patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test-key'})
+class ReflectionJobTests(TestCase):
+    """Tests for POST /api/daily-reflections/generate/ and job polling."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('moods:daily-reflection-generate')
+        cache.clear()
+        upstream.reset()
+
+    def _generate(self, payload=PAYLOAD):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, payload, format='json')
+
+    def _poll(self, response):
+        return self.client.get(response['Location'])
+
+    def test_generate_returns_job_and_stores_reflection(self):
+        with mock.patch.object(reflections, 'generate', return_value='Tisdag 4 mars 2025') as generate:
+            response = self._generate()
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'queued')
+        prompt = generate.call_args.args[0]
+        self.assertIn('Ton: warm', prompt)
+        self.assertIn('Fri text om humör: trött men okej', prompt)
+
+        job = self._poll(response)
+        self.assertEqual(job.status_code, 200)
+        self.assertEqual(job.data['status'], 'done')
+        self.assertEqual(job.data['entry'], 'Tisdag 4 mars 2025')
+        reflection = DailyReflection.objects.get(user=self.user)
+        self.assertEqual(reflection.date, date(2025, 3, 4))
+
+    def test_snapshot_is_loaded_from_stored_data(self):
+        log_day(self.user)
+        # Stored data wins over what an older client still sends
+        payload = {**PAYLOAD, 'dailyLog': {'anxiety': 5}, 'mood': {'entryCount': 9}}
+
+        with mock.patch.object(reflections, 'generate', return_value='text') as generate:
+            self._generate(payload)
+
+        prompt = generate.call_args.args[0]
+        self.assertIn('Snitt/vald nivå: 5.5/10', prompt)
+        self.assertIn('Antal humörloggar: 2', prompt)
+        self.assertIn('Noteringar från humörloggar: promenad', prompt)
+        self.assertIn('- Ångest: 2/5', prompt)
+        self.assertIn('Sömn: 7.5 timmar', prompt)
+
+    def test_chosen_mood_score_overrides_average(self):
+        log_day(self.user)
+        payload = {**PAYLOAD, 'mood': {'score': 8, 'label': 'Bra'}}
+
+        with mock.patch.object(reflections, 'generate', return_value='text') as generate:
+            self._generate(payload)
+
+        self.assertIn('Snitt/vald nivå: 8.0/10 (Bra)', generate.call_args.args[0])
+
+    def test_snapshot_takes_three_queries(self):
+        log_day(self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            snapshot = reflections.load_snapshot(self.user, date(2025, 3, 4))
+
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(snapshot['mood'], {'average': 5.5, 'entry_count': 2, 'notes': ['promenad']})
+        self.assertEqual(snapshot['daily_log']['sleep_hours'], 7.5)
+
+    def test_snapshot_endpoint(self):
+        log_day(self.user)
+
+        response = self.client.get(reverse('moods:daily-reflection-snapshot'), {'date': '2025-03-04'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['mood']['entry_count'], 2)
+        self.assertEqual(response.data['daily_log']['anxiety'], 2)
+
+        empty = self.client.get(reverse('moods:daily-reflection-snapshot'), {'date': '2025-03-05'})
+        self.assertEqual(empty.data['mood'], {'average': None, 'entry_count': 0, 'notes': []})
+        self.assertIsNone(empty.data['daily_log'])
+
+    def test_date_defaults_to_local_today(self):
+        # 00:30 on 5 March in Stockholm, still 4 March in UTC
+        now = datetime(2025, 3, 4, 23, 30, tzinfo=dt_timezone.utc)
+        payload = {key: value for key, value in PAYLOAD.items() if key != 'date'}
+
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            snapshot = self.client.get(reverse('moods:daily-reflection-snapshot'))
+            with mock.patch.object(reflections, 'generate', return_value='text'):
+                response = self._generate(payload)
+
+        self.assertEqual(snapshot.data['date'], '2025-03-05')
+        self.assertEqual(ReflectionJob.objects.get(pk=response.data['id']).date, date(2025, 3, 5))
+
+    def test_snapshot_endpoint_rejects_invalid_dates(self):
+        for value in ('2026-02-30', 'igår'):
+            response = self.client.get(reverse('moods:daily-reflection-snapshot'), {'date': value})
+            self.assertEqual(response.status_code, 400, value)
+
+    def test_invalid_payload(self):
+        response = self._generate({**PAYLOAD, 'tone': 'poetic'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tone', response.data)
+
+    def test_job_is_not_started_before_commit(self):
+        with mock.patch.object(reflections, 'generate', return_value='text') as generate:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                response = self.client.post(self.url, PAYLOAD, format='json')
+            self.assertFalse(generate.called)
+            self.assertEqual(len(callbacks), 1)
+
+        job = ReflectionJob.objects.get(pk=response.data['id'])
+        self.assertEqual(job.status, ReflectionJob.Status.QUEUED)
+
+    def test_upstream_failure_marks_job_failed(self):
+        with mock.patch.object(reflections, 'generate', side_effect=RuntimeError('overloaded')):
+            with self.assertLogs('apps.moods.reflections', 'ERROR'):
+                response = self._generate()
+
+        job = self._poll(response)
+        self.assertEqual(job.data['status'], 'failed')
+        # Internal details stay in the log
+        self.assertEqual(job.data['error'], 'Kunde inte skapa texten.')
+        self.assertIsNone(job.data['entry'])
+        self.assertFalse(DailyReflection.objects.exists())
+
+    def test_existing_reflection_conflicts(self):
+        DailyReflection.objects.create(user=self.user, date=date(2025, 3, 4), entry='redan')
+
+        with mock.patch.object(reflections, 'generate') as generate:
+            response = self._generate()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(generate.called)
+        self.assertFalse(ReflectionJob.objects.exists())
+
+    def test_reflection_created_meanwhile_fails_job(self):
+        def generate(prompt):
+            DailyReflection.objects.create(user=self.user, date=date(2025, 3, 4), entry='annan flik')
+            return 'text'
+
+        with mock.patch.object(reflections, 'generate', side_effect=generate):
+            response = self._generate()
+
+        job = self._poll(response)
+        self.assertEqual(job.data['status'], 'failed')
+        self.assertEqual(job.data['error'], reflections.ALREADY_EXISTS)
+
+    def test_duplicate_requests_share_one_job(self):
+        with mock.patch.object(reflections, 'generate', return_value='text') as generate:
+            # Both requests arrive before the first job has run
+            with self.captureOnCommitCallbacks(execute=True):
+                first = self.client.post(self.url, PAYLOAD, format='json')
+                second = self.client.post(self.url, PAYLOAD, format='json')
+
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(second.status_code, 202)
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(ReflectionJob.objects.count(), 1)
+        self.assertEqual(self._poll(second).data['entry'], 'text')
+
+    def test_finished_job_does_not_block_new_one(self):
+        with mock.patch.object(reflections, 'generate', side_effect=RuntimeError('overloaded')):
+            with self.assertLogs('apps.moods.reflections', 'ERROR'):
+                failed = self._generate()
+        with mock.patch.object(reflections, 'generate', return_value='text'):
+            retried = self._generate()
+
+        self.assertNotEqual(failed.data['id'], retried.data['id'])
+        self.assertEqual(self._poll(retried).data['status'], 'done')
+
+    def test_stale_job_is_expired(self):
+        stale = ReflectionJob.objects.create(
+            user=self.user, date=date(2025, 3, 4), prompt='...', status=ReflectionJob.Status.RUNNING
+        )
+        ReflectionJob.objects.filter(pk=stale.pk).update(
+            created_at=timezone.now() - reflections.JOB_TIMEOUT - timedelta(seconds=1)
+        )
+
+        with mock.patch.object(reflections, 'generate', return_value='text'):
+            response = self._generate()
+
+        self.assertNotEqual(response.data['id'], stale.pk)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, ReflectionJob.Status.FAILED)
+        self.assertEqual(self._poll(response).data['status'], 'done')
+
+    def test_stale_jobs_are_recovered(self):
+        jobs = [
+            ReflectionJob.objects.create(user=self.user, date=date(2025, 3, day), prompt='...', status=status)
+            for day, status in ((3, ReflectionJob.Status.QUEUED), (4, ReflectionJob.Status.RUNNING))
+        ]
+        fresh = ReflectionJob.objects.create(user=self.user, date=date(2025, 3, 5), prompt='...')
+        ReflectionJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            created_at=timezone.now() - reflections.JOB_TIMEOUT - timedelta(seconds=1)
+        )
+
+        with mock.patch.object(reflections, 'generate', return_value='text'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(reflections.recover_stale_jobs(), (1, 1))
+
+        queued, running = ReflectionJob.objects.filter(pk__in=[job.pk for job in jobs]).order_by('date')
+        self.assertEqual(queued.status, ReflectionJob.Status.DONE)
+        self.assertEqual(running.status, ReflectionJob.Status.FAILED)
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, ReflectionJob.Status.QUEUED)
+
+    def test_job_runs_once(self):
+        with mock.patch.object(reflections, 'generate', return_value='text') as generate:
+            response = self._generate()
+            reflections.run_job(response.data['id'])
+
+        self.assertEqual(generate.call_count, 1)
+
+    def test_same_snapshot_is_generated_once(self):
+        with mock.patch.object(reflections, 'generate', return_value='text') as generate:
+            self._generate()
+            DailyReflection.objects.all().delete()
+            response = self._generate()
+
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(self._poll(response).data['entry'], 'text')
+
+        out = io.StringIO()
+        call_command('reflection_cache_stats', '--reset', stdout=out)
+        self.assertIn('hits=1 misses=1 hit rate=50.0%', out.getvalue())
+        self.assertEqual(reflections.cache_stats()['hits'], 0)
+
+    def test_response_cache_is_per_user_and_snapshot(self):
+        snapshot = reflections.load_snapshot(self.user, date(2025, 3, 4))
+        message = reflections.build_user_message(PAYLOAD, snapshot)
+        key = reflections.response_key(self.user.pk, message)
+
+        self.assertEqual(key, reflections.response_key(self.user.pk, f'  {message}\n\n'))
+        self.assertNotEqual(key, reflections.response_key(self.user.pk + 1, message))
+        other_tone = reflections.build_user_message({**PAYLOAD, 'tone': 'minimal'}, snapshot)
+        self.assertNotEqual(key, reflections.response_key(self.user.pk, other_tone))
+
+    def test_cannot_poll_other_users_job(self):
+        other = User.objects.create_user(email='other@example.com', password='testpass123')
+        job = ReflectionJob.objects.create(user=other, date=date(2025, 3, 4), prompt='...')
+
+        response = self.client.get(reverse('moods:reflection-job', args=[job.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_missing_api_key(self):
+        with mock.patch.dict(os.environ, {'ANTHROPIC_API_KEY': ''}):
+            response = self._generate()
+
+        self.assertEqual(response.status_code, 503)
+
+
+class DailyReflectionStreamTests(TestCase):
+    """Tests for POST /api/daily-reflections/generate/stream/ against a local fake API."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.url = reverse('moods:daily-reflection-stream')
+        cache.clear()
+        upstream.reset()
+        self.server = FakeAnthropicServer(chunks=5).start()
+        self.addCleanup(self.server.stop)
+        environ = mock.patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test-key'})
+        environ.start()
+        self.addCleanup(environ.stop)
+        base_url = override_settings(ANTHROPIC_BASE_URL=self.server.url)
+        base_url.enable()
+        self.addCleanup(base_url.disable)
+
+    async def _stream(self, payload=PAYLOAD, token=None):
+        response = await self.async_client.post(
+            self.url, payload, content_type='application/json',
+            headers={'Authorization': f'Token {token or self.token.key}'}
+        )
+        events = []
+        if response.status_code == 200:
+            body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+            for block in body.strip().split('\n\n'):
+                event, data = block.split('\n')
+                events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+        return response, events
+
+    async def test_relays_chunks_and_stores_reflection(self):
+        response, events = await self._stream()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        deltas = [data['text'] for event, data in events if event == 'delta']
+        self.assertEqual(deltas, self.server.split())
+        self.assertEqual(events[-1][0], 'done')
+        self.assertEqual(events[-1][1]['entry'], self.server.text)
+
+        reflection = await DailyReflection.objects.aget(user=self.user)
+        self.assertEqual(reflection.entry, self.server.text)
+        self.assertEqual(reflection.date, date(2025, 3, 4))
+        request = self.server.requests[0]
+        self.assertTrue(request['stream'])
+        developer, day = request['messages'][0]['content']
+        self.assertEqual(developer['cache_control'], {'type': 'ephemeral'})
+        self.assertIn('Ton: warm', day['text'])
+
+    async def test_same_snapshot_is_served_from_cache(self):
+        await self._stream()
+        await DailyReflection.objects.all().adelete()
+
+        _, events = await self._stream()
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(events, [
+            ('delta', {'text': self.server.text}),
+            ('done', {'id': events[-1][1]['id'], 'date': '2025-03-04', 'entry': self.server.text}),
+        ])
+        stats = await sync_to_async(reflections.cache_stats)()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 0.5))
+
+    async def test_concurrent_streams_make_one_upstream_call(self):
+        self.server.first_token_delay = 0.3
+
+        with mock.patch.object(reflections, 'FOLLOW_INTERVAL', 0.05):
+            (_, leader), (_, follower) = await asyncio.gather(self._stream(), self._stream())
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(leader[-1][0], 'done')
+        self.assertEqual(follower, [('delta', {'text': self.server.text}), leader[-1]])
+        self.assertEqual(await DailyReflection.objects.acount(), 1)
+
+    async def test_failed_stream_releases_the_day(self):
+        with override_settings(ANTHROPIC_BASE_URL='http://127.0.0.1:9', ANTHROPIC_MAX_RETRIES=0):
+            with self.assertLogs('apps.moods.reflections', 'ERROR'):
+                await self._stream()
+
+        _, events = await self._stream()
+
+        self.assertEqual(events[-1][0], 'done')
+        statuses = [job.status async for job in ReflectionJob.objects.order_by('pk')]
+        self.assertEqual(statuses, ['failed', 'done'])
+
+    async def test_existing_reflection_conflicts(self):
+        await DailyReflection.objects.acreate(user=self.user, date=date(2025, 3, 4), entry='redan')
+
+        response, _ = await self._stream()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.server.requests, [])
+
+    async def test_requires_token(self):
+        response, _ = await self._stream(token='invalid')
+
+        self.assertEqual(response.status_code, 401)
+
+    async def test_upstream_error_is_sent_as_event(self):
+        with override_settings(ANTHROPIC_BASE_URL='http://127.0.0.1:9', ANTHROPIC_MAX_RETRIES=0):
+            with self.assertLogs('apps.moods.reflections', 'ERROR'):
+                response, events = await self._stream()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(events[-1][0], 'error')
+        self.assertFalse(await DailyReflection.objects.aexists())
+
+
+@override_settings(ANTHROPIC_READ_TIMEOUT=7, ANTHROPIC_CONNECT_TIMEOUT=2, ANTHROPIC_MAX_RETRIES=1)
+@mock.patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test-key'})
+class AnthropicClientTests(TestCase):
+    """Tests for the pooled per-process Anthropic client."""
+
+    def test_client_is_reused_with_configured_options(self):
+        with FakeAnthropicServer() as server, override_settings(ANTHROPIC_BASE_URL=server.url):
+            client = reflection_backends.get_client()
+            self.assertIs(reflection_backends.get_client(), client)
+            self.assertEqual(str(client.base_url).rstrip('/'), server.url)
+            self.assertEqual(client.timeout.read, 7)
+            self.assertEqual(client.timeout.connect, 2)
+            self.assertEqual(client.max_retries, 1)
+
+            self.assertEqual(reflections.generate('idag'), server.text)
+            self.assertEqual(reflections.generate('igen'), server.text)
+            self.assertEqual(len(server.requests), 2)
+
+    def test_settings_change_replaces_client(self):
+        client = reflection_backends.get_client()
+        with override_settings(ANTHROPIC_MAX_RETRIES=0):
+            self.assertIsNot(reflection_backends.get_client(), client)
+            self.assertEqual(reflection_backends.get_client().max_retries, 0)
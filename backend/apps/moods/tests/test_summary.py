@@ -0,0 +1,202 @@
+"""
+Tests for the incrementally maintained user mood summary.
+"""
+import io
+import random
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.moods.models import MoodEntry, UserMoodSummary
+
+User = get_user_model()
+
+FIELDS = (
+    'total_entries', 'mood_sum', 'days_logged',
+    'first_date', 'last_date', 'streak_start', 'longest_streak', 'run_lengths',
+)
+
+
+class UserMoodSummaryTests(TestCase):
+    """Tests for UserMoodSummary maintenance and GET /api/summary/."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.start = date(2025, 3, 1)
+
+    def _log(self, day, mood=5):
+        moment = datetime.combine(self.start + timedelta(days=day), datetime.min.time())
+        return MoodEntry.objects.create(
+            user=self.user, mood_level=mood,
+            timestamp=moment.replace(hour=12, tzinfo=dt_timezone.utc)
+        )
+
+    def _summary(self):
+        return UserMoodSummary.objects.get(user=self.user)
+
+    def _assert_matches_rebuild(self):
+        summary = self._summary()
+        incremental = {field: getattr(summary, field) for field in FIELDS}
+        rebuilt = UserMoodSummary.rebuild(self.user)
+        self.assertEqual(incremental, {field: getattr(rebuilt, field) for field in FIELDS})
+
+    def test_totals_and_streaks(self):
+        """Test totals, average and streaks as days are appended."""
+        for day, mood in ((0, 4), (0, 6), (1, 8), (2, 5), (5, 7)):
+            self._log(day, mood)
+
+        summary = self._summary()
+        self.assertEqual(summary.total_entries, 5)
+        self.assertEqual(summary.average_mood, 6.0)
+        self.assertEqual(summary.days_logged, 4)
+        self.assertEqual(summary.first_date, self.start)
+        self.assertEqual(summary.last_date, self.start + timedelta(days=5))
+        self.assertEqual(summary.latest_streak, 1)
+        self.assertEqual(summary.longest_streak, 3)
+        self._assert_matches_rebuild()
+
+    def test_current_streak_needs_recent_day(self):
+        """Test that a streak only counts as current through yesterday."""
+        self._log(0)
+        self._log(1)
+        summary = self._summary()
+
+        self.assertEqual(summary.current_streak(today=self.start + timedelta(days=2)), 2)
+        self.assertEqual(summary.current_streak(today=self.start + timedelta(days=3)), 0)
+
+    def test_backdated_entry_joins_runs(self):
+        """Test that filling a gap merges the runs on both sides."""
+        for day in (0, 1, 3, 4, 5):
+            self._log(day)
+        self.assertEqual(self._summary().longest_streak, 3)
+
+        self._log(2)
+
+        summary = self._summary()
+        self.assertEqual(summary.longest_streak, 6)
+        self.assertEqual(summary.streak_start, self.start)
+        self._assert_matches_rebuild()
+
+    def test_deleting_a_day_splits_run(self):
+        """Test that removing a day inside the longest run shortens it."""
+        entries = [self._log(day) for day in range(6)]
+
+        entries[2].delete()
+
+        summary = self._summary()
+        self.assertEqual(summary.longest_streak, 3)
+        self.assertEqual(summary.streak_start, self.start + timedelta(days=3))
+        self.assertEqual(summary.total_entries, 5)
+        self._assert_matches_rebuild()
+
+    def test_random_changes_match_rebuild(self):
+        """Test a random mix of appends, backfills and deletions."""
+        rng = random.Random(36)
+        entries = []
+        for _ in range(60):
+            if entries and rng.random() < 0.35:
+                entries.pop(rng.randrange(len(entries))).delete()
+            else:
+                entries.append(self._log(rng.randrange(30), rng.randint(1, 10)))
+            self._assert_matches_rebuild()
+
+    def test_splitting_longest_run_does_not_rescan(self):
+        """Test that deleting inside the longest run only reads around the day."""
+        entries = [self._log(day) for day in range(5)]
+        for day in range(10, 14):
+            self._log(day)
+
+        with CaptureQueriesContext(connection) as split:
+            entries[2].delete()
+
+        self.assertEqual(self._summary().longest_streak, 4)
+        reads = [
+            query['sql'] for query in split.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "moods_dailyaggregate"' in query['sql']
+        ]
+        self.assertTrue(reads)
+        for sql in reads:
+            # Every read is bounded by date
+            self.assertIn('"moods_dailyaggregate"."date" ', sql.split(' WHERE ')[1].split(' ORDER BY ')[0])
+        self._assert_matches_rebuild()
+
+    def test_summary_without_run_lengths_is_rebuilt_once(self):
+        """Test that a row from before run bookkeeping is completed on its next change."""
+        for day in range(3):
+            self._log(day)
+        UserMoodSummary.objects.filter(user=self.user).update(run_lengths=None)
+
+        self._log(5)
+
+        self.assertEqual(self._summary().run_lengths, {'3': 1, '1': 1})
+        self._assert_matches_rebuild()
+
+    def test_appending_is_constant_work(self):
+        """Test that a next-day entry does not scan the history."""
+        for day in range(10):
+            self._log(day)
+        with CaptureQueriesContext(connection) as short_history:
+            self._log(10)
+        for day in range(11, 40):
+            self._log(day)
+        with self.assertNumQueries(len(short_history.captured_queries)):
+            self._log(40)
+
+    def test_endpoint_builds_missing_summary(self):
+        """Test that the endpoint serves and lazily builds the summary."""
+        self._log(0, 3)
+        self._log(1, 9)
+        UserMoodSummary.objects.all().delete()
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get(reverse('moods:summary'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_entries'], 2)
+        self.assertEqual(response.data['average_mood'], 6.0)
+        self.assertEqual(response.data['longest_streak'], 2)
+        self.assertEqual(response.data['first_date'], self.start.isoformat())
+
+    def test_missing_summary_is_built_on_first_change(self):
+        """Test that a user without a summary row gets full totals, not just the new day."""
+        for day in range(5):
+            self._log(day)
+        UserMoodSummary.objects.all().delete()
+
+        self._log(5)
+
+        summary = self._summary()
+        self.assertEqual((summary.total_entries, summary.days_logged, summary.longest_streak), (6, 6, 6))
+        self._assert_matches_rebuild()
+
+    def test_deleting_with_missing_summary(self):
+        """Test that removing an old entry works before the summary row exists."""
+        entries = [self._log(day) for day in range(3)]
+        UserMoodSummary.objects.all().delete()
+
+        entries[1].delete()
+
+        summary = self._summary()
+        self.assertEqual((summary.total_entries, summary.days_logged, summary.longest_streak), (2, 2, 1))
+        self._assert_matches_rebuild()
+
+    def test_rebuild_command(self):
+        """Test the backfill command."""
+        self._log(0)
+        UserMoodSummary.objects.all().delete()
+        out = io.StringIO()
+
+        call_command('rebuild_mood_summaries', stdout=out)
+
+        self.assertEqual(self._summary().total_entries, 1)
+        self.assertIn('Rebuilt 1 summaries', out.getvalue())
@@ -0,0 +1,124 @@
+"""
+Tests for reflection call telemetry and its report.
+"""
+import io
+import os
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.moods import reflections, telemetry, upstream
+from apps.moods.models import ReflectionCallLog
+from apps.moods.tests.fake_anthropic import FakeAnthropicServer
+
+
+@override_settings(ANTHROPIC_MAX_RETRIES=0)
+@mock.patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test-key'})
+class CallRecordTests(TestCase):
+    """Each upstream call leaves one ReflectionCallLog row."""
+
+    def setUp(self):
+        cache.clear()
+        upstream.reset()
+        self.server = FakeAnthropicServer(chunks=4).start()
+        self.addCleanup(self.server.stop)
+        base_url = override_settings(ANTHROPIC_BASE_URL=self.server.url)
+        base_url.enable()
+        self.addCleanup(base_url.disable)
+
+    def test_generate_logs_usage(self):
+        reflections.generate('Datum: 2025-03-04')
+
+        log = ReflectionCallLog.objects.get()
+        usage = self.server.message(self.server.requests[0])['usage']
+        self.assertEqual(log.outcome, ReflectionCallLog.Outcome.OK)
+        self.assertEqual(log.model, reflections.MODEL)
+        self.assertEqual(log.prompt_version, reflections.PROMPT_VERSION)
+        self.assertFalse(log.streamed)
+        self.assertIsNone(log.first_token_ms)
+        self.assertEqual((log.input_tokens, log.output_tokens), (usage['input_tokens'], usage['output_tokens']))
+
+    async def test_stream_logs_time_to_first_token(self):
+        self.server.first_token_delay = 0.1
+        self.server.chunk_delay = 0.05
+
+        chunks = [text async for text in reflections.stream('Datum: 2025-03-04')]
+
+        self.assertEqual(''.join(chunks), self.server.text)
+        log = await ReflectionCallLog.objects.aget()
+        self.assertTrue(log.streamed)
+        self.assertGreaterEqual(log.first_token_ms, 100)
+        self.assertGreaterEqual(log.wall_ms, log.first_token_ms + 150)
+        self.assertEqual(log.output_tokens, self.server.message({})['usage']['output_tokens'])
+
+    def test_failed_call_is_logged(self):
+        self.server.fail(500)
+
+        with self.assertRaises(Exception):
+            reflections.generate('Datum: 2025-03-04')
+
+        log = ReflectionCallLog.objects.get()
+        self.assertEqual(log.outcome, ReflectionCallLog.Outcome.ERROR)
+        self.assertEqual(log.error, 'InternalServerError')
+        self.assertIsNone(log.input_tokens)
+
+    @override_settings(REFLECTION_BREAKER_THRESHOLD=1)
+    def test_rejected_call_is_logged(self):
+        upstream.get_breaker().record_failure()
+
+        with self.assertRaises(upstream.Unavailable):
+            reflections.generate('Datum: 2025-03-04')
+
+        self.assertEqual(ReflectionCallLog.objects.get().outcome, ReflectionCallLog.Outcome.REJECTED)
+        self.assertEqual(self.server.requests, [])
+
+
+class CallReportTests(TestCase):
+    """Tests for telemetry.report and the reflection_call_report command."""
+
+    def setUp(self):
+        self.now = timezone.now()
+        for wall_ms in range(100, 1100, 10):
+            self._log(wall_ms=wall_ms, input_tokens=1000, output_tokens=300)
+        self._log(outcome=ReflectionCallLog.Outcome.ERROR, wall_ms=60000)
+        self._log(outcome=ReflectionCallLog.Outcome.REJECTED, wall_ms=5, prompt_version='new')
+        self._log(wall_ms=50, days_ago=30)
+
+    def _log(self, outcome=ReflectionCallLog.Outcome.OK, days_ago=0, prompt_version='old', **fields):
+        log = ReflectionCallLog.objects.create(
+            model='claude-test', prompt_version=prompt_version, outcome=outcome, **fields
+        )
+        ReflectionCallLog.objects.filter(pk=log.pk).update(created_at=self.now - timedelta(days=days_ago))
+
+    def test_daily_percentiles_and_tokens(self):
+        (row,) = telemetry.report(self.now - timedelta(days=7))
+
+        self.assertEqual(row['day'], timezone.localdate(self.now))
+        self.assertEqual((row['calls'], row['errors'], row['rejected']), (102, 1, 1))
+        # Successful calls only: 100, 110, ..., 1090 ms
+        self.assertEqual((row['p50_ms'], row['p95_ms'], row['p99_ms']), (590, 1040, 1080))
+        self.assertEqual((row['input_tokens'], row['output_tokens']), (100000, 30000))
+        self.assertIsNone(row['first_token_p50_ms'])
+
+    def test_group_by_prompt_version(self):
+        rows = {row['prompt_version']: row for row in telemetry.report(self.now - timedelta(days=7), 'prompt_version')}
+
+        self.assertEqual(rows['old']['calls'], 101)
+        self.assertEqual(rows['new']['rejected'], 1)
+        self.assertIsNone(rows['new']['p50_ms'])
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('reflection_call_report', '--days', '7', stdout=out)
+
+        header, line = out.getvalue().splitlines()
+        self.assertIn('p95 ms', header)
+        self.assertEqual(line.split()[:7], [str(timezone.localdate(self.now)), '102', '1', '1', '590', '1040', '1080'])
+
+    def test_percentile(self):
+        self.assertIsNone(telemetry.percentile([], 50))
+        self.assertEqual(telemetry.percentile([3, 1, 2], 50), 2)
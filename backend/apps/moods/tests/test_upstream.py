@@ -0,0 +1,287 @@
+"""
+Tests for the limits around upstream LLM calls: concurrency limiter,
+circuit breaker and per-user throttling, against a fault-injecting fake
+API.
+"""
+import asyncio
+import json
+import os
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.moods import upstream
+from apps.moods.models import DailyReflection
+from apps.moods.tests.fake_anthropic import FakeAnthropicServer
+from apps.moods.tests.test_reflections import PAYLOAD
+from apps.moods.throttles import ReflectionRateThrottle
+
+User = get_user_model()
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """Tests for CircuitBreaker on its own."""
+
+    def setUp(self):
+        self.now = 1000.0
+        clock = mock.patch('apps.moods.upstream.time.monotonic', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.breaker = upstream.CircuitBreaker(threshold=3, cooldown=30)
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.before_call()
+
+        self.breaker.record_failure()
+
+        with self.assertRaises(upstream.Unavailable) as raised:
+            self.breaker.before_call()
+        self.assertEqual(raised.exception.retry_after, 30)
+
+    def test_success_resets_the_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.retry_after(), 0)
+
+    def test_lets_calls_through_after_cooldown(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.now += 20
+        self.assertEqual(self.breaker.retry_after(), 10)
+
+        self.now += 10
+        self.breaker.before_call()
+
+        # One more failure reopens it right away
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.retry_after(), 30)
+
+
+class ConcurrencyLimiterTests(SimpleTestCase):
+    """Tests for ConcurrencyLimiter on its own."""
+
+    def test_gives_up_after_queue_timeout(self):
+        limiter = upstream.ConcurrencyLimiter(1)
+        limiter.acquire(timeout=0)
+
+        with self.assertRaises(upstream.Unavailable):
+            limiter.acquire(timeout=0.01)
+        with self.assertRaises(upstream.Unavailable):
+            asyncio.run(limiter.aacquire(timeout=0.01))
+
+        limiter.release()
+        limiter.acquire(timeout=0)
+
+
+@override_settings(
+    BACKGROUND_TASKS_INLINE=True,
+    ANTHROPIC_MAX_RETRIES=0,
+    REFLECTION_BREAKER_THRESHOLD=2,
+    REFLECTION_BREAKER_COOLDOWN=30,
+)
+@mock.patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test-key'})
+class UpstreamFailureTests(TestCase):
+    """Queued generation against a fake API that fails on demand."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('moods:daily-reflection-generate')
+        cache.clear()
+        upstream.reset()
+        self.server = FakeAnthropicServer().start()
+        self.addCleanup(self.server.stop)
+        base_url = override_settings(ANTHROPIC_BASE_URL=self.server.url)
+        base_url.enable()
+        self.addCleanup(base_url.disable)
+
+    def _generate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, PAYLOAD, format='json')
+        if response.status_code == 202:
+            return response, self.client.get(response['Location']).data
+        return response, None
+
+    def test_upstream_errors_get_a_readable_message(self):
+        self.server.fail(529)
+
+        with self.assertLogs('apps.moods.reflections', 'ERROR'):
+            _, job = self._generate()
+
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], 'Tjänsten är överbelastad just nu. Försök igen om en stund.')
+
+    def test_repeated_failures_open_the_circuit(self):
+        self.server.fail(500, 500)
+        with self.assertLogs('apps.moods.reflections', 'ERROR'):
+            self._generate()
+            self._generate()
+
+        response, _ = self._generate()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_bad_requests_do_not_open_the_circuit(self):
+        self.server.fail(400, 400)
+        with self.assertLogs('apps.moods.reflections', 'ERROR'):
+            self._generate()
+            self._generate()
+
+        response, job = self._generate()
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(job['status'], 'done')
+
+    def test_circuit_closes_after_a_successful_call(self):
+        self.server.fail(500, 500)
+        with self.assertLogs('apps.moods.reflections', 'ERROR'):
+            self._generate()
+            self._generate()
+
+        # Let the cooldown pass
+        upstream.get_breaker()._opened_at -= 30
+        _, job = self._generate()
+
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(upstream.get_breaker().retry_after(), 0)
+        self.assertTrue(DailyReflection.objects.exists())
+
+
+class UpstreamStreamTests(TestCase):
+    """The streaming endpoint under the same limits."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.url = reverse('moods:daily-reflection-stream')
+        cache.clear()
+        upstream.reset()
+        self.server = FakeAnthropicServer().start()
+        self.addCleanup(self.server.stop)
+        environ = mock.patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test-key'})
+        environ.start()
+        self.addCleanup(environ.stop)
+        base_url = override_settings(ANTHROPIC_BASE_URL=self.server.url, ANTHROPIC_MAX_RETRIES=0)
+        base_url.enable()
+        self.addCleanup(base_url.disable)
+
+    async def _stream(self, date='2025-03-04'):
+        response = await self.async_client.post(
+            self.url, {**PAYLOAD, 'date': date}, content_type='application/json',
+            headers={'Authorization': f'Token {self.token.key}'}
+        )
+        events = []
+        if response.status_code == 200:
+            body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+            for block in body.strip().split('\n\n'):
+                event, data = block.split('\n')
+                events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+        return response, events
+
+    @override_settings(REFLECTION_MAX_CONCURRENT=1, REFLECTION_QUEUE_TIMEOUT=0.1)
+    async def test_waits_at_most_the_queue_timeout_for_a_slot(self):
+        self.server.first_token_delay = 0.5
+
+        with self.assertLogs('apps.moods.reflections', 'ERROR'):
+            (_, first), (_, second) = await asyncio.gather(
+                self._stream('2025-03-04'), self._stream('2025-03-05')
+            )
+
+        outcomes = sorted([first[-1][0], second[-1][0]])
+        self.assertEqual(outcomes, ['done', 'error'])
+        error = (first if first[-1][0] == 'error' else second)[-1][1]
+        self.assertEqual(error['detail'], upstream.BUSY)
+        self.assertEqual(error['retry_after'], 1)
+        self.assertEqual(len(self.server.requests), 1)
+
+    @override_settings(REFLECTION_BREAKER_THRESHOLD=1)
+    async def test_open_circuit_fails_fast(self):
+        self.server.fail(529)
+        with self.assertLogs('apps.moods.reflections', 'ERROR'):
+            _, events = await self._stream()
+        self.assertEqual(events[-1][0], 'error')
+
+        response, _ = await self._stream()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(len(self.server.requests), 1)
+
+
+@mock.patch.object(ReflectionRateThrottle, 'rate', '2/hour', create=True)
+@override_settings(REFLECTION_BACKEND='apps.moods.reflection_backends.FakeBackend')
+class ReflectionThrottleTests(TestCase):
+    """Per-user rate limit on new generations, shared by both generate endpoints."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.user)
+        self.generate = reverse('moods:daily-reflection-generate')
+        self.stream = reverse('moods:daily-reflection-stream')
+        self.headers = {'Authorization': f'Token {self.token.key}'}
+        cache.clear()
+        upstream.reset()
+
+    def _day(self, day):
+        return {**PAYLOAD, 'date': f'2025-03-{day:02}'}
+
+    def test_limit_applies_across_endpoints_and_per_user(self):
+        self.assertEqual(self.api.post(self.generate, self._day(1), format='json').status_code, 202)
+        response = self.client.post(self.stream, self._day(2), content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+        throttled = self.api.post(self.generate, self._day(3), format='json')
+        self.assertEqual(throttled.status_code, 429)
+        self.assertIn('Retry-After', throttled)
+        throttled = self.client.post(
+            self.stream, self._day(3), content_type='application/json', headers=self.headers
+        )
+        self.assertEqual(throttled.status_code, 429)
+        self.assertIn('Retry-After', throttled)
+
+        other = User.objects.create_user(email='other@example.com', password='testpass123')
+        self.api.force_authenticate(user=other)
+        self.assertEqual(self.api.post(self.generate, self._day(3), format='json').status_code, 202)
+
+    def test_only_new_generations_count(self):
+        DailyReflection.objects.create(user=self.user, date='2025-03-01', entry='Egen')
+        DailyReflection.objects.create(user=self.user, date='2025-03-02', entry='Förskapad', pregenerated=True)
+        for _ in range(3):
+            self.assertEqual(self.api.post(self.generate, self._day(1), format='json').status_code, 409)
+            self.assertEqual(self.api.post(self.generate, self._day(2), format='json').status_code, 200)
+        # Joining the job already in flight for the day is free too
+        for _ in range(3):
+            self.assertEqual(self.api.post(self.generate, self._day(3), format='json').status_code, 202)
+
+        self.assertEqual(self.api.post(self.generate, self._day(4), format='json').status_code, 202)
+        self.assertEqual(self.api.post(self.generate, self._day(5), format='json').status_code, 429)
+
+    @mock.patch.dict(os.environ, {'ANTHROPIC_API_KEY': ''})
+    @override_settings(REFLECTION_BACKEND='apps.moods.reflection_backends.AnthropicBackend')
+    def test_unavailable_generation_is_not_counted(self):
+        for _ in range(3):
+            self.assertEqual(self.api.post(self.generate, self._day(1), format='json').status_code, 503)
@@ -0,0 +1,13 @@
+"""
+Request throttles.
+
+Counts are kept in the default cache, so with Redis configured the
+limits hold across all workers.
+"""
+from rest_framework.throttling import UserRateThrottle
+
+
+class ReflectionRateThrottle(UserRateThrottle):
+    """Per-user limit on reflection generations (``reflections`` rate)."""
+
+    scope = 'reflections'
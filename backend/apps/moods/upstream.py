@@ -0,0 +1,209 @@
+"""
+Protection around calls to the LLM provider.
+
+- A per-process limiter caps concurrent upstream calls at
+  ``REFLECTION_MAX_CONCURRENT``. A call waits at most
+  ``REFLECTION_QUEUE_TIMEOUT`` seconds for a slot, then gives up.
+- A circuit breaker opens after ``REFLECTION_BREAKER_THRESHOLD``
+  consecutive upstream failures (timeouts, connection errors, 429, 5xx
+  and ``UpstreamError``). While open, calls fail fast for ``REFLECTION_BREAKER_COOLDOWN``
+  seconds. After that, calls are let through again; one more failure
+  reopens it and a success closes it.
+
+So a slow or failing provider costs each worker a bounded wait instead
+of piling up requests until the whole API stalls.
+"""
+import asyncio
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+try:
+    import anthropic
+except ImportError:  # pragma: no cover - handled at runtime
+    anthropic = None
+
+ACQUIRE_POLL_INTERVAL = 0.05
+
+BUSY = 'Många skriver just nu. Försök igen om en stund.'
+OVERLOADED = 'Tjänsten är överbelastad just nu. Försök igen om en stund.'
+OPEN = 'Tjänsten för att skapa texter är inte tillgänglig just nu. Försök igen om en stund.'
+
+
+class Unavailable(Exception):
+    """The call was not made; ``retry_after`` is a suggested wait in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class UpstreamError(Exception):
+    """The provider failed in a way that counts toward opening the circuit."""
+
+
+class ConcurrencyLimiter:
+    """Counting semaphore shared by worker threads and event loops."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._semaphore = threading.BoundedSemaphore(limit)
+
+    def acquire(self, timeout):
+        if not self._semaphore.acquire(timeout=timeout):
+            raise Unavailable(BUSY, retry_after=max(1, math.ceil(timeout)))
+
+    async def aacquire(self, timeout):
+        # Poll rather than block, so waiting never ties up a thread
+        deadline = time.monotonic() + timeout
+        while not self._semaphore.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                raise Unavailable(BUSY, retry_after=max(1, math.ceil(timeout)))
+            await asyncio.sleep(ACQUIRE_POLL_INTERVAL)
+
+    def release(self):
+        self._semaphore.release()
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a fixed cooldown."""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+
+    def retry_after(self):
+        """Seconds until calls are let through again; 0 when they are."""
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            remaining = self._opened_at + self.cooldown - time.monotonic()
+            return math.ceil(remaining) if remaining > 0 else 0
+
+    def before_call(self):
+        wait = self.retry_after()
+        if wait:
+            raise Unavailable(OPEN, retry_after=wait)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+
+_limiter = None
+_breaker = None
+_lock = threading.Lock()
+
+
+def get_limiter():
+    global _limiter
+    with _lock:
+        if _limiter is None:
+            _limiter = ConcurrencyLimiter(settings.REFLECTION_MAX_CONCURRENT)
+        return _limiter
+
+
+def get_breaker():
+    global _breaker
+    with _lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker(
+                settings.REFLECTION_BREAKER_THRESHOLD, settings.REFLECTION_BREAKER_COOLDOWN
+            )
+        return _breaker
+
+
+@contextmanager
+def guard():
+    """Wrap one synchronous upstream call; raises ``Unavailable`` instead of calling."""
+    breaker = get_breaker()
+    breaker.before_call()
+    limiter = get_limiter()
+    limiter.acquire(settings.REFLECTION_QUEUE_TIMEOUT)
+    try:
+        yield
+    except Exception as exc:
+        if is_failure(exc):
+            breaker.record_failure()
+        raise
+    else:
+        breaker.record_success()
+    finally:
+        limiter.release()
+
+
+@asynccontextmanager
+async def aguard():
+    """``guard`` for async calls; waiting for a slot doesn't block the loop."""
+    breaker = get_breaker()
+    breaker.before_call()
+    limiter = get_limiter()
+    await limiter.aacquire(settings.REFLECTION_QUEUE_TIMEOUT)
+    try:
+        yield
+    except Exception as exc:
+        if is_failure(exc):
+            breaker.record_failure()
+        raise
+    else:
+        breaker.record_success()
+    finally:
+        limiter.release()
+
+
+def is_failure(exc):
+    """Whether ``exc`` means the provider is struggling, not that our request was bad."""
+    if isinstance(exc, UpstreamError):
+        return True
+    if anthropic is None:
+        return False
+    if isinstance(exc, anthropic.APIConnectionError):
+        return True
+    if isinstance(exc, anthropic.APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+def describe(exc):
+    """User-facing message for a failed generation."""
+    if isinstance(exc, Unavailable):
+        return str(exc)
+    if isinstance(exc, UpstreamError):
+        return OVERLOADED
+    if anthropic is not None:
+        if isinstance(exc, anthropic.APITimeoutError):
+            return 'Tjänsten svarade inte i tid. Försök igen om en stund.'
+        if isinstance(exc, anthropic.APIConnectionError):
+            return 'Kunde inte nå tjänsten för att skapa texter.'
+        if is_failure(exc):
+            return OVERLOADED
+    return 'Kunde inte skapa texten.'
+
+
+def reset():
+    """Drop the limiter and breaker; the next call starts from the settings."""
+    global _limiter, _breaker
+    with _lock:
+        _limiter = None
+        _breaker = None
+
+
+@receiver(setting_changed)
+def _reset(setting, **kwargs):
+    if setting.startswith('REFLECTION_'):
+        reset()
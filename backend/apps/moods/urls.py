@@ -13,15 +13,37 @@ urlpatterns = [
     
     # Mood entries
     path('entries/', views.MoodEntryListCreateView.as_view(), name='entry-list'),
+    path('entries/quick/', views.MoodEntryQuickLogView.as_view(), name='entry-quick-log'),
     path('entries/<int:pk>/', views.MoodEntryDetailView.as_view(), name='entry-detail'),
     
     # Graph data
     path('graph/', views.GraphDataView.as_view(), name='graph-data'),
     
+    # Summary
+    path('summary/', views.UserMoodSummaryView.as_view(), name='summary'),
+    path('digests/', views.WeeklyDigestListView.as_view(), name='digest-list'),
+    
     # Daily logs
     path('daily-logs/', views.DailyLogListCreateView.as_view(), name='daily-log-list'),
+    path('daily-logs/bulk/', views.DailyLogBulkUpsertView.as_view(), name='daily-log-bulk'),
     path('daily-logs/today/', views.DailyLogTodayView.as_view(), name='daily-log-today'),
     path('daily-logs/<int:pk>/', views.DailyLogDetailView.as_view(), name='daily-log-detail'),
     path('daily-reflections/', views.DailyReflectionListView.as_view(), name='daily-reflection-list'),
     path('daily-reflections/generate/', views.DailyReflectionGenerateView.as_view(), name='daily-reflection-generate'),
+    path('daily-reflections/generate/stream/', views.DailyReflectionStreamView.as_view(), name='daily-reflection-stream'),
+    path('daily-reflections/snapshot/', views.DailyReflectionSnapshotView.as_view(), name='daily-reflection-snapshot'),
+    path('daily-reflections/jobs/<int:pk>/', views.ReflectionJobView.as_view(), name='reflection-job'),
+    
+    # Insights
+    path('insights/features/', views.FeatureMatrixView.as_view(), name='feature-matrix'),
+    path('insights/correlations/', views.CorrelationsView.as_view(), name='correlations'),
+    path('insights/tags/', views.TagImpactView.as_view(), name='tag-impact'),
+    path('insights/heatmap/', views.MoodHeatmapView.as_view(), name='heatmap'),
+    path('insights/change-points/', views.MoodChangePointsView.as_view(), name='change-points'),
+    
+    # Export
+    path('export/', views.ExportView.as_view(), name='export'),
+    
+    # Batch
+    path('batch/', views.BatchView.as_view(), name='batch'),
 ]
@@ -2,29 +2,48 @@
 Views for mood tracking API.
 """
 from datetime import timedelta
-import os
-from django.db import models
-from django.db.utils import IntegrityError
+import io
+import json
+import math
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import models, transaction
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.utils.dateparse import parse_date, parse_datetime
+from django.urls import Resolver404, resolve, reverse
+from django.utils.dateparse import parse_date
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import generics, status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, Throttled, ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-try:
-    import anthropic
-except ImportError:  # pragma: no cover - handled at runtime
-    anthropic = None
-
-from .models import Tag, MoodEntry, DailyAggregate, DailyLog, DailyReflection
+from . import analytics, changepoints, export, parquet, reflections, upstream
+from .background import discard_after_response, run_after_response, transfer_after_response
+from .models import (
+    Tag, MoodEntry, DailyAggregate, UserMoodSummary, MoodHeatmap,
+    MoodChangePoint, WeeklyDigest, DailyLog, DailyReflection, ReflectionJob
+)
+from .renderers import CSVRenderer, NDJSONRenderer, ParquetRenderer
+from .throttles import ReflectionRateThrottle
 from .serializers import (
     TagSerializer,
     MoodEntrySerializer,
     MoodEntryCreateSerializer,
+    MoodEntryQuickLogSerializer,
     DailyAggregateSerializer,
+    UserMoodSummarySerializer,
+    MoodChangePointSerializer,
+    WeeklyDigestSerializer,
     DailyLogSerializer,
     DailyReflectionSerializer,
+    ReflectionJobSerializer,
+    ReflectionRequestSerializer,
 )
 
 
@@ -73,7 +92,17 @@ class MoodEntryListCreateView(generics.ListCreateAPIView):
         if end_date:
             queryset = queryset.filter(timestamp__date__lte=end_date)
         
-        return queryset.select_related('user').prefetch_related('tags')
+        # Optional tag filtering: ?tags=1,2 matches entries with all of them
+        tags = self.request.query_params.get('tags')
+        if tags:
+            try:
+                tag_ids = [int(tag_id) for tag_id in tags.split(',') if tag_id.strip()]
+            except ValueError:
+                raise ValidationError({'tags': 'Ange tagg-id:n separerade med kommatecken.'})
+            queryset = queryset.filter(tag_ids__contains=tag_ids)
+        
+        # Tags are rendered from tag_ids, so no prefetch is needed
+        return queryset
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -90,6 +119,42 @@ class MoodEntryListCreateView(generics.ListCreateAPIView):
         return Response(output_serializer.data, status=status.HTTP_201_CREATED)
 
 
+class MoodEntryQuickLogView(APIView):
+    """
+    Log a mood with as little work as possible before responding.
+    
+    Accepts ``mood_level`` and an optional ``note`` and returns only the
+    new entry's id and timestamp, or 204 when the client sends
+    ``Prefer: return=minimal``. The daily aggregate and heatmap are
+    refreshed after the response has been sent.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = MoodEntryQuickLogSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        entry = MoodEntry(user=request.user, **serializer.validated_data)
+        entry.save(update_aggregate=False)
+        
+        if 'return=minimal' in request.headers.get('Prefer', ''):
+            response = Response(status=status.HTTP_204_NO_CONTENT)
+        else:
+            response = Response(
+                {'id': entry.pk, 'timestamp': entry.timestamp},
+                status=status.HTTP_201_CREATED
+            )
+        
+        run_after_response(
+            response, DailyAggregate.update_for_date, request.user, entry.timestamp.date()
+        )
+        run_after_response(
+            response, MoodHeatmap.record, request.user, None, (entry.timestamp, entry.mood_level)
+        )
+        return response
+
+
 class MoodEntryDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, or delete a mood entry."""
     
@@ -111,6 +176,8 @@ class GraphDataView(APIView):
     Query params:
     - view: 'day' | 'week' | 'month' | 'year'
     - date: Reference date (defaults to today)
+    - rolling: Window in days (e.g. 7 or 30); week and month views then
+      include moving average, rolling standard deviation and trend series
     """
     
     permission_classes = [IsAuthenticated]
@@ -118,6 +185,22 @@ class GraphDataView(APIView):
     def get(self, request):
         view_type = request.query_params.get('view', 'week')
         date_str = request.query_params.get('date')
+        rolling_str = request.query_params.get('rolling')
+        
+        window = None
+        if rolling_str:
+            try:
+                window = int(rolling_str)
+            except ValueError:
+                window = 0
+            if not analytics.MIN_ROLLING_WINDOW <= window <= analytics.MAX_ROLLING_WINDOW:
+                return Response(
+                    {'error': (
+                        f'Ogiltigt fönster. Välj {analytics.MIN_ROLLING_WINDOW}'
+                        f'–{analytics.MAX_ROLLING_WINDOW} dagar.'
+                    )},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
         
         if date_str:
             try:
@@ -145,6 +228,17 @@ class GraphDataView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        if window and view_type in ('week', 'month'):
+            data['rolling'] = {
+                'window': window,
+                'data': analytics.rolling_statistics(
+                    request.user,
+                    parse_date(data['start_date']),
+                    parse_date(data['end_date']),
+                    window
+                ),
+            }
+        
         return Response(data)
     
     def _get_day_data(self, user, date):
@@ -248,6 +342,37 @@ class GraphDataView(APIView):
         }
 
 
+# =============================================================================
+# Summary Views
+# =============================================================================
+
+class UserMoodSummaryView(APIView):
+    """
+    Lifetime totals and streaks for the current user.
+    
+    Served from the incrementally maintained UserMoodSummary row; users
+    without one yet get it built on first request.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        summary = UserMoodSummary.objects.filter(user=request.user).first()
+        if summary is None:
+            summary = UserMoodSummary.rebuild(request.user)
+        return Response(UserMoodSummarySerializer(summary).data)
+
+
+class WeeklyDigestListView(generics.ListAPIView):
+    """List the user's precomputed weekly digests, newest first."""
+    
+    serializer_class = WeeklyDigestSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return WeeklyDigest.objects.filter(user=self.request.user)
+
+
 # =============================================================================
 # Daily Log Views
 # =============================================================================
@@ -276,30 +401,79 @@ class DailyLogListCreateView(generics.ListCreateAPIView):
         return queryset
 
     def create(self, request, *args, **kwargs):
-        data = request.data.copy()
-        date_value = None
-
-        if data.get('date'):
-            date_value = parse_date(data.get('date'))
-        elif data.get('logged_at'):
-            logged_at = parse_datetime(data.get('logged_at'))
-            if logged_at:
-                date_value = logged_at.date()
+        serializer = self.get_serializer(
+            data=request.data, context={'request': request, 'upsert': True}
+        )
+        serializer.is_valid(raise_exception=True)
+        
+        [(log, created)] = DailyLog.objects.upsert(
+            request.user, [_daily_log_row(serializer.validated_data)]
+        )
+        
+        return Response(
+            DailyLogSerializer(log).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
 
-        existing_log = None
-        if date_value:
-            existing_log = DailyLog.objects.filter(user=request.user, date=date_value).first()
 
-        serializer = self.get_serializer(existing_log, data=data, context={'request': request})
+class DailyLogBulkUpsertView(APIView):
+    """
+    Create or update many days of logs in one request, e.g. for backfilling.
+    
+    Accepts a list of daily logs. Each day is inserted or updated in place;
+    responds 201 if any day was created, otherwise 200.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    max_rows = 366
+    
+    def post(self, request):
+        if not isinstance(request.data, list) or not request.data:
+            return Response(
+                {'error': 'Skicka en lista med daganteckningar.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(request.data) > self.max_rows:
+            return Response(
+                {'error': f'Högst {self.max_rows} daganteckningar per anrop.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = DailyLogSerializer(
+            data=request.data, many=True, context={'request': request, 'upsert': True}
+        )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-
+        rows = [_daily_log_row(item) for item in serializer.validated_data]
+        
+        dates = [row['date'] for row in rows]
+        if len(set(dates)) != len(dates):
+            return Response(
+                {'error': 'Samma datum förekommer flera gånger.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        results = DailyLog.objects.upsert(request.user, rows)
+        created_count = sum(1 for _, created in results if created)
+        
         return Response(
-            serializer.data,
-            status=status.HTTP_200_OK if existing_log else status.HTTP_201_CREATED
+            {
+                'created': created_count,
+                'updated': len(results) - created_count,
+                'results': DailyLogSerializer([log for log, _ in results], many=True).data,
+            },
+            status=status.HTTP_201_CREATED if created_count else status.HTTP_200_OK
         )
 
 
+def _daily_log_row(validated_data):
+    """Build an upsert row, deriving the date from logged_at when missing."""
+    row = dict(validated_data)
+    if not row.get('date'):
+        logged_at = row.get('logged_at')
+        row['date'] = logged_at.date() if logged_at else timezone.now().date()
+    return row
+
+
 class DailyLogDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, or delete a daily log."""
     
@@ -334,22 +508,349 @@ class DailyLogTodayView(APIView):
         data['date'] = today
         data.setdefault('logged_at', timezone.now())
         
-        try:
-            # Try to get existing log
-            log = DailyLog.objects.get(user=request.user, date=today)
-            serializer = DailyLogSerializer(log, data=data, context={'request': request})
-        except DailyLog.DoesNotExist:
-            # Create new log
-            serializer = DailyLogSerializer(data=data, context={'request': request})
-        
+        serializer = DailyLogSerializer(
+            data=data, context={'request': request, 'upsert': True}
+        )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        [(log, _)] = DailyLog.objects.upsert(request.user, [serializer.validated_data])
+        return Response(DailyLogSerializer(log).data, status=status.HTTP_200_OK)
     
     def put(self, request):
         return self.post(request)
 
 
+# =============================================================================
+# Insights Views
+# =============================================================================
+
+class FeatureMatrixView(APIView):
+    """
+    Dense per-day feature matrix joining daily aggregates and daily logs.
+    
+    Query params:
+    - start: First date, YYYY-MM-DD (defaults to 89 days before end)
+    - end: Last date, YYYY-MM-DD (defaults to today)
+    
+    Returns one array per column with null for missing days, a boolean
+    mask per column, and the category order used for the ordinal-encoded
+    choice fields.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        end_str = request.query_params.get('end')
+        start_str = request.query_params.get('start')
+        try:
+            end = parse_date(end_str) if end_str else timezone.now().date()
+            start = parse_date(start_str) if start_str else end - timedelta(days=89)
+        except ValueError:
+            start = end = None
+        if start is None or end is None:
+            return Response(
+                {'error': 'Ogiltigt datumformat. Använd YYYY-MM-DD.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if start > end:
+            return Response(
+                {'error': 'Startdatum måste vara före slutdatum.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if (end - start).days + 1 > analytics.MAX_DAYS:
+            return Response(
+                {'error': f'Intervallet får vara högst {analytics.MAX_DAYS} dagar.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        matrix = analytics.feature_matrix(request.user, start, end)
+        return Response(analytics.to_json(matrix))
+
+
+class CorrelationsView(APIView):
+    """
+    Correlations between daily-log factors and the daily mood average.
+    
+    For each factor and lag (0 = same day, 1 = factor the day before)
+    returns the number of paired days, Pearson and Spearman coefficients
+    and the mean mood difference between high and low factor days.
+    Statistics are null below the minimum number of paired days.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        return Response(analytics.get_correlations(request.user))
+
+
+class MoodHeatmapView(APIView):
+    """
+    Average mood per weekday and hour, from precomputed counters.
+    
+    Query params:
+    - months: Only count the latest N calendar months, this one included
+      (defaults to the whole history)
+    
+    ``averages`` and ``counts`` are 7 rows (Monday first) of 24 hours in
+    local time; hours without entries have a null average.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    max_months = 120
+    
+    def get(self, request):
+        months_str = request.query_params.get('months')
+        since = None
+        if months_str:
+            try:
+                months = int(months_str)
+            except ValueError:
+                months = 0
+            if not 1 <= months <= self.max_months:
+                return Response(
+                    {'error': f'Ogiltigt antal månader. Välj 1–{self.max_months}.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            current = timezone.localdate().replace(day=1)
+            index = current.year * 12 + current.month - 1 - (months - 1)
+            since = current.replace(year=index // 12, month=index % 12 + 1)
+        
+        sums, counts = MoodHeatmap.totals(request.user, since=since)
+        averages = [
+            round(total / count, 2) if count else None
+            for total, count in zip(sums, counts)
+        ]
+        return Response({
+            'since': since.isoformat() if since else None,
+            'averages': [averages[day * 24:(day + 1) * 24] for day in range(7)],
+            'counts': [counts[day * 24:(day + 1) * 24] for day in range(7)],
+        })
+
+
+class MoodChangePointsView(APIView):
+    """
+    Detected low and high periods and the current regime.
+    
+    Days are fed to the online detector once they are over, so the
+    current day is never included. Days not processed yet are included
+    in the response without being stored; the endpoint does not write.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        detector, pending = changepoints.preview(request.user, changepoints.last_final_day())
+        state = detector.state
+        stored = list(MoodChangePoint.objects.filter(user=request.user))
+        
+        return Response({
+            'regime': state.get('regime', MoodChangePoint.Kind.NORMAL),
+            'regime_start': state.get('regime_start'),
+            'baseline': round(state['mean'], 2) if 'mean' in state else None,
+            'processed_through': detector.processed_through,
+            'change_points': MoodChangePointSerializer(
+                sorted(pending + stored, key=lambda point: point.date, reverse=True), many=True
+            ).data,
+        })
+
+
+class TagImpactView(APIView):
+    """
+    Average mood of entries with and without each tag.
+    
+    Per tag: entry count, averages with and without the tag, their
+    difference and a 95 % confidence interval for the difference.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        return Response({'results': analytics.tag_impact(request.user)})
+
+
+# =============================================================================
+# Export View
+# =============================================================================
+
+class ExportView(APIView):
+    """
+    Stream the user's full history.
+    
+    Query params:
+    - format: 'ndjson' (default) | 'csv' | 'parquet'
+    - datasets: comma-separated subset of mood_entries, daily_logs,
+      daily_aggregates, daily_reflections, tags (NDJSON; default all)
+    - dataset: the single dataset to export as CSV or Parquet
+      (default mood_entries)
+    """
+    
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [NDJSONRenderer, CSVRenderer, ParquetRenderer]
+    
+    def get(self, request):
+        export_format = request.accepted_renderer.format
+        
+        if export_format == 'parquet':
+            if not parquet.is_available():
+                return Response(
+                    {'error': 'Parquet-export kräver pyarrow på servern.'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+            dataset = request.query_params.get('dataset', 'mood_entries')
+            if dataset not in export.DATASETS:
+                return self._unknown_dataset()
+            response = self._stream(request, parquet.stream_parquet(request.user, dataset), parquet.MEDIA_TYPE)
+            filename = f'humorkarta-{dataset}.parquet'
+        elif export_format == 'csv':
+            dataset = request.query_params.get('dataset', 'mood_entries')
+            if dataset not in export.DATASETS:
+                return self._unknown_dataset()
+            response = self._stream(request, export.stream_csv(request.user, dataset), 'text/csv; charset=utf-8')
+            filename = f'humorkarta-{dataset}.csv'
+        else:
+            datasets = request.query_params.get('datasets')
+            datasets = datasets.split(',') if datasets else list(export.DATASETS)
+            if any(dataset not in export.DATASETS for dataset in datasets):
+                return self._unknown_dataset()
+            response = self._stream(
+                request, export.stream_ndjson(request.user, datasets), 'application/x-ndjson; charset=utf-8'
+            )
+            filename = 'humorkarta.ndjson'
+        
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    
+    def _stream(self, request, chunks, content_type):
+        if isinstance(request._request, ASGIRequest):
+            # Otherwise Django would collect the whole export before sending it
+            chunks = export.iterate_async(chunks)
+        return StreamingHttpResponse(chunks, content_type=content_type)
+    
+    def _unknown_dataset(self):
+        return Response(
+            {'error': f'Okänd datamängd. Välj: {", ".join(export.DATASETS)}.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+
+# =============================================================================
+# Batch View
+# =============================================================================
+
+class BatchView(APIView):
+    """
+    Run several API calls in one HTTP round-trip.
+    
+    Body: ``{"requests": [{"method", "path", "body"}, ...], "atomic": false}``
+    
+    Sub-requests may target the mood and auth endpoints. The caller is
+    authenticated once and each sub-request is dispatched straight to its
+    view through the URL resolver; streaming endpoints answer 400. Results
+    come back in request order as ``{"status", "body"}``. With ``atomic`` set, all sub-requests share one
+    transaction: the first failure rolls everything back and the remaining
+    sub-requests are skipped with status 424. Background work they queue
+    starts only once that transaction commits.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    max_requests = 20
+    allowed_namespaces = ('moods', 'users')
+    allowed_methods = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+    unbatchable = 'Strömmande anrop kan inte ingå i en batch.'
+    
+    def post(self, request):
+        items = request.data.get('requests') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response(
+                {'error': 'Ange en lista med anrop i "requests".'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > self.max_requests:
+            return Response(
+                {'error': f'Högst {self.max_requests} anrop per batch.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        response = Response()
+        if request.data.get('atomic'):
+            with transaction.atomic():
+                results = self._run_all(request, items, response, stop_on_error=True)
+                if any(result['status'] >= 400 for result in results):
+                    transaction.set_rollback(True)
+                    # Work deferred by rolled-back sub-requests is moot
+                    discard_after_response(response)
+        else:
+            results = self._run_all(request, items, response, stop_on_error=False)
+        
+        response.data = {'results': results}
+        return response
+    
+    def _run_all(self, request, items, response, stop_on_error):
+        results = []
+        for item in items:
+            if stop_on_error and results and results[-1]['status'] >= 400:
+                results.append({'status': status.HTTP_424_FAILED_DEPENDENCY, 'body': None})
+                continue
+            results.append(self._run_one(request, item, response))
+        return results
+    
+    def _run_one(self, request, item, response):
+        if not isinstance(item, dict):
+            return {'status': status.HTTP_400_BAD_REQUEST, 'body': {'error': 'Ogiltigt anrop.'}}
+        
+        method = str(item.get('method', 'GET')).upper()
+        path = str(item.get('path', ''))
+        if method not in self.allowed_methods:
+            return {'status': status.HTTP_405_METHOD_NOT_ALLOWED, 'body': None}
+        
+        path_info, _, query_string = path.partition('?')
+        try:
+            match = resolve(path_info)
+        except Resolver404:
+            return {'status': status.HTTP_404_NOT_FOUND, 'body': None}
+        if match.namespace not in self.allowed_namespaces or getattr(match.func, 'view_class', None) is type(self):
+            return {'status': status.HTTP_403_FORBIDDEN, 'body': None}
+        if iscoroutinefunction(match.func):
+            # Can't be awaited from this sync view
+            return {'status': status.HTTP_400_BAD_REQUEST, 'body': {'error': self.unbatchable}}
+        
+        sub_request = self._build_request(request, method, path_info, query_string, item.get('body'))
+        sub_response = match.func(sub_request, *match.args, **match.kwargs)
+        if sub_response.streaming:
+            # The body can't be embedded in the batch result
+            sub_response.close()
+            return {'status': status.HTTP_400_BAD_REQUEST, 'body': {'error': self.unbatchable}}
+        transfer_after_response(sub_response, response)
+        
+        body = getattr(sub_response, 'data', None)
+        if body is None and not sub_response.streaming and \
+                sub_response.get('Content-Type', '').startswith('application/json'):
+            body = json.loads(sub_response.content or b'null')
+        return {'status': sub_response.status_code, 'body': body}
+    
+    def _build_request(self, request, method, path_info, query_string, body):
+        payload = json.dumps(body).encode() if body is not None else b''
+        environ = {
+            key: value for key, value in request.META.items()
+            if (key.startswith('HTTP_') and key != 'HTTP_AUTHORIZATION')
+            or key in ('SERVER_NAME', 'SERVER_PORT', 'REMOTE_ADDR')
+        }
+        environ.update({
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path_info,
+            'QUERY_STRING': query_string,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(payload)),
+            'wsgi.input': io.BytesIO(payload),
+            'wsgi.url_scheme': request.scheme,
+        })
+        sub_request = WSGIRequest(environ)
+        # Reuse the outer authentication instead of re-checking the token
+        # (picked up by BatchCallerAuthentication)
+        sub_request.batch_caller = (request.user, request.auth)
+        return sub_request
+
+
 # =============================================================================
 # Daily Reflection Views
 # =============================================================================
@@ -381,173 +882,211 @@ class DailyReflectionListView(generics.ListAPIView):
 # Daily Reflection Generate View
 # =============================================================================
 
-SYSTEM_PROMPT = """Du är en dagboksskribent som hjälper användaren att formulera sin dag i text. Du skriver på svenska.
-
-STRIKTA REGLER:
-- Du får ALDRIG hitta på händelser eller detaljer som användaren inte har angett
-- Du får tolka och rama in (vila som återhämtning, tristess som lugn) men aldrig ljuga
-- Inget terapispråk, inga kliniska termer, ingen "healing journey"
-- Ingen toxic positivity eller påtvingad tacksamhet
-- Tonen ska vara jordad, ärlig och varm - som användarens egen röst fast lite snällare
-- Om dagen var tung: bevittna och validera, försök inte fixa eller peppa
-- Avsluta INTE med "imorgon är en ny dag" eller liknande klyschor — det är okej att sluta utan hopp
-
-FORMAT:
-- Titel på egen rad som innehåller veckodag, datum och år plus en kort beskrivning, t.ex. "Onsdag 8 januari 2024 — en dag av vardagssysslor" (ren text, inga asterisker eller markdown)
-- Blank rad efter titeln
-- 3-4 stycken (inte 2)
-- Totalt 180-260 ord — detta är viktigt, skriv inte för kort
-- Ren text utan formatering (inga **, inga #, inga bullet points)
-"""
-
-DEVELOPER_PROMPT = """Baserat på användarens dagssnapshot, skriv en dagboksentry.
-
-Använd den valda stilen:
-- "grounded": Jordad, saklig, utan utsmyckning
-- "warm": Lite varmare ton, fortfarande ärlig
-- "minimal": Kortfattat, nästan telegramstil
+class DailyReflectionGenerateView(APIView):
+    """
+    Queue generation of a daily reflection.
+
+    Returns 202 with the job right away; poll
+    ``daily-reflections/jobs/<id>/`` until its status is done or failed.
+    A reflection pre-generated by the nightly batch is returned at once
+    as done. Answers 503 with ``Retry-After`` while the upstream circuit
+    is open. Only requests that start a new generation count against the
+    ``reflections`` rate.
+    """
+    permission_classes = [IsAuthenticated]
 
-Strukturera svaret som:
-[Titel]
+    def post(self, request):
+        serializer = ReflectionRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        payload = serializer.validated_data
+        date_value = payload.get('date') or timezone.localdate()
+
+        existing = DailyReflection.objects.filter(
+            user=request.user, date=date_value
+        ).values('id', 'date', 'entry', 'pregenerated').first()
+        if existing:
+            if existing['pregenerated']:
+                # Made by the nightly batch: done, no job needed
+                return Response({'status': ReflectionJob.Status.DONE, **_reflection_data(existing)})
+            return Response(
+                {'detail': reflections.ALREADY_EXISTS},
+                status=status.HTTP_409_CONFLICT
+            )
 
-[Stycke 1]
+        error = reflections.configuration_error()
+        if error:
+            return Response({'error': error}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-[Stycke 2]
+        retry_after = upstream.get_breaker().retry_after()
+        if retry_after:
+            return Response(
+                {'error': upstream.OPEN},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(retry_after)}
+            )
 
-[Eventuellt stycke 3-4]
+        throttle = _reflection_throttle(request, self, date_value)
+        if throttle:
+            self.throttled(request, throttle.wait())
 
-Skriv ENDAST entryn, ingen inledning eller avslutande kommentar."""
+        snapshot = reflections.load_snapshot(request.user, date_value)
+        job = reflections.enqueue(
+            request.user, date_value, reflections.build_user_message(payload, snapshot)
+        )
+        return Response(
+            ReflectionJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': reverse('moods:reflection-job', args=[job.pk])}
+        )
 
 
-class DailyReflectionGenerateView(APIView):
+class DailyReflectionSnapshotView(APIView):
+    """
+    GET the stored data a reflection for ``?date=`` (default today) is
+    built from, so the client can show it without fetching entries and
+    logs separately.
+    """
     permission_classes = [IsAuthenticated]
 
-    def post(self, request):
-        if anthropic is None:
+    def get(self, request):
+        date_str = request.query_params.get('date')
+        try:
+            date_value = parse_date(date_str) if date_str else timezone.localdate()
+        except ValueError:
+            date_value = None
+        if date_value is None:
             return Response(
-                {'error': 'Anthropic SDK saknas på servern.'},
-                status=status.HTTP_503_SERVICE_UNAVAILABLE
+                {'error': 'Ogiltigt datumformat. Använd YYYY-MM-DD.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
+        return Response(reflections.load_snapshot(request.user, date_value))
 
-        api_key = os.environ.get('ANTHROPIC_API_KEY')
-        if not api_key:
-            return Response(
-                {'error': 'ANTHROPIC_API_KEY saknas i servermiljön.'},
-                status=status.HTTP_503_SERVICE_UNAVAILABLE
-            )
 
-        payload = request.data or {}
-        date_value = parse_date(payload.get('date') or '') or timezone.now().date()
+class ReflectionJobView(generics.RetrieveAPIView):
+    """Status of a reflection job, with the entry once it is done."""
 
-        if DailyReflection.objects.filter(user=request.user, date=date_value).exists():
-            return Response(
-                {'detail': 'Du har redan en dagreflektion för detta datum.'},
+    serializer_class = ReflectionJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ReflectionJob.objects.filter(user=self.request.user).select_related('reflection')
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class DailyReflectionStreamView(View):
+    """
+    Generate a daily reflection and relay it as server-sent events.
+
+    Sends ``delta`` events with text as it arrives, then ``done`` with the
+    stored reflection, or ``error`` (with ``retry_after`` when the call was
+    turned away by the upstream limits). A pre-generated reflection is
+    sent at once as one ``delta`` and ``done``. This is a plain async
+    Django view (DRF views are sync-only); served over ASGI a stream holds
+    no worker thread while it waits on the model.
+    """
+
+    async def post(self, request):
+        user = await _token_user(request)
+        if user is None:
+            return JsonResponse(
+                {'detail': str(NotAuthenticated.default_detail)},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'detail': 'Ogiltig JSON.'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = ReflectionRequestSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        payload = serializer.validated_data
+        date_value = payload.get('date') or timezone.localdate()
+
+        existing = await DailyReflection.objects.filter(
+            user=user, date=date_value
+        ).values('id', 'date', 'entry', 'pregenerated').afirst()
+        if existing:
+            if existing['pregenerated']:
+                return _event_stream(_pregenerated_events(existing))
+            return JsonResponse(
+                {'detail': reflections.ALREADY_EXISTS},
                 status=status.HTTP_409_CONFLICT
             )
 
-        def format_scale(value, max_value):
-            if value is None:
-                return '–'
-            return f'{value}/{max_value}'
-
-        def join_list(values):
-            return ', '.join([str(value) for value in values if value]) or 'inga angivna'
-
-        content = payload.get('content') or {}
-        mood = payload.get('mood') or {}
-        daily_log = payload.get('dailyLog') or {}
-        water = payload.get('water') or {}
-        weather = payload.get('weather') or {}
-        basics = payload.get('basics') or {}
-
-        mood_entries = mood.get('entries') or []
-        mood_entry_notes = [entry.get('note') for entry in mood_entries if entry.get('note')]
-
-        weather_summary = ''
-        if weather.get('summary') or weather.get('location') or weather.get('temperature') is not None:
-            parts = []
-            if weather.get('temperature') is not None:
-                parts.append(f"{weather.get('temperature')}°C")
-            if weather.get('summary'):
-                parts.append(str(weather.get('summary')))
-            if weather.get('location'):
-                parts.append(f"i {weather.get('location')}")
-            weather_summary = ' '.join(parts).strip()
-
-        daily_log_lines = []
-        if daily_log:
-            daily_log_lines = [
-                f"- Ångest: {format_scale(daily_log.get('anxiety'), 5)}",
-                f"- Stress: {format_scale(daily_log.get('stress'), 5)}",
-                f"- Koncentration: {format_scale(daily_log.get('concentration'), 5)}",
-                f"- Energi: {format_scale(daily_log.get('energy'), 5)}",
-                f"- Aptit: {format_scale(daily_log.get('appetite'), 5)}",
-                f"- Sömn: {daily_log.get('sleep_hours') or '–'} timmar, kvalitet {format_scale(daily_log.get('sleep_quality'), 5)}",
-            ]
+        error = reflections.configuration_error()
+        if error:
+            return JsonResponse({'error': error}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        retry_after = upstream.get_breaker().retry_after()
+        if retry_after:
+            response = JsonResponse({'error': upstream.OPEN}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = str(retry_after)
+            return response
+
+        # Same per-user limit as the generate view; DRF can't apply it here
+        request.user = user
+        throttle = await sync_to_async(_reflection_throttle)(request, self, date_value)
+        if throttle:
+            wait = throttle.wait()
+            response = JsonResponse(
+                {'detail': str(Throttled(wait).detail)},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+            if wait is not None:
+                response['Retry-After'] = str(math.ceil(wait))
+            return response
 
-        basics_list = [
-            basics.get('ate') and 'åt ordentligt',
-            basics.get('hydrated') and 'drack tillräckligt',
-            basics.get('outside') and 'var utomhus',
-            basics.get('movement') and 'rörde på sig',
-            basics.get('rested') and 'vilade när det behövdes',
-            basics.get('tookMedication') and 'tog medicin som planerat',
-        ]
+        snapshot = await sync_to_async(reflections.load_snapshot)(user, date_value)
+        user_message = reflections.build_user_message(payload, snapshot)
 
-        user_message = f"""Här är dagens data:
+        async def events():
+            async for event, data in reflections.stream_reflection(user, date_value, user_message):
+                yield _sse(event, data)
 
-Datum: {payload.get('date') or 'idag'}
-Väder: {weather_summary or 'okänt eller ej angivet'}
-Händelser: {join_list(payload.get('events') or [])}
-{f"Detaljer: {content.get('details')}" if content.get('details') else ''}
+        return _event_stream(events())
 
-Humör:
-- Snitt/vald nivå: {format_scale(mood.get('score'), 10)} {f"({mood.get('label')})" if mood.get('label') else ''}
-- Antal humörloggar: {mood.get('entryCount') or 0}
-{f"- Noteringar från humörloggar: {join_list(mood_entry_notes)}" if mood_entry_notes else ''}
-{f"- Fri text om humör: {mood.get('note')}" if mood.get('note') else ''}
 
-{f"Hård stund: {payload.get('hardMoments')}" if payload.get('hardMoments') else ''}
-{f"Hjälpsam stund: {payload.get('helpfulMoments')}" if payload.get('helpfulMoments') else ''}
+def _reflection_throttle(request, view, date):
+    """
+    Charge a new generation to the user's ``reflections`` rate.
 
-{f"Daganteckning (skala 1-5):\n" + "\n".join(daily_log_lines) if daily_log_lines else "Daganteckning: inget ifyllt."}
+    Returns the throttle if the request is over the limit, else None.
+    Joining a job already in flight makes no upstream call and is free.
+    """
+    if ReflectionJob.objects.filter(user=request.user, date=date, status__in=reflections.ACTIVE).exists():
+        return None
+    throttle = ReflectionRateThrottle()
+    return None if throttle.allow_request(request, view) else throttle
 
-Grunderna: {join_list(basics_list)}
-Vatten: {water.get('count') or 0} av {water.get('total') or 0} glas
-Andningsövning använd: {'ja' if payload.get('breathingUsed') else 'nej'}
 
-Ton: {payload.get('tone') or 'grounded'}"""
+async def _token_user(request):
+    """The user from a DRF token header, or None."""
+    try:
+        result = await sync_to_async(TokenAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
 
-        try:
-            client = anthropic.Anthropic(api_key=api_key)
-            response = client.messages.create(
-                model='claude-sonnet-4-20250514',
-                max_tokens=1024,
-                system=SYSTEM_PROMPT,
-                messages=[
-                    {
-                        'role': 'user',
-                        'content': f"{DEVELOPER_PROMPT}\n\n{user_message}"
-                    }
-                ]
-            )
-            text_block = next((block for block in response.content if block.type == 'text'), None)
-            generated_text = text_block.text if text_block else ''
-            if generated_text:
-                try:
-                    DailyReflection.objects.create(
-                        user=request.user,
-                        date=date_value,
-                        entry=generated_text
-                    )
-                except IntegrityError:
-                    return Response(
-                        {'detail': 'Du har redan en dagreflektion för detta datum.'},
-                        status=status.HTTP_409_CONFLICT
-                    )
-            return Response({'entry': generated_text})
-        except Exception as exc:
-            return Response(
-                {'error': 'Failed to generate entry', 'detail': str(exc)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+
+async def _pregenerated_events(reflection):
+    # Same events a follower of a finished job gets
+    data = _reflection_data(reflection)
+    yield _sse('delta', {'text': data['entry']})
+    yield _sse('done', data)
+
+
+def _reflection_data(reflection):
+    return {'id': reflection['id'], 'date': reflection['date'].isoformat(), 'entry': reflection['entry']}
+
+
+def _event_stream(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+from .models import User, AccountDeletionJob
 
 
 @admin.register(User)
@@ -25,3 +25,15 @@ class UserAdmin(BaseUserAdmin):
             'fields': ('email', 'password1', 'password2'),
         }),
     )
+
+
+@admin.register(AccountDeletionJob)
+class AccountDeletionJobAdmin(admin.ModelAdmin):
+    """Read-only overview of background account deletions."""
+    
+    list_display = ('user_id', 'status', 'deleted_rows', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('user_id', 'status', 'progress', 'error', 'created_at', 'updated_at', 'finished_at')
+    
+    def has_add_permission(self, request):
+        return False
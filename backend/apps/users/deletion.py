@@ -0,0 +1,118 @@
+"""
+Chunked removal of account data.
+
+Deleting a user through the ORM makes Django's collector load every
+related row into memory before cascading. For long-lived accounts that
+is slow enough to time out a worker, so accounts are instead
+deactivated right away and their data is removed here in bounded
+``DELETE ... WHERE id IN (...)`` batches. Every batch commits together
+with the job's progress, so an interrupted job can simply be run again.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, models, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .models import AccountDeletionJob
+
+User = get_user_model()
+
+
+def schedule_account_deletion(user):
+    """Deactivate ``user``, revoke their token and queue data removal."""
+    from apps.moods.background import submit
+
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        Token.objects.filter(user=user).delete()
+        job = AccountDeletionJob.objects.create(user_id=user.pk)
+
+    submit(run_account_deletion, job.pk)
+    return job
+
+
+def run_account_deletion(job_id, chunk_size=None):
+    """Delete the data of a job's user in chunks, resuming where it left off."""
+    chunk_size = chunk_size or settings.ACCOUNT_DELETION_CHUNK_SIZE
+    job = AccountDeletionJob.objects.get(pk=job_id)
+    if job.status == AccountDeletionJob.Status.DONE:
+        return job
+
+    job.status = AccountDeletionJob.Status.RUNNING
+    job.save(update_fields=['status', 'updated_at'])
+
+    try:
+        for model, lookup in _deletion_plan():
+            _delete_in_chunks(job, model, lookup, chunk_size)
+
+        # Only the user row and small bookkeeping rows remain by now
+        User.objects.filter(pk=job.user_id).delete()
+    except Exception as exc:
+        job.status = AccountDeletionJob.Status.FAILED
+        job.error = str(exc)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+
+    job.status = AccountDeletionJob.Status.DONE
+    job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+    return job
+
+
+def _deletion_plan():
+    """
+    Yield ``(model, lookup)`` pairs in a dependency-safe order.
+
+    ``lookup`` is the filter path from ``model`` to the owning user's id.
+    Every model that cascades from the user comes after the rows that
+    point at it, such as the many-to-many rows of ``MoodEntry.tags``.
+    ``SET_NULL`` references are cleared per chunk by ``_delete_in_chunks``.
+    """
+    for relation in User._meta.related_objects:
+        if relation.on_delete is not models.CASCADE or relation.related_model is Token:
+            continue
+
+        owned = relation.related_model
+        owner_lookup = f'{relation.field.name}_id'
+
+        for dependent in owned._meta.get_fields(include_hidden=True):
+            if not dependent.one_to_many or dependent.related_model is owned:
+                continue
+            if dependent.on_delete is not models.CASCADE:
+                continue
+            yield dependent.related_model, f'{dependent.field.name}__{owner_lookup}'
+
+        yield owned, owner_lookup
+
+
+def _delete_in_chunks(job, model, lookup, chunk_size):
+    label = model._meta.label_lower
+    queryset = model._default_manager.filter(**{lookup: job.user_id}).order_by()
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk_column = connection.ops.quote_name(model._meta.pk.column)
+    # The raw DELETE bypasses the collector, so nullable references such
+    # as ReflectionJob.reflection are cleared here as Django would
+    nullable = [
+        (relation.related_model, relation.field.name)
+        for relation in model._meta.related_objects
+        if relation.on_delete is models.SET_NULL
+    ]
+
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                return
+            for referrer, field_name in nullable:
+                referrer._default_manager.filter(**{f'{field_name}__in': ids}).update(**{field_name: None})
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {table} WHERE {pk_column} IN ({", ".join(["%s"] * len(ids))})',
+                    ids
+                )
+                deleted = cursor.rowcount
+            job.progress[label] = job.progress.get(label, 0) + deleted
+            job.save(update_fields=['progress', 'updated_at'])
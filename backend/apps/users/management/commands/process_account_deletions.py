@@ -0,0 +1,30 @@
+"""
+Finish account deletions that were interrupted, e.g. by a worker restart.
+
+Suitable for cron: python manage.py process_account_deletions
+"""
+from django.core.management.base import BaseCommand
+
+from apps.users.deletion import run_account_deletion
+from apps.users.models import AccountDeletionJob
+
+
+class Command(BaseCommand):
+    help = 'Run pending, stalled or failed account deletion jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Rows per DELETE batch (default: ACCOUNT_DELETION_CHUNK_SIZE).'
+        )
+
+    def handle(self, *args, **options):
+        jobs = AccountDeletionJob.objects.exclude(
+            status=AccountDeletionJob.Status.DONE
+        ).order_by('created_at')
+
+        for job_id in jobs.values_list('pk', flat=True):
+            job = run_account_deletion(job_id, chunk_size=options['chunk_size'])
+            self.stdout.write(f'Job {job.pk}: {job.deleted_rows} rows deleted')
@@ -0,0 +1,31 @@
+# Generated by Django 6.1.2 on 2026-10-19 08:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountDeletionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField(db_index=True, verbose_name='användar-id')),
+                ('status', models.CharField(choices=[('pending', 'Väntar'), ('running', 'Pågår'), ('done', 'Klar'), ('failed', 'Misslyckades')], default='pending', max_length=10, verbose_name='status')),
+                ('progress', models.JSONField(blank=True, default=dict, help_text='Antal raderade rader per tabell', verbose_name='förlopp')),
+                ('error', models.TextField(blank=True, verbose_name='fel')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='skapad')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='uppdaterad')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='avslutad')),
+            ],
+            options={
+                'verbose_name': 'kontoradering',
+                'verbose_name_plural': 'kontoraderingar',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-19 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_account_deletion_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='pregenerate_reflections',
+            field=models.BooleanField(default=False, verbose_name='förskapa dagreflektioner'),
+        ),
+    ]
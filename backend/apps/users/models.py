@@ -51,6 +51,9 @@ class User(AbstractBaseUser, PermissionsMixin):
     
     # Optional display name (not required for privacy)
     display_name = models.CharField('visningsnamn', max_length=50, blank=True)
+
+    # Opt-in: generate the day's reflection in the nightly batch
+    pregenerate_reflections = models.BooleanField('förskapa dagreflektioner', default=False)
     
     # Account status
     is_active = models.BooleanField('aktiv', default=True)
@@ -74,3 +77,49 @@ class User(AbstractBaseUser, PermissionsMixin):
     def get_short_name(self):
         """Return display name or email prefix."""
         return self.display_name or self.email.split('@')[0]
+
+
+class AccountDeletionJob(models.Model):
+    """
+    Background removal of a deactivated account's data.
+
+    Stores the user id rather than a foreign key so the job outlives the
+    user row and keeps its progress after the account is gone.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Väntar'
+        RUNNING = 'running', 'Pågår'
+        DONE = 'done', 'Klar'
+        FAILED = 'failed', 'Misslyckades'
+
+    user_id = models.BigIntegerField('användar-id', db_index=True)
+    status = models.CharField(
+        'status',
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    progress = models.JSONField(
+        'förlopp',
+        default=dict,
+        blank=True,
+        help_text='Antal raderade rader per tabell'
+    )
+    error = models.TextField('fel', blank=True)
+
+    created_at = models.DateTimeField('skapad', auto_now_add=True)
+    updated_at = models.DateTimeField('uppdaterad', auto_now=True)
+    finished_at = models.DateTimeField('avslutad', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'kontoradering'
+        verbose_name_plural = 'kontoraderingar'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Radering av användare {self.user_id} ({self.get_status_display()})"
+
+    @property
+    def deleted_rows(self):
+        return sum(self.progress.values())
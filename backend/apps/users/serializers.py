@@ -47,7 +47,7 @@ class UserSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = User
-        fields = ('id', 'email', 'display_name', 'date_joined')
+        fields = ('id', 'email', 'display_name', 'pregenerate_reflections', 'date_joined')
         read_only_fields = ('id', 'email', 'date_joined')
 
 
@@ -0,0 +1,135 @@
+"""
+Tests for chunked background account deletion.
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.moods.models import Tag, MoodEntry, DailyAggregate, DailyLog, DailyReflection, ReflectionJob
+from apps.users import deletion
+from apps.users.deletion import run_account_deletion
+from apps.users.models import AccountDeletionJob
+
+User = get_user_model()
+
+
+class AccountDeletionTests(TestCase):
+    """Tests for DELETE /api/auth/me/delete/ and the deletion job."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other = User.objects.create_user(
+            email='other@example.com',
+            password='testpass123'
+        )
+        tag = Tag.objects.create(user=self.user, name='Arbete')
+        for level in (3, 5, 7):
+            entry = MoodEntry.objects.create(user=self.user, mood_level=level)
+            entry.tags.add(tag)
+        DailyLog.objects.create(user=self.user, date=timezone.now().date())
+        DailyReflection.objects.create(user=self.user, date=timezone.now().date(), entry='Text')
+        MoodEntry.objects.create(user=self.other, mood_level=8)
+
+    def _delete_account(self):
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client.delete(reverse('users:delete-account'))
+
+    @override_settings(BACKGROUND_TASKS_INLINE=True, ACCOUNT_DELETION_CHUNK_SIZE=2)
+    def test_delete_account_removes_all_data(self):
+        """Test that the job removes the user and everything they own."""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._delete_account()
+
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(MoodEntry.objects.filter(user_id=self.user.pk).exists())
+        self.assertFalse(MoodEntry.tags.through.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+        self.assertFalse(DailyAggregate.objects.filter(user_id=self.user.pk).exists())
+        self.assertFalse(DailyLog.objects.exists())
+        self.assertFalse(DailyReflection.objects.exists())
+
+        job = AccountDeletionJob.objects.get(user_id=self.user.pk)
+        self.assertEqual(job.status, AccountDeletionJob.Status.DONE)
+        self.assertEqual(job.progress['moods.moodentry'], 3)
+        self.assertEqual(job.progress['moods.moodentry_tags'], 3)
+
+        # Other users are untouched
+        self.assertEqual(MoodEntry.objects.filter(user=self.other).count(), 1)
+
+    def test_account_deactivated_immediately(self):
+        """Test that the user is locked out before any data is removed."""
+        with mock.patch('apps.moods.background.submit') as submit:
+            response = self._delete_account()
+
+        self.assertEqual(response.status_code, 204)
+        submit.assert_called_once()
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertEqual(MoodEntry.objects.filter(user=self.user).count(), 3)
+
+    def test_job_resumes_after_interruption(self):
+        """Test that a failed job can be rerun to completion."""
+        job = AccountDeletionJob.objects.create(user_id=self.user.pk)
+
+        original = deletion._delete_in_chunks
+
+        def flaky(job, model, lookup, chunk_size):
+            if model is DailyLog:
+                raise RuntimeError('worker killed')
+            return original(job, model, lookup, chunk_size)
+
+        with mock.patch.object(deletion, '_delete_in_chunks', flaky):
+            with self.assertRaises(RuntimeError):
+                run_account_deletion(job.pk, chunk_size=1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, AccountDeletionJob.Status.FAILED)
+        self.assertFalse(MoodEntry.objects.filter(user=self.user).exists())
+        self.assertTrue(DailyLog.objects.filter(user=self.user).exists())
+
+        run_account_deletion(job.pk, chunk_size=1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, AccountDeletionJob.Status.DONE)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(job.progress['moods.moodentry'], 3)
+
+
+class AccountDeletionCommitTests(TransactionTestCase):
+    """Deletion with real commits, so foreign keys are checked after every chunk."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+
+    @override_settings(BACKGROUND_TASKS_INLINE=True)
+    def test_delete_account_with_reflection_job(self):
+        """Test that a job pointing at a reflection does not block deletion."""
+        reflection = DailyReflection.objects.create(user=self.user, date=timezone.now().date(), entry='Text')
+        ReflectionJob.objects.create(
+            user=self.user, date=reflection.date, prompt='Datum', status=ReflectionJob.Status.DONE,
+            reflection=reflection
+        )
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        response = client.delete(reverse('users:delete-account'))
+
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(ReflectionJob.objects.exists())
+        self.assertFalse(DailyReflection.objects.exists())
+        job = AccountDeletionJob.objects.get(user_id=self.user.pk)
+        self.assertEqual(job.status, AccountDeletionJob.Status.DONE)
@@ -9,6 +9,7 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .deletion import schedule_account_deletion
 from .serializers import (
     UserRegistrationSerializer,
     UserSerializer,
@@ -98,11 +99,15 @@ class ChangePasswordView(generics.UpdateAPIView):
 
 
 class DeleteAccountView(APIView):
-    """Permanently delete user account and all associated data."""
+    """
+    Permanently delete user account and all associated data.
+    
+    The account is deactivated and its token revoked immediately; the data
+    itself is removed in chunks by a background job.
+    """
     
     permission_classes = [IsAuthenticated]
     
     def delete(self, request):
-        user = request.user
-        user.delete()  # Cascades to all related data
+        schedule_account_deletion(request.user)
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,69 @@
+"""
+Shared setup for the benchmark scripts.
+
+Each script runs against a throwaway test database so it never touches
+db.sqlite3. Run from the backend directory, e.g.:
+
+    python benchmarks/quick_log.py
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.development')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment, teardown_test_environment  # noqa: E402
+
+from apps.moods.telemetry import percentile  # noqa: E402
+
+
+@contextmanager
+def test_database():
+    """Create a disposable test database for the duration of the block."""
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def create_user(email='bench@example.com'):
+    """Create a user with a cheap password hash."""
+    from django.contrib.auth import get_user_model
+
+    user = get_user_model()(email=email)
+    user.set_unusable_password()
+    user.save()
+    return user
+
+
+def timed(func, iterations):
+    """Call ``func`` repeatedly and return per-call latencies in milliseconds."""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples):
+    """Print p50/p99 and mean latency for a list of millisecond samples."""
+    mean = sum(samples) / len(samples)
+    print(
+        f'{label:<28} n={len(samples):<5} p50={percentile(samples, 50):7.2f} ms  '
+        f'p99={percentile(samples, 99):7.2f} ms  mean={mean:7.2f} ms'
+    )
@@ -0,0 +1,42 @@
+"""
+Per-call cost of building an Anthropic client versus the pooled one.
+
+Calls a local fake Messages API (plain HTTP, no delay) with a new
+``anthropic.Anthropic`` for every call, as the generate view used to,
+and with the pooled ``reflection_backends.get_client()``. The fake server counts the TCP
+connections each variant opens. Against the real API every new
+connection also pays for a TLS handshake, which this leaves out.
+
+Usage: python benchmarks/anthropic_client.py [iterations]
+"""
+import os
+import sys
+
+from _harness import report, timed
+
+
+def main(iterations):
+    import anthropic
+    from django.test import override_settings
+
+    from apps.moods import reflections
+    from apps.moods.tests.fake_anthropic import FakeAnthropicServer
+
+    os.environ['ANTHROPIC_API_KEY'] = 'benchmark'
+    with FakeAnthropicServer() as server, override_settings(ANTHROPIC_BASE_URL=server.url):
+        def fresh():
+            client = anthropic.Anthropic(api_key='benchmark', base_url=server.url)
+            client.messages.create(**reflections.message_params('idag'))
+
+        def pooled():
+            reflections.generate('idag')
+
+        for label, func in (('new client per call', fresh), ('pooled client', pooled)):
+            before = server.connections
+            samples = timed(func, iterations)
+            report(label, samples)
+            print(f'{"":<28} {server.connections - before} connections opened')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
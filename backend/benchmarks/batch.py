@@ -0,0 +1,67 @@
+"""
+Compare N individual API calls with one POST /api/batch/ carrying N calls.
+
+Every call goes through the full middleware and token authentication
+stack in-process, so the difference reflects per-request overhead. Over
+the network each individual call would also pay a round-trip.
+
+Usage: python benchmarks/batch.py [rounds] [calls-per-round]
+"""
+import json
+import sys
+import time
+
+from _harness import create_user, report, test_database
+
+
+def main(rounds, size):
+    from rest_framework.authtoken.models import Token
+    from rest_framework.test import APIClient
+
+    from apps.moods.models import MoodEntry
+
+    user = create_user()
+    token = Token.objects.create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    for level in range(1, 11):
+        MoodEntry.objects.create(user=user, mood_level=level)
+
+    calls = [
+        ('GET', '/api/entries/', None),
+        ('GET', '/api/tags/', None),
+        ('GET', '/api/graph/?view=week', None),
+        ('GET', '/api/daily-logs/today/', None),
+        ('GET', '/api/auth/me/', None),
+    ]
+    calls = [calls[i % len(calls)] for i in range(size)]
+
+    def individual():
+        for method, path, body in calls:
+            response = client.generic(method, path, json.dumps(body) if body else '',
+                                      content_type='application/json')
+            assert response.status_code == 200, (path, response.status_code)
+
+    def batched():
+        payload = {'requests': [{'method': m, 'path': p, 'body': b} for m, p, b in calls]}
+        response = client.post('/api/batch/', payload, format='json')
+        assert response.status_code == 200, response.status_code
+
+    for label, func in (('individual calls', individual), ('one batch call', batched)):
+        samples = []
+        start = time.perf_counter()
+        for _ in range(rounds):
+            round_start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - round_start) * 1000)
+        elapsed = time.perf_counter() - start
+        report(f'{size} x {label}', samples)
+        print(f'{"":<28} throughput={rounds * size / elapsed:8.1f} sub-requests/s')
+
+
+if __name__ == '__main__':
+    with test_database():
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 10,
+        )
@@ -0,0 +1,69 @@
+"""
+Compare request latency of POST /api/entries/ and POST /api/entries/quick/.
+
+Latency is measured in-process through the full middleware and token
+authentication stack, up to the point where the response is handed to
+the server. Deferred work (the aggregate refresh of the quick-log
+endpoint) runs when the response is closed; it is timed on its own and
+reported separately.
+
+Usage: python benchmarks/quick_log.py [iterations]
+"""
+import sys
+import time
+
+from _harness import create_user, report, test_database, timed
+
+
+def main(iterations):
+    from unittest import mock
+
+    from rest_framework.authtoken.models import Token
+    from rest_framework.test import APIClient
+
+    from apps.moods import background, views
+
+    user = create_user()
+    token = Token.objects.create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    # The test client closes every response, which would fold deferred work
+    # into the measured latency; time each deferred task on its own instead.
+    deferred_ms = []
+
+    def timed_run_after_response(response, func, *args, **kwargs):
+        def timed_func(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                func(*args, **kwargs)
+            finally:
+                deferred_ms[-1] += (time.perf_counter() - start) * 1000
+
+        background.run_after_response(response, timed_func, *args, **kwargs)
+
+    def run(label, path, **extra):
+        def call():
+            deferred_ms.append(0.0)
+            response = client.generic(
+                'POST', path, '{"mood_level": 6, "note": "bench"}',
+                content_type='application/json', **extra
+            )
+            assert response.status_code in (201, 204), response.status_code
+
+        deferred_ms.clear()
+        totals = timed(call, iterations)
+        report(label, [total - deferred for total, deferred in zip(totals, deferred_ms)])
+        return list(deferred_ms)
+
+    with mock.patch.object(views, 'run_after_response', timed_run_after_response):
+        run('POST /api/entries/', '/api/entries/')
+        run('POST /api/entries/quick/', '/api/entries/quick/')
+        deferred = run('  + Prefer: return=minimal', '/api/entries/quick/', HTTP_PREFER='return=minimal')
+
+    report('  deferred aggregate work', deferred)
+
+
+if __name__ == '__main__':
+    with test_database():
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,87 @@
+"""
+Load test of the whole reflection pipeline, offline.
+
+Uses the fake reflection backend (no key, no network) and drives the
+streaming endpoint with many concurrent requests: first one per day
+(every request generates and stores an entry), then all for the same
+day (single-flight: one generation, the rest follow it). Covers request
+validation, the snapshot queries, job locking, the response cache and
+persistence; only the model is simulated.
+
+Usage: python benchmarks/reflection_pipeline.py [concurrent] [latency] [failure_rate]
+"""
+import asyncio
+import sys
+import time
+from datetime import date, timedelta
+
+from _harness import create_user, report, test_database
+
+CHUNK_DELAY = 0.02
+CHUNKS = 20
+
+
+def main(concurrent, latency, failure_rate):
+    from unittest import mock
+
+    from django.test import AsyncClient, override_settings
+    from django.urls import reverse
+    from rest_framework.authtoken.models import Token
+
+    from apps.moods.models import DailyReflection
+    from apps.moods.throttles import ReflectionRateThrottle
+
+    user = create_user()
+    headers = {'Authorization': f'Token {Token.objects.create(user=user).key}'}
+    url = reverse('moods:daily-reflection-stream')
+    client = AsyncClient()
+
+    async def stream(day):
+        start = time.perf_counter()
+        response = await client.post(url, {'date': day.isoformat()}, content_type='application/json', headers=headers)
+        first = None
+        outcome = f'http {response.status_code}'
+        if response.status_code == 200:
+            async for chunk in response.streaming_content:
+                if first is None and b'event: delta' in chunk:
+                    first = time.perf_counter()
+                for event in (b'done', b'error'):
+                    if b'event: ' + event in chunk:
+                        outcome = event.decode()
+        end = time.perf_counter()
+        return outcome, ((first or end) - start) * 1000, (end - start) * 1000
+
+    async def burst(label, days):
+        start = time.perf_counter()
+        results = await asyncio.gather(*(stream(day) for day in days))
+        elapsed = time.perf_counter() - start
+        print(f'{label}: {len(days)} requests in {elapsed:.2f}s ({len(days) / elapsed:.1f}/s)')
+        report('  time to first token', [first for _, first, _ in results])
+        report('  full entry', [total for _, _, total in results])
+        outcomes = {}
+        for outcome, _, _ in results:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        print(f'  outcomes: {outcomes}')
+
+    async def run():
+        days = [date(2025, 1, 1) + timedelta(days=offset) for offset in range(concurrent)]
+        await burst('one request per day', days)
+        await burst('same day', [date(2024, 12, 31)] * concurrent)
+        print(f'entries stored: {await DailyReflection.objects.acount()}')
+
+    options = {'latency': latency, 'chunk_delay': CHUNK_DELAY, 'chunks': CHUNKS, 'failure_rate': failure_rate, 'seed': 1}
+    with override_settings(
+        REFLECTION_BACKEND='apps.moods.reflection_backends.FakeBackend',
+        REFLECTION_BACKEND_OPTIONS=options,
+        REFLECTION_MAX_CONCURRENT=max(concurrent, 1),
+    ), mock.patch.object(ReflectionRateThrottle, 'THROTTLE_RATES', {'reflections': None}):
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    with test_database():
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+            float(sys.argv[2]) if len(sys.argv) > 2 else 0.5,
+            float(sys.argv[3]) if len(sys.argv) > 3 else 0.0,
+        )
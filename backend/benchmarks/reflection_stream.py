@@ -0,0 +1,72 @@
+"""
+Time-to-first-token of the streaming reflection endpoint.
+
+Runs the async view against a local fake Anthropic server that waits
+before the first token and between chunks, and compares when the first
+text reaches the client with when the complete entry would arrive. Then
+opens many streams at once to show they share one event loop instead of
+one worker each.
+
+Usage: python benchmarks/reflection_stream.py [iterations] [concurrent]
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+from _harness import create_user, report, test_database
+
+FIRST_TOKEN_DELAY = 0.4
+CHUNK_DELAY = 0.05
+CHUNKS = 20
+
+
+def main(iterations, concurrent):
+    from django.test import AsyncClient, override_settings
+    from django.urls import reverse
+    from rest_framework.authtoken.models import Token
+
+    from apps.moods.tests.fake_anthropic import FakeAnthropicServer
+
+    user = create_user()
+    headers = {'Authorization': f'Token {Token.objects.create(user=user).key}'}
+    url = reverse('moods:daily-reflection-stream')
+    client = AsyncClient()
+    days = (date(2025, 1, 1) + timedelta(days=offset) for offset in range(100000))
+
+    async def stream():
+        start = time.perf_counter()
+        response = await client.post(
+            url, {'date': next(days).isoformat()}, content_type='application/json', headers=headers
+        )
+        first = None
+        async for chunk in response.streaming_content:
+            if first is None and b'event: delta' in chunk:
+                first = time.perf_counter()
+        end = time.perf_counter()
+        return (first - start) * 1000, (end - start) * 1000
+
+    async def run():
+        samples = [await stream() for _ in range(iterations)]
+        report('time to first token', [first for first, _ in samples])
+        report('full entry', [total for _, total in samples])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(stream() for _ in range(concurrent)))
+        elapsed = time.perf_counter() - start
+        print(f'{concurrent} concurrent streams in {elapsed:.2f}s '
+              f'(one stream takes {FIRST_TOKEN_DELAY + CHUNK_DELAY * (CHUNKS - 1):.2f}s upstream)')
+
+    server = FakeAnthropicServer(chunks=CHUNKS, first_token_delay=FIRST_TOKEN_DELAY, chunk_delay=CHUNK_DELAY)
+    os.environ['ANTHROPIC_API_KEY'] = 'benchmark'
+    with server, override_settings(ANTHROPIC_BASE_URL=server.url):
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    with test_database():
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 10,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 20,
+        )
@@ -0,0 +1,60 @@
+"""
+Time tag impact statistics for a user with many tagged entries.
+
+Compares pulling every entry with its tags into Python against the
+grouped query in analytics.tag_impact, cold and with a warm cache.
+
+Usage: python benchmarks/tag_impact.py [entries] [iterations]
+"""
+import random
+import sys
+
+from _harness import create_user, report, test_database, timed
+
+
+def main(entries, iterations):
+    from django.core.cache import cache
+
+    from apps.moods import analytics
+    from apps.moods.models import Tag, MoodEntry
+
+    user = create_user()
+    tags = [Tag.objects.create(user=user, name=f'Tagg {index}') for index in range(12)]
+    rng = random.Random(37)
+    MoodEntry.objects.bulk_create(
+        MoodEntry(user=user, mood_level=rng.randint(1, 10)) for _ in range(entries)
+    )
+    through = MoodEntry.tags.through
+    through.objects.bulk_create(
+        through(moodentry_id=entry_id, tag_id=tag.pk)
+        for entry_id in MoodEntry.objects.filter(user=user).values_list('pk', flat=True)
+        for tag in rng.sample(tags, rng.randint(0, 3))
+    )
+
+    def in_python():
+        stats = {}
+        for entry in MoodEntry.objects.filter(user=user).prefetch_related('tags'):
+            for tag in entry.tags.all():
+                count, total = stats.get(tag.pk, (0, 0))
+                stats[tag.pk] = (count + 1, total + entry.mood_level)
+        return stats
+
+    def cold():
+        cache.clear()
+        analytics.tag_impact(user)
+
+    def warm():
+        analytics.tag_impact(user)
+
+    report('entries + tags in Python', timed(in_python, max(1, iterations // 10)))
+    report('grouped query (cold)', timed(cold, iterations))
+    analytics.tag_impact(user)
+    report('grouped query (cached)', timed(warm, iterations))
+
+
+if __name__ == '__main__':
+    with test_database():
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 30000,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 20,
+        )
@@ -0,0 +1,14 @@
+"""
+ASGI config for Humörkarta.
+
+Needed for the streaming reflection endpoint: async views only avoid
+tying up a worker per open stream when served over ASGI, e.g.
+
+    gunicorn config.asgi:application -k uvicorn_worker.UvicornWorker
+"""
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.production')
+
+application = get_asgi_application()
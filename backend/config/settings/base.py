@@ -3,6 +3,8 @@ Django base settings for Humörkarta.
 
 Settings common to all environments.
 """
+import json
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -94,10 +96,58 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
+        'apps.moods.authentication.BatchCallerAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
+    # Counted per user in the default cache (apps.moods.throttles)
+    'DEFAULT_THROTTLE_RATES': {
+        'reflections': os.environ.get('REFLECTION_RATE', '10/hour'),
+    },
+}
+
+# Cache - per-process memory by default; production can share one via REDIS_URL
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
 }
+
+# Background tasks (apps.moods.background)
+BACKGROUND_WORKERS = int(os.environ.get('BACKGROUND_WORKERS', '2'))
+BACKGROUND_TASKS_INLINE = False
+
+# Daily reflection generation runs on its own pool; this bounds the
+# number of concurrent upstream LLM calls per process
+REFLECTION_WORKERS = int(os.environ.get('REFLECTION_WORKERS', '4'))
+
+# Upstream protection (apps.moods.upstream): at most this many LLM calls
+# at once per process, each waiting up to the queue timeout for a slot.
+# The circuit breaker opens after this many consecutive upstream failures
+# and fails fast for the cooldown (seconds)
+REFLECTION_MAX_CONCURRENT = int(os.environ.get('REFLECTION_MAX_CONCURRENT', '8'))
+REFLECTION_QUEUE_TIMEOUT = float(os.environ.get('REFLECTION_QUEUE_TIMEOUT', '10'))
+REFLECTION_BREAKER_THRESHOLD = int(os.environ.get('REFLECTION_BREAKER_THRESHOLD', '5'))
+REFLECTION_BREAKER_COOLDOWN = int(os.environ.get('REFLECTION_BREAKER_COOLDOWN', '30'))
+
+# Where reflection text comes from (apps.moods.reflection_backends). The
+# fake backend needs no key or network; its options set the timing and
+# failure rate, e.g. {"latency": 2, "chunk_delay": 0.05, "failure_rate": 0.1}
+REFLECTION_BACKEND = os.environ.get(
+    'REFLECTION_BACKEND', 'apps.moods.reflection_backends.AnthropicBackend'
+)
+REFLECTION_BACKEND_OPTIONS = json.loads(os.environ.get('REFLECTION_BACKEND_OPTIONS') or '{}')
+
+# Anthropic client (apps.moods.reflection_backends), created once per process.
+# The API key itself is read from ANTHROPIC_API_KEY when the client is
+# created. Retries back off exponentially with jitter.
+ANTHROPIC_BASE_URL = os.environ.get('ANTHROPIC_BASE_URL') or None
+ANTHROPIC_CONNECT_TIMEOUT = float(os.environ.get('ANTHROPIC_CONNECT_TIMEOUT', '5'))
+ANTHROPIC_READ_TIMEOUT = float(os.environ.get('ANTHROPIC_READ_TIMEOUT', '60'))
+ANTHROPIC_MAX_RETRIES = int(os.environ.get('ANTHROPIC_MAX_RETRIES', '2'))
+
+# Account deletion
+ACCOUNT_DELETION_CHUNK_SIZE = 1000
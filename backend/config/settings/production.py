@@ -36,6 +36,15 @@ if DATABASES['default'] is None:
         'PORT': os.environ.get('DB_PORT', '5432'),
     }
 
+# Cache shared between workers when Redis is available
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = _csv_env('CORS_ALLOWED_ORIGINS')
 CORS_ALLOW_CREDENTIALS = True
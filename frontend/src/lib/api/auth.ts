@@ -70,7 +70,7 @@ export async function getProfile(token: string): Promise<User> {
 
 export async function updateProfile(
 	token: string,
-	data: { display_name?: string }
+	data: { display_name?: string; pregenerate_reflections?: boolean }
 ): Promise<User> {
 	return authRequest('/me/', {
 		method: 'PUT',
@@ -1,4 +1,13 @@
-import type { MoodEntry, Tag, DailyAggregate, DailyLog, DailyReflection, GraphView } from '$lib/types';
+import type {
+	MoodEntry,
+	Tag,
+	DailyAggregate,
+	DailyLog,
+	DailyReflection,
+	ReflectionJob,
+	ReflectionSnapshot,
+	GraphView
+} from '$lib/types';
 import { auth } from '$lib/stores/auth';
 import { get } from 'svelte/store';
 
@@ -100,10 +109,12 @@ export async function deleteTag(id: number): Promise<void> {
 // Graph Data
 export async function getGraphData(
 	view: GraphView,
-	date?: string
+	date?: string,
+	rolling?: number
 ): Promise<DailyAggregate[]> {
 	const params = new URLSearchParams({ view });
 	if (date) params.append('date', date);
+	if (rolling) params.append('rolling', String(rolling));
 	return request(`/graph/?${params}`);
 }
 
@@ -133,11 +144,80 @@ export async function getDailyLogs(params?: {
 	return normalizeList<DailyLog>(payload);
 }
 
+// The day's stored mood entries, aggregate and log, as the server sees them
+export async function getReflectionSnapshot(date: string): Promise<ReflectionSnapshot> {
+	return request(`/daily-reflections/snapshot/?date=${date}`);
+}
+
+const REFLECTION_POLL_INTERVAL = 1500;
+const REFLECTION_POLL_TIMEOUT = 120000;
+
+export async function getReflectionJob(id: number): Promise<ReflectionJob> {
+	return request(`/daily-reflections/jobs/${id}/`);
+}
+
+// Generation runs as a background job: queue it, then poll until it finishes
 export async function generateDailyReflection(payload: Record<string, unknown>): Promise<{ entry: string }> {
-	return request('/daily-reflections/generate/', {
+	let job = await request<ReflectionJob>('/daily-reflections/generate/', {
+		method: 'POST',
+		body: JSON.stringify(payload)
+	});
+	const deadline = Date.now() + REFLECTION_POLL_TIMEOUT;
+	while (job.status === 'queued' || job.status === 'running') {
+		if (Date.now() > deadline) {
+			throw new Error('Det tog för lång tid att skapa texten.');
+		}
+		await new Promise((resolve) => setTimeout(resolve, REFLECTION_POLL_INTERVAL));
+		job = await getReflectionJob(job.id);
+	}
+	if (job.status === 'failed') {
+		throw new Error(job.error || 'Kunde inte skapa texten.');
+	}
+	return { entry: job.entry ?? '' };
+}
+
+// Streams the entry as server-sent events; onText gets each chunk as it arrives
+export async function streamDailyReflection(
+	payload: Record<string, unknown>,
+	onText: (text: string) => void
+): Promise<{ entry: string }> {
+	const response = await fetch(`${BASE_URL}/daily-reflections/generate/stream/`, {
 		method: 'POST',
+		headers: {
+			'Content-Type': 'application/json',
+			Accept: 'text/event-stream',
+			...getAuthHeaders()
+		},
 		body: JSON.stringify(payload)
 	});
+
+	if (!response.ok || !response.body) {
+		const error = await response.json().catch(() => ({}));
+		throw new Error(error.detail || error.error || `API Error: ${response.status}`);
+	}
+
+	const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+	let buffer = '';
+	for (;;) {
+		const { value, done } = await reader.read();
+		if (done) break;
+		buffer += value;
+		let boundary;
+		while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+			const block = buffer.slice(0, boundary);
+			buffer = buffer.slice(boundary + 2);
+			const event = block.match(/^event: (.*)$/m)?.[1];
+			const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] ?? '{}');
+			if (event === 'delta') {
+				onText(data.text);
+			} else if (event === 'done') {
+				return { entry: data.entry };
+			} else if (event === 'error') {
+				throw new Error(data.detail || data.error || 'Kunde inte skapa texten.');
+			}
+		}
+	}
+	throw new Error('Anslutningen bröts innan texten var klar.');
 }
 
 export async function getDailyReflections(params?: {
@@ -153,3 +233,23 @@ export async function getDailyReflections(params?: {
 	const payload = await request<unknown>(`/daily-reflections/${query ? `?${query}` : ''}`);
 	return normalizeList<DailyReflection>(payload);
 }
+
+// Batch
+export interface BatchCall {
+	method: 'GET' | 'POST' | 'PUT' | 'PATCH' | 'DELETE';
+	path: string;
+	body?: unknown;
+}
+
+export interface BatchResult<T = unknown> {
+	status: number;
+	body: T;
+}
+
+export async function batch(calls: BatchCall[], atomic = false): Promise<BatchResult[]> {
+	const payload = await request<{ results: BatchResult[] }>('/batch/', {
+		method: 'POST',
+		body: JSON.stringify({ requests: calls, atomic })
+	});
+	return payload.results;
+}
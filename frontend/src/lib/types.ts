@@ -54,10 +54,34 @@ export interface DailyReflection {
 	updated_at: string;
 }
 
+export interface ReflectionSnapshot {
+	date: string;
+	mood: {
+		average: number | null;
+		entry_count: number;
+		notes: string[];
+	};
+	daily_log: Pick<
+		DailyLog,
+		'sleep_hours' | 'sleep_quality' | 'energy' | 'appetite' | 'anxiety' | 'stress' | 'concentration'
+	> | null;
+}
+
+export interface ReflectionJob {
+	id: number;
+	date: string;
+	status: 'queued' | 'running' | 'done' | 'failed';
+	entry: string | null;
+	error: string;
+	created_at: string;
+	finished_at: string | null;
+}
+
 export interface User {
 	id: number;
 	email: string;
 	display_name?: string;
+	pregenerate_reflections?: boolean;
 }
 
 export type GraphView = 'day' | 'week' | 'month' | 'year';